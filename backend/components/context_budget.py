@@ -0,0 +1,176 @@
+import os
+import re
+from collections import Counter
+
+# 回答上下文的预算，可通过环境变量覆盖
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+CONTEXT_MAX_ROWS = int(os.getenv("CONTEXT_MAX_ROWS", "20"))
+
+# 各字段写入上下文的最大字符数，未列出的字段使用 DEFAULT_FIELD_CHARS
+FIELD_CHAR_LIMITS = {
+    "patent_title": 200,
+    "applicant": 120,
+    "inventor": 120,
+    "abstract": 300,
+    "patent_scope": 200,
+    "detailed_description": 200,
+    "priority": 80,
+    "gazette_ipc": 80,
+    "ipc": 120,
+}
+DEFAULT_FIELD_CHARS = 160
+
+# 相关度打分时各字段的权重
+FIELD_WEIGHTS = {"patent_title": 3.0, "abstract": 1.5, "keywords": 0.5}
+SCORE_SCAN_CHARS = 500
+
+# 溢出行统计时每个维度展示的取值个数
+SUMMARY_TOP_N = 5
+
+cjk_or_word = re.compile(r"[\u4e00-\u9fff]|[A-Za-z0-9]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：每个汉字约 1 token，其余字符约 4 个 1 token"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if "\u4e00" <= ch <= "\u9fff")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_value(column, value) -> str:
+    """按字段上限截断单个取值，超出部分以 “…” 表示"""
+    text = str(value).strip()
+    limit = FIELD_CHAR_LIMITS.get(column, DEFAULT_FIELD_CHARS)
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def question_terms(question: str) -> set:
+    """问题的检索词：汉字二元组与英文/数字词"""
+    tokens = cjk_or_word.findall(question or "")
+    terms = {t.lower() for t in tokens if len(t) > 1}
+    terms.update(a + b for a, b in zip(tokens, tokens[1:]) if len(a) == 1 and len(b) == 1)
+    return terms
+
+
+def score_row(row, columns, terms) -> float:
+    """相关度：各字段中命中的检索词个数按字段权重加权求和"""
+    if not terms:
+        return 0.0
+    score = 0.0
+    for i, value in enumerate(row):
+        if value is None:
+            continue
+        column = columns[i] if columns and i < len(columns) else None
+        text = str(value)[:SCORE_SCAN_CHARS].lower()
+        hits = sum(1 for t in terms if t in text)
+        score += hits * FIELD_WEIGHTS.get(column, 1.0)
+    return score
+
+
+def render_row(row, columns) -> tuple:
+    """返回 (专利id文本, 专利信息文本)，规则与 format_results_exclude_url 一致：
+    末三项为 id、URL、专利名，信息为其余字段（逐字段截断）"""
+    row_values = list(row) if isinstance(row, (list, tuple)) else [row]
+    if len(row_values) >= 3:
+        patent_id = row_values[-3]
+        info_parts = row_values[:-3]
+        info_columns = list(columns[:-3]) if columns and len(columns) == len(row_values) else [None] * len(info_parts)
+    else:
+        patent_id = None
+        info_parts = row_values
+        info_columns = list(columns) if columns and len(columns) == len(row_values) else [None] * len(info_parts)
+
+    info_text = "；".join(
+        truncate_value(c, v) for c, v in zip(info_columns, info_parts)
+        if v is not None and str(v).strip() != ""
+    )
+    info_text = info_text if info_text != "" else "无"
+    id_text = (str(patent_id).strip() if patent_id is not None else "未知") or "未知"
+    return id_text, info_text
+
+
+def row_cost(row, columns) -> int:
+    """单行写入上下文的 token 估算（含 “专利id：…，专利信息：” 等固定部分）"""
+    _, info_text = render_row(row, columns)
+    return estimate_tokens(info_text) + 8
+
+
+def select_context_rows(rows, columns=None, question: str = "",
+                        max_rows: int = CONTEXT_MAX_ROWS,
+                        token_budget: int = CONTEXT_TOKEN_BUDGET):
+    """确定性地选出写入上下文的行，保留的行保持查询结果原有的顺序（即 SQL 的 ORDER BY）。
+
+    全部行都在行数与 token 预算之内时原样保留，不做相关度打分；否则按 score_row 降序
+    （同分保持原顺序）依次加入直到行数或 token 预算用尽，相关度只决定保留哪些行。
+    返回 (保留的行, 未保留的行)；同一输入总是得到同一结果，便于引用信息与上下文保持一致。
+    """
+    rows = list(rows or [])
+    costs = {}
+    if len(rows) <= max_rows:
+        costs = {i: row_cost(row, columns) for i, row in enumerate(rows)}
+        if sum(costs.values()) <= token_budget:
+            return rows, []
+
+    terms = question_terms(question)
+    order = sorted(range(len(rows)), key=lambda i: (-score_row(rows[i], columns, terms), i))
+
+    kept_idx = []
+    used = 0
+    for i in order:
+        if len(kept_idx) >= max_rows:
+            break
+        cost = costs[i] if i in costs else row_cost(rows[i], columns)
+        if kept_idx and used + cost > token_budget:
+            break
+        kept_idx.append(i)
+        used += cost
+
+    kept_set = set(kept_idx)
+    kept = [rows[i] for i in sorted(kept_idx)]
+    overflow = [rows[i] for i in range(len(rows)) if i not in kept_set]
+    return kept, overflow
+
+
+def _column_index(columns, *names):
+    if not columns:
+        return None
+    lowered = [str(c).lower() for c in columns]
+    for name in names:
+        if name in lowered:
+            return lowered.index(name)
+    return None
+
+
+def summarize_rows(rows, columns, total: int = None) -> str:
+    """对未写入上下文的行做聚合统计（按年份、申请人、IPC 小类计数），字段不在结果中则跳过。
+
+    total 为未列出记录的真实条数；查询结果被行数上限截断时大于 len(rows)，
+    此时统计只基于已取回的样本。
+    """
+    total = len(rows) if total is None else total
+    if total <= 0:
+        return ""
+    lines = [f"另有 {total} 条记录未逐条列出。"]
+    if total > len(rows):
+        lines.append(f"以下统计基于已取回的 {len(rows)} 条样本。")
+
+    dimensions = [
+        ("年份", _column_index(columns, "publication_date", "application_date", "year"),
+         lambda v: [str(v)[:4]]),
+        ("申请人", _column_index(columns, "applicant"),
+         lambda v: [p.strip() for p in re.split(r"[;；]", str(v)) if p.strip()]),
+        ("IPC小类", _column_index(columns, "ipc", "gazette_ipc"),
+         lambda v: sorted({p.strip()[:4] for p in re.split(r"[;；]", str(v)) if p.strip()})),
+    ]
+    for label, idx, extract in dimensions:
+        if idx is None:
+            continue
+        counter = Counter()
+        for row in rows:
+            if idx < len(row) and row[idx] not in (None, ""):
+                counter.update(extract(row[idx]))
+        if counter:
+            top = "，".join(f"{k}：{n}条" for k, n in counter.most_common(SUMMARY_TOP_N))
+            lines.append(f"其按{label}分布（前{SUMMARY_TOP_N}）：{top}")
+    return "\n".join(lines)
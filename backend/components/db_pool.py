@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from backend.sqlite.split_text import register_text_functions
+
+# 默认调优参数：mmap 映射 256MB，页缓存 64MB（负数单位为 KiB），预编译语句缓存 512 条
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+DEFAULT_CACHE_SIZE_KIB = 64 * 1024
+DEFAULT_STATEMENT_CACHE = 512
+
+
+class ConnectionPool:
+    """按线程复用的只读 SQLite 连接池。
+
+    - 每个线程首次调用 connection() 时以 file:...?mode=ro 打开一个连接，之后复用，
+      省去每次查询的文件打开、schema 解析与页缓存预热开销。
+    - 连接设置 query_only、mmap_size、cache_size；cached_statements 使相同 SQL
+      文本复用已编译的语句。
+    - 连接注册 zstd_text 等函数（见 backend/sqlite/split_text.py），压缩存储的大文本读取时透明解压。
+    - immutable=True 时追加 URI 参数 immutable=1，SQLite 不再加锁和检查文件变化，
+      仅适用于运行期间数据库不会被改写的部署。
+    """
+
+    def __init__(self, db_path: str, immutable: bool = False,
+                 mmap_size: int = DEFAULT_MMAP_SIZE,
+                 cache_size_kib: int = DEFAULT_CACHE_SIZE_KIB,
+                 statement_cache: int = DEFAULT_STATEMENT_CACHE):
+        self.db_path = db_path
+        self.immutable = immutable
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+        self.statement_cache = statement_cache
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._generation = 0
+
+    def _uri(self) -> str:
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        if self.immutable:
+            uri += "&immutable=1"
+        return uri
+
+    def _open(self) -> sqlite3.Connection:
+        if not os.path.exists(self.db_path):
+            raise FileNotFoundError(f"数据库文件不存在: {self.db_path}")
+
+        conn = sqlite3.connect(
+            self._uri(),
+            uri=True,
+            check_same_thread=False,
+            cached_statements=self.statement_cache,
+        )
+        conn.execute("PRAGMA query_only = 1")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        # patent 以 zstd 压缩布局拆分时，视图在读取时透明解压大文本列
+        register_text_functions(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """返回当前线程专属的连接，不存在或已被 invalidate() 标记过期时重新创建"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.generation != self._generation:
+            # 过期连接只由所属线程自己关闭，不影响其它线程正在执行的查询
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            conn.close()
+            conn = None
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            self._local.metadata = {}
+            self._local.generation = self._generation
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def invalidate(self):
+        """标记所有连接过期（如数据库被重建或新增了索引），各线程下次取连接时重新打开"""
+        with self._lock:
+            self._generation += 1
+
+    def metadata(self) -> dict:
+        """当前线程连接附带的缓存字典（如已建立的索引信息），随连接一起失效"""
+        self.connection()
+        return self._local.metadata
+
+    def close_all(self):
+        """关闭所有线程的连接；各线程下次调用 connection() 时会重新打开。
+
+        调用方需保证此时没有正在执行的查询。
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        # 其它线程的 threading.local 无法逐个清理，整体替换后各线程都会重新打开连接
+        self._local = threading.local()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str, **kwargs) -> ConnectionPool:
+    """按数据库路径返回进程内共享的连接池（首次调用时创建）"""
+    key = os.path.abspath(db_path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(db_path, **kwargs)
+                _pools[key] = pool
+    return pool
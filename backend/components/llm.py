@@ -1,23 +1,86 @@
-from langchain_openai import ChatOpenAI
-from dotenv import load_dotenv
 import os
+import threading
 
+# 模型名，可按需改为任意兼容的模型名
+LLM_MODEL = "qwen-plus"
 
-# 加载环境变量
-load_dotenv()
+_env_loaded = False
+_llm = None
+_llm_lock = threading.Lock()
+
+
+def load_env():
+    """加载 .env 中的环境变量（只加载一次，已存在的环境变量不覆盖）"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+def llm_provider() -> str:
+    """提供方标识（用于按提供方限速），默认取接口地址"""
+    load_env()
+    return os.getenv("OPENAI_BASE_URL") or "default"
+
+
+def build_chat_model():
+    """初始化 OpenAI 格式的 Chat 模型；重试由网关负责，客户端自身不再重试。
+
+    所有线程 / 协程复用同一组 keep-alive 连接（LLM_MAX_CONNECTIONS），配置在调用时读取。
+    """
+    import httpx
+    from langchain_openai import ChatOpenAI
+
+    load_env()
+    max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+    timeout = float(os.getenv("LLM_TIMEOUT", "120"))
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return ChatOpenAI(
+        model=LLM_MODEL,
+        temperature=0,
+        max_retries=0,
+        timeout=timeout,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=os.getenv("OPENAI_BASE_URL"),
+        http_client=httpx.Client(limits=limits, timeout=timeout),
+        http_async_client=httpx.AsyncClient(limits=limits, timeout=timeout),
+    )
+
+
+def get_llm():
+    """对外使用的 llm（进程内单例，首次调用时创建）：网关负责限速（LLM_RPM / LLM_TPM）、
+    并发去重、抖动退避重试与调用统计。
+
+    导入本模块不会加载 langchain_openai / openai，只有第一次真正需要大模型时才付出这部分开销。
+    """
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                from backend.components.llm_gateway import LLMGateway
+                _llm = LLMGateway(build_chat_model(), provider=llm_provider())
+    return _llm
+
+
+def set_llm(runnable):
+    """替换进程内的 llm（基准测试中的假 LLM 等）；传入 None 时下次 get_llm 重新创建"""
+    global _llm
+    with _llm_lock:
+        _llm = runnable
+
+
+def __getattr__(name):
+    # 兼容旧写法：from backend.components.llm import llm / chat_model / LLM_PROVIDER
+    if name == "llm":
+        return get_llm()
+    if name == "chat_model":
+        return get_llm().client
+    if name == "LLM_PROVIDER":
+        return llm_provider()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# 读取 OpenAI 兼容环境变量
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  
 
-# 初始化 OpenAI 格式的 Chat 模型
-llm = ChatOpenAI(
-    model="qwen-plus",  # 可按需改为任意兼容的模型名
-    temperature=0,
-    max_retries=2,
-    api_key=OPENAI_API_KEY,
-    base_url=OPENAI_BASE_URL
-)
 # # 直接调用
-# response = llm.invoke("你好，请用一句话介绍你的版本。")
+# response = get_llm().invoke("你好，请用一句话介绍你的版本。")
 # print(response.content)
@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import openai
+from langchain_core.messages import convert_to_messages
+from langchain_core.prompt_values import PromptValue, StringPromptValue, ChatPromptValue
+from langchain_core.runnables import Runnable
+
+from backend.components.context_budget import estimate_tokens
+from backend.components.rate_limit import acquire_llm_slot, acquire_llm_slot_sync, get_token_limiter
+
+# 网关自身的重试次数与退避参数（底层客户端的 max_retries 应设为 0，避免两层重试叠加）
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+# 相同提示词的并发请求合并为一次调用，LLM_DEDUPE=0 时关闭
+LLM_DEDUPE = os.getenv("LLM_DEDUPE", "1") != "0"
+# 延迟样本只保留最近 N 次，用于计算分位数
+LATENCY_WINDOW = 10000
+
+# 可以重试的错误：限流(429)、连接失败/超时、服务端 5xx
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+
+def to_prompt_value(value) -> PromptValue:
+    """把字符串 / 消息列表 / PromptValue 统一为 PromptValue（与 ChatModel 接受的输入一致）"""
+    if isinstance(value, PromptValue):
+        return value
+    if isinstance(value, str):
+        return StringPromptValue(text=value)
+    return ChatPromptValue(messages=convert_to_messages(value))
+
+
+def prompt_key(prompt: PromptValue, kwargs: dict) -> str:
+    """提示词指纹：消息类型与内容相同、调用参数相同的请求视为同一请求"""
+    payload = [(m.type, m.content) for m in prompt.to_messages()]
+    raw = json.dumps([payload, sorted(kwargs.items())], ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def retry_after(error: Exception):
+    """读取限流响应中的 Retry-After（秒），没有时返回 None"""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class GatewayMetrics:
+    """网关调用统计：请求数、实际调用数、合并数、重试与失败数、token 用量（含命中前缀缓存的
+    提示词 token）及延迟分位数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.upstream_calls = 0
+            self.deduped = 0
+            self.retries = 0
+            self.errors = 0
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+            self.cached_tokens = 0
+            self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def record_request(self, deduped: bool = False):
+        with self._lock:
+            self.requests += 1
+            if deduped:
+                self.deduped += 1
+
+    def record_attempt(self, retry: bool = False, error: bool = False):
+        with self._lock:
+            self.upstream_calls += 1
+            if retry:
+                self.retries += 1
+            if error:
+                self.errors += 1
+
+    def record_success(self, latency: float, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0):
+        with self._lock:
+            self.latencies.append(latency)
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cached_tokens += cached_tokens
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            stats = {
+                "requests": self.requests,
+                "upstream_calls": self.upstream_calls,
+                "deduped": self.deduped,
+                "retries": self.retries,
+                "errors": self.errors,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cached_tokens": self.cached_tokens,
+                "prefix_cache_hit_rate": (
+                    round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else None
+                ),
+            }
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            stats[f"latency_{name}_ms"] = (
+                round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 1) if latencies else None
+            )
+        return stats
+
+
+class LLMGateway(Runnable):
+    """大模型调用网关：包装 ChatModel，提供限速、并发去重、抖动退避重试与调用统计。
+
+    - 限速：调用前按提供方获取请求配额（LLM_RPM）与预估 token 配额（LLM_TPM），
+      响应返回后按实际用量补扣超出预估的部分；配额由 rate_limit 模块按提供方共享。
+    - 去重：同一时刻内容相同的请求只调用一次，其余调用方等待并共享同一结果；异步调用中
+      某个调用方被取消不影响其他调用方，全部取消时才取消这次调用。
+    - 重试：429 / 连接错误 / 5xx 按 “全抖动” 指数退避重试（有 Retry-After 时以其为下限），
+      避免大量线程在同一时刻一起重试。
+    - 统计：见 GatewayMetrics，通过 metrics.snapshot() 读取；prefix_cache_hit_rate 为提示词 token
+      中命中提供方前缀缓存的比例。
+
+    实现了 Runnable 接口，可直接替换原 ChatModel（支持 invoke / ainvoke / stream 与 | 管道组合）。
+    """
+
+    def __init__(self, client, provider: str = "default", max_retries: int = LLM_MAX_RETRIES,
+                 backoff_base: float = LLM_BACKOFF_BASE, backoff_max: float = LLM_BACKOFF_MAX,
+                 dedupe: bool = LLM_DEDUPE):
+        self.client = client
+        self.provider = provider
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.dedupe = dedupe
+        self.metrics = GatewayMetrics()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._ainflight = {}
+
+    def backoff_delay(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        hinted = retry_after(error)
+        return max(delay, hinted) if hinted is not None else delay
+
+    def _settle_usage(self, response, estimated: int, latency: float):
+        """记录用量（含提供方返回的 cached_tokens）；实际 token 数超出预估时向 token 限速器补扣"""
+        usage = getattr(response, "usage_metadata", None) or {}
+        prompt_tokens = usage.get("input_tokens", estimated)
+        completion_tokens = usage.get("output_tokens", estimate_tokens(getattr(response, "content", "")))
+        cached_tokens = (usage.get("input_token_details") or {}).get("cache_read") or 0
+        self.metrics.record_success(latency, prompt_tokens, completion_tokens, cached_tokens)
+        token_limiter = get_token_limiter(self.provider)
+        extra = prompt_tokens + completion_tokens - estimated
+        if token_limiter is not None and extra > 0:
+            token_limiter.charge(extra)
+
+    def _call(self, prompt: PromptValue, config, **kwargs):
+        estimated = estimate_tokens(prompt.to_string())
+        attempt = 0
+        while True:
+            acquire_llm_slot_sync(self.provider, estimated)
+            start = time.perf_counter()
+            try:
+                response = self.client.invoke(prompt, config, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    self.metrics.record_attempt(retry=attempt > 0, error=True)
+                    raise
+                self.metrics.record_attempt(retry=attempt > 0)
+                time.sleep(self.backoff_delay(attempt, e))
+                attempt += 1
+                continue
+            except Exception:
+                self.metrics.record_attempt(retry=attempt > 0, error=True)
+                raise
+            self.metrics.record_attempt(retry=attempt > 0)
+            self._settle_usage(response, estimated, time.perf_counter() - start)
+            return response
+
+    async def _acall(self, prompt: PromptValue, config, **kwargs):
+        estimated = estimate_tokens(prompt.to_string())
+        attempt = 0
+        while True:
+            await acquire_llm_slot(self.provider, estimated)
+            start = time.perf_counter()
+            try:
+                response = await self.client.ainvoke(prompt, config, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    self.metrics.record_attempt(retry=attempt > 0, error=True)
+                    raise
+                self.metrics.record_attempt(retry=attempt > 0)
+                await asyncio.sleep(self.backoff_delay(attempt, e))
+                attempt += 1
+                continue
+            except Exception:
+                self.metrics.record_attempt(retry=attempt > 0, error=True)
+                raise
+            self.metrics.record_attempt(retry=attempt > 0)
+            self._settle_usage(response, estimated, time.perf_counter() - start)
+            return response
+
+    def invoke(self, input, config=None, **kwargs):
+        prompt = to_prompt_value(input)
+        if not self.dedupe:
+            self.metrics.record_request()
+            return self._call(prompt, config, **kwargs)
+
+        key = prompt_key(prompt, kwargs)
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        self.metrics.record_request(deduped=not leader)
+        if not leader:
+            return future.result()
+
+        try:
+            response = self._call(prompt, config, **kwargs)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        prompt = to_prompt_value(input)
+        if not self.dedupe:
+            self.metrics.record_request()
+            return await self._acall(prompt, config, **kwargs)
+
+        # 共享调用按事件循环分别去重（任务只能在创建它的事件循环中等待）
+        loop = asyncio.get_running_loop()
+        key = (id(loop), prompt_key(prompt, kwargs))
+        entry = self._ainflight.get(key)
+        self.metrics.record_request(deduped=entry is not None)
+        if entry is None:
+            # 共享调用放在不属于任何调用方的任务中：某个调用方被取消不会把 CancelledError 传给其他等待者
+            task = loop.create_task(self._acall(prompt, config, **kwargs))
+            # 没有调用方等待时，避免 “exception was never retrieved” 警告
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            entry = self._ainflight[key] = [task, 0]
+            task.add_done_callback(lambda t: self._ainflight.get(key) is entry and self._ainflight.pop(key))
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            # 所有等待者都已取消时才取消共享调用
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+                if self._ainflight.get(key) is entry:
+                    self._ainflight.pop(key)
+
+    def stream(self, input, config=None, **kwargs):
+        """流式调用只做限速与统计：输出已经开始产出后无法透明重试，也不参与去重"""
+        prompt = to_prompt_value(input)
+        estimated = estimate_tokens(prompt.to_string())
+        self.metrics.record_request()
+        acquire_llm_slot_sync(self.provider, estimated)
+        start = time.perf_counter()
+        parts = []
+        try:
+            for chunk in self.client.stream(prompt, config, **kwargs):
+                parts.append(getattr(chunk, "content", "") or "")
+                yield chunk
+        except Exception:
+            self.metrics.record_attempt(error=True)
+            raise
+        self.metrics.record_attempt()
+        completion_tokens = estimate_tokens("".join(str(p) for p in parts))
+        self.metrics.record_success(time.perf_counter() - start, estimated, completion_tokens)
+        token_limiter = get_token_limiter(self.provider)
+        if token_limiter is not None and completion_tokens:
+            token_limiter.charge(completion_tokens)
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import logging
+import threading
+
+# 日志级别与限流，可通过环境变量覆盖；QA_LOG_LEVEL=DEBUG 时输出大模型原始输出、上下文等大段内容
+LOG_LEVEL = os.getenv("QA_LOG_LEVEL", "INFO").upper()
+# 同一条日志模板在 LOG_RATE_INTERVAL 秒内最多输出 LOG_RATE_LIMIT 条（<=0 表示不限流）
+LOG_RATE_LIMIT = int(os.getenv("QA_LOG_RATE_LIMIT", "20"))
+LOG_RATE_INTERVAL = float(os.getenv("QA_LOG_RATE_INTERVAL", "10"))
+# 日志中单个值（SQL、查询结果、回答等）预览的最大字符数
+LOG_PREVIEW_CHARS = 500
+
+ROOT_LOGGER = "patents_qa"
+
+
+class RateLimitFilter(logging.Filter):
+    """按 (logger, 日志模板) 限流：窗口内超出上限的日志被丢弃，下一条放行的日志附带被省略的条数。
+
+    WARNING 及以上级别不限流。
+    """
+
+    def __init__(self, limit: int = LOG_RATE_LIMIT, interval: float = LOG_RATE_INTERVAL):
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._windows = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            start, count, suppressed = self._windows.get(key, (now, 0, 0))
+            if now - start >= self.interval:
+                start, count = now, 0
+            if count >= self.limit:
+                self._windows[key] = (start, count, suppressed + 1)
+                return False
+            self._windows[key] = (start, count + 1, 0)
+        if suppressed:
+            record.msg = f"{record.msg}（此前省略 {suppressed} 条同类日志）"
+        return True
+
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """返回 patents_qa 下的子 logger；首次调用时为 patents_qa 配置输出到 stderr 的限流 handler"""
+    global _configured
+    if not _configured:
+        with _configure_lock:
+            if not _configured:
+                root = logging.getLogger(ROOT_LOGGER)
+                if not root.handlers:
+                    handler = logging.StreamHandler(sys.stderr)
+                    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+                    handler.addFilter(RateLimitFilter())
+                    root.addHandler(handler)
+                root.setLevel(LOG_LEVEL)
+                root.propagate = False
+                _configured = True
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def preview(value, limit: int = LOG_PREVIEW_CHARS) -> str:
+    """日志用的截断预览"""
+    text = value if isinstance(value, str) else repr(value)
+    return text if len(text) <= limit else text[:limit] + f"…（共 {len(text)} 字符）"
@@ -1,7 +1,8 @@
-from langchain_core.prompts import ChatPromptTemplate
+from functools import lru_cache
 
-chat_prompt_template = ChatPromptTemplate.from_messages([
-    ("system", """你是一个专利问答助手。严格依据给定上下文作答，输出自然、易读的中文答案。
+# 回答阶段的系统提示词（占位符 question / sql / context）；模板对象在首次使用时才创建，
+# 导入本模块不加载 langchain_core.prompts
+ANSWER_SYSTEM_PROMPT = """你是一个专利问答助手。严格依据给定上下文作答，输出自然、易读的中文答案。
       上下文：
       - 原始问题：{question}
       - 生成的SQL：{sql}
@@ -22,6 +23,22 @@ chat_prompt_template = ChatPromptTemplate.from_messages([
       示例：
       问：给出台湾积体电路制造股份有限公司，2024年发布的半导体专利有多少篇？
       答：台积电2024年共发布了1300篇半导体相关专利。
-      """),
-    ("human", "{question}"),
-])
+      """
+
+
+@lru_cache(maxsize=None)
+def get_answer_prompt():
+    """回答阶段的 ChatPromptTemplate（进程内单例）"""
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([
+        ("system", ANSWER_SYSTEM_PROMPT),
+        ("human", "{question}"),
+    ])
+
+
+def __getattr__(name):
+    # 兼容旧写法：from backend.components.prompts import chat_prompt_template
+    if name == "chat_prompt_template":
+        return get_answer_prompt()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
@@ -0,0 +1,183 @@
+import os
+import re
+import json
+import time
+import logging
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+from collections import namedtuple, defaultdict
+
+from backend.components.sql_params import tokenize
+from backend.components.log import get_logger
+
+# 单次查询的时间预算（秒，<=0 表示不限制），超出后由 progress handler 中断执行
+QUERY_BUDGET_SECONDS = float(os.getenv("SQL_QUERY_BUDGET", "10"))
+# progress handler 的检查间隔（SQLite 虚拟机指令数）
+PROGRESS_STEPS = 10000
+# 计划为大文本列全表扫描或多表扫描连接的非聚合查询，预先收紧到的行数（降级计划）
+DEGRADED_ROW_CAP = int(os.getenv("SQL_DEGRADED_ROW_CAP", "50"))
+# 每次查询的计划分类与耗时追加写入该 JSONL 文件（为空时只打印），用于找出代价高的提示词模式
+QUERY_LOG_PATH = os.getenv("SQL_QUERY_LOG", "")
+
+# 大文本列：在 WHERE 中对其做 LIKE 且没有索引可用时需要逐行读取全部大文本
+HEAVY_COLUMNS = {"abstract", "patent_scope", "detailed_description"}
+# 计划分类，按代价从低到高
+PLAN_KINDS = ("index", "scan", "heavy_scan", "join_scan")
+
+scan_pattern = re.compile(r"^SCAN (?P<table>\S+)(?P<rest>.*)$")
+PREDICATE_KEYWORDS = {"WHERE", "ON", "HAVING"}
+CLAUSE_KEYWORDS = {"GROUP", "ORDER", "LIMIT", "SELECT"}
+
+PlanInfo = namedtuple("PlanInfo", ["kind", "details"])
+
+logger = get_logger("query_guard")
+
+
+class QueryTimeout(sqlite3.OperationalError):
+    """查询超出时间预算（或被取消）而被中断"""
+
+
+def heavy_predicate(sql: str) -> bool:
+    """WHERE / ON / HAVING 条件中是否引用了大文本列（投影中的大文本列由投影裁剪推迟读取）"""
+    in_predicate = False
+    for token in tokenize(sql):
+        if token.kind == "word":
+            word = token.text.upper()
+            if word in PREDICATE_KEYWORDS:
+                in_predicate = True
+                continue
+            if word in CLAUSE_KEYWORDS:
+                in_predicate = False
+                continue
+        if in_predicate and token.kind in ("word", "ident"):
+            if token.text.strip('"`[]').lower() in HEAVY_COLUMNS:
+                return True
+    return False
+
+
+def classify_plan(conn: sqlite3.Connection, sql: str, params=()) -> PlanInfo:
+    """执行前用 EXPLAIN QUERY PLAN 给查询分类：
+
+    - index：只有索引查找 / 全文索引 / 覆盖索引扫描；
+    - scan：存在表的全表扫描；
+    - heavy_scan：全表扫描且条件中引用了大文本列（逐行读取并匹配大文本）；
+    - join_scan：连接的内层表是全表扫描，或需要临时建立自动索引（常见于漏写连接条件）。
+    """
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    details = [row[-1] for row in rows]
+    # 同一层（parent 相同）按连接顺序排列的表访问，True 表示全表扫描
+    accesses = defaultdict(list)
+    automatic = False
+    for row in rows:
+        detail = row[-1]
+        automatic = automatic or "AUTOMATIC" in detail
+        m = scan_pattern.match(detail)
+        if m:
+            if "VIRTUAL TABLE" not in m.group("rest"):
+                accesses[row[1]].append("INDEX" not in m.group("rest"))
+        elif detail.startswith("SEARCH "):
+            accesses[row[1]].append(False)
+
+    # 连接的内层循环是全表扫描时，外层每一行都要完整扫描一次内层表
+    if automatic or any(any(level[1:]) for level in accesses.values()):
+        kind = "join_scan"
+    elif any(any(level) for level in accesses.values()):
+        kind = "heavy_scan" if heavy_predicate(sql) else "scan"
+    else:
+        kind = "index"
+    return PlanInfo(kind, details)
+
+
+def is_expensive(plan: PlanInfo) -> bool:
+    return plan.kind in ("heavy_scan", "join_scan")
+
+
+@contextmanager
+def query_budget(conn: sqlite3.Connection, seconds: float = QUERY_BUDGET_SECONDS, cancel: threading.Event = None):
+    """在 with 块内为连接设置时间预算：超时或 cancel 被置位时 SQLite 中断当前语句（抛出 OperationalError）。
+
+    返回的字典在退出时记录 interrupted（是否由本预算中断）。
+    """
+    deadline = time.monotonic() + seconds if seconds and seconds > 0 else None
+    state = {"interrupted": False}
+    if deadline is None and cancel is None:
+        yield state
+        return
+
+    def handler():
+        if (deadline is not None and time.monotonic() > deadline) or (cancel is not None and cancel.is_set()):
+            state["interrupted"] = True
+            return 1
+        return 0
+
+    conn.set_progress_handler(handler, PROGRESS_STEPS)
+    try:
+        yield state
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+_log_lock = threading.Lock()
+
+
+def log_query(sql: str, plan: PlanInfo, elapsed: float, rows: int, degraded: bool = False, timed_out: bool = False):
+    """记录一次查询的计划分类与耗时；设置了 SQL_QUERY_LOG 时同时追加到 JSONL 文件"""
+    flags = "（降级）" if degraded else ""
+    flags += "（超时中断）" if timed_out else ""
+    # 代价高、被降级或超时的查询以 WARNING 输出（不受限流影响）
+    level = logging.WARNING if is_expensive(plan) or timed_out else logging.INFO
+    logger.log(level, "查询计划：%s%s，耗时 %.1f ms，%d 行；%s",
+               plan.kind, flags, elapsed * 1000, rows, " | ".join(plan.details))
+    if not QUERY_LOG_PATH:
+        return
+    record = {
+        "ts": time.time(), "sql": sql, "plan": plan.kind, "details": plan.details,
+        "ms": round(elapsed * 1000, 3), "rows": rows, "degraded": degraded, "timed_out": timed_out,
+    }
+    with _log_lock, open(QUERY_LOG_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def summarize_log(path: str, top: int = 10):
+    """汇总查询日志：各计划分类的次数与耗时，以及总耗时最高的 SQL 形态（参数化后的 SQL）"""
+    by_kind = defaultdict(list)
+    by_sql = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            by_kind[record["plan"]].append(record)
+            by_sql[record["sql"]].append(record)
+
+    print(f"{'计划':<12}{'次数':>8}{'平均(ms)':>12}{'最大(ms)':>12}{'超时':>6}{'降级':>6}")
+    for kind in PLAN_KINDS:
+        records = by_kind.get(kind)
+        if not records:
+            continue
+        ms = [r["ms"] for r in records]
+        print(f"{kind:<12}{len(records):>8}{sum(ms) / len(ms):>12.1f}{max(ms):>12.1f}"
+              f"{sum(r['timed_out'] for r in records):>6}{sum(r['degraded'] for r in records):>6}")
+
+    print(f"\n总耗时最高的 {top} 种 SQL：")
+    ranked = sorted(by_sql.items(), key=lambda item: -sum(r["ms"] for r in item[1]))
+    for sql, records in ranked[:top]:
+        total = sum(r["ms"] for r in records)
+        print(f"{total:>10.1f} ms  x{len(records):<4} {records[-1]['plan']:<11} {sql[:160]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="汇总 SQL_QUERY_LOG 查询日志，找出代价高的查询")
+    parser.add_argument("log", nargs="?", default=QUERY_LOG_PATH, help="查询日志路径（JSONL）")
+    parser.add_argument("--top", type=int, default=10, help="列出总耗时最高的 SQL 数")
+    args = parser.parse_args()
+    if not args.log:
+        parser.error("请指定查询日志路径（或设置 SQL_QUERY_LOG）")
+    summarize_log(args.log, args.top)
+
+
+if __name__ == "__main__":
+    main()
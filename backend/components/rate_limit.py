@@ -0,0 +1,104 @@
+import os
+import time
+import asyncio
+import threading
+
+# 默认每分钟请求数 / token 数上限，0 表示不限速；可通过 set_rate_limit / set_token_limit 按提供方单独设置
+DEFAULT_RPM = float(os.getenv("LLM_RPM", "0"))
+DEFAULT_TPM = float(os.getenv("LLM_TPM", "0"))
+
+
+class TokenBucket:
+    """线程安全的令牌桶：每分钟补充 per_minute 个令牌，最多积攒 burst 个。
+
+    采用预约方式：取令牌时立即扣减（余额可为负），返回需要等待的秒数，
+    因此并发调用方按到达顺序依次排队，不会在补充令牌的瞬间一起醒来争抢。
+    """
+
+    def __init__(self, per_minute: float, burst: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, int(self.rate)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1) -> float:
+        """扣减 amount 个令牌，返回调用方在发出请求前应等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+    def charge(self, amount: float):
+        """事后补扣（如响应中实际消耗的 token 多于预估），影响之后的调用方"""
+        with self._lock:
+            self.tokens -= amount
+
+    def acquire(self, amount: float = 1):
+        wait = self.reserve(amount)
+        if wait:
+            time.sleep(wait)
+
+    async def aacquire(self, amount: float = 1):
+        wait = self.reserve(amount)
+        if wait:
+            await asyncio.sleep(wait)
+
+
+_limiters = {}
+_token_limiters = {}
+
+
+def set_rate_limit(provider: str, rpm: float, burst: int = None):
+    """为提供方设置每分钟请求数上限（允许 burst 次突发）；rpm 为 0 或 None 时取消限速"""
+    if rpm:
+        _limiters[provider] = TokenBucket(rpm, burst)
+    else:
+        _limiters[provider] = None
+
+
+def get_rate_limiter(provider: str):
+    """返回提供方的限速器；未单独设置时按 LLM_RPM 创建，不限速时返回 None"""
+    if provider not in _limiters:
+        set_rate_limit(provider, DEFAULT_RPM)
+    return _limiters[provider]
+
+
+def set_token_limit(provider: str, tpm: float, burst: int = None):
+    """为提供方设置每分钟 token 数上限（提示词 + 输出）；tpm 为 0 或 None 时取消限速。
+
+    突发默认为 10 秒的配额，且至少容纳一个较长的提示词。
+    """
+    if tpm:
+        _token_limiters[provider] = TokenBucket(tpm, burst if burst is not None else max(8000, tpm / 6))
+    else:
+        _token_limiters[provider] = None
+
+
+def get_token_limiter(provider: str):
+    """返回提供方的 token 限速器；未单独设置时按 LLM_TPM 创建，不限速时返回 None"""
+    if provider not in _token_limiters:
+        set_token_limit(provider, DEFAULT_TPM)
+    return _token_limiters[provider]
+
+
+def acquire_llm_slot_sync(provider: str, tokens: int = 0):
+    """同步调用大模型前获取一个请求配额与 tokens 个 token 配额"""
+    limiter = get_rate_limiter(provider)
+    if limiter is not None:
+        limiter.acquire()
+    token_limiter = get_token_limiter(provider)
+    if token_limiter is not None and tokens:
+        token_limiter.acquire(tokens)
+
+
+async def acquire_llm_slot(provider: str, tokens: int = 0):
+    """异步调用大模型前获取一个请求配额与 tokens 个 token 配额"""
+    limiter = get_rate_limiter(provider)
+    if limiter is not None:
+        await limiter.aacquire()
+    token_limiter = get_token_limiter(provider)
+    if token_limiter is not None and tokens:
+        await token_limiter.aacquire(tokens)
@@ -0,0 +1,151 @@
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+# 缓存开关与容量，可通过环境变量覆盖（RESULT_CACHE=0 关闭，便于基准测试）
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE", "1") != "0"
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "2048"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# 按单引号字符串字面量切分 SQL（'' 为转义的单引号）
+sql_literal_pattern = re.compile(r"('(?:[^']|'')*')")
+
+
+def canonicalize_sql(sql: str) -> str:
+    """规范化 SQL 作为缓存键：字面量之外的部分折叠空白、统一小写，去掉末尾分号"""
+    parts = sql_literal_pattern.split(sql.strip().rstrip(";；").strip())
+    return "".join(
+        part if i % 2 else re.sub(r"\s+", " ", part).lower()
+        for i, part in enumerate(parts)
+    ).strip()
+
+
+def db_fingerprint(db_path: str) -> tuple:
+    """数据库文件指纹：主文件及 -wal 文件的 (mtime_ns, size)。
+
+    clean_ipc.py、建索引脚本等任何写入都会改变 mtime/size，从而使指纹变化。
+    """
+    stamp = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            st = os.stat(path)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def context_hash(context: str) -> str:
+    return hashlib.sha1(context.encode("utf-8")).hexdigest()
+
+
+def estimate_size(value) -> int:
+    """粗略估算缓存值占用的字节数（字符串按 UTF-8 长度，其它按 8 字节）"""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value) + 8 * len(value)
+    return 8
+
+
+class BoundedCache:
+    """线程安全的 LRU 缓存，同时按条目数与估算字节数限制容量"""
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+                 max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.counters["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            self.counters["hits"] += 1
+            return item[0]
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            # 单个结果超过总容量时不缓存
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self.counters["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.counters, entries=len(self._data), bytes=self._bytes)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class ResultCache:
+    """查询结果与最终回答的两级缓存，绑定某个数据库文件。
+
+    - 结果行：键为 (规范化 SQL, 数据库指纹)。
+    - 回答：键为 (归一化问题, 规范化 SQL, 上下文哈希)。
+    - 每次访问先比较数据库指纹，变化时清空两级缓存，并调用 on_change 回调
+      （如让连接池重开连接以识别新建的索引表）。
+    """
+
+    def __init__(self, db_path: str, on_change=None,
+                 max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+                 max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.on_change = on_change
+        self.rows = BoundedCache(max_entries, max_bytes)
+        self.answers = BoundedCache(max_entries, max_bytes // 4)
+        self._fingerprint = db_fingerprint(db_path)
+        self._lock = threading.Lock()
+
+    def check_fingerprint(self) -> tuple:
+        """返回当前数据库指纹；与上次不同则使缓存失效"""
+        current = db_fingerprint(self.db_path)
+        with self._lock:
+            changed = current != self._fingerprint
+            self._fingerprint = current
+        if changed:
+            self.rows.clear()
+            self.answers.clear()
+            if self.on_change is not None:
+                self.on_change()
+        return current
+
+    def get_rows(self, sql: str):
+        return self.rows.get((canonicalize_sql(sql), self.check_fingerprint()))
+
+    def put_rows(self, sql: str, rows):
+        self.rows.put((canonicalize_sql(sql), self.check_fingerprint()), rows)
+
+    def get_answer(self, question_key: str, sql: str, context: str):
+        self.check_fingerprint()
+        return self.answers.get((question_key, canonicalize_sql(sql), context_hash(context)))
+
+    def put_answer(self, question_key: str, sql: str, context: str, answer: str):
+        self.answers.put((question_key, canonicalize_sql(sql), context_hash(context)), answer)
+
+    def stats(self) -> dict:
+        return {"rows": self.rows.stats(), "answers": self.answers.stats()}
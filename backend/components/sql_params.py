@@ -0,0 +1,85 @@
+import re
+from collections import namedtuple
+
+# SQL 词法单元：kind 取值见 token_pattern 中的分组名，start 为在原 SQL 中的起始位置
+Token = namedtuple("Token", ["kind", "text", "start"])
+
+token_pattern = re.compile(
+    r"""
+    (?P<ws>\s+)
+    | (?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+    | (?P<blob>[xX]'[0-9a-fA-F]*')
+    | (?P<string>'(?:[^']|'')*'?)
+    | (?P<ident>"(?:[^"]|"")*"?|`(?:[^`]|``)*`?|\[[^\]]*\]?)
+    | (?P<number>0[xX][0-9a-fA-F]+|(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)
+    | (?P<param>\?\d*|[:@$][^\W\d]\w*)
+    | (?P<word>[^\W\d]\w*)
+    | (?P<op>\|\||<=|>=|<>|!=|==|<<|>>|.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# 这些关键字之后的单引号串在 SQLite 中会被当作标识符（别名、表名），不能换成参数
+IDENTIFIER_KEYWORDS = {"AS", "FROM", "JOIN", "INTO", "TABLE", "INDEX", "VIEW"}
+# LIKE 右侧是参数时，SQLite 为尝试 LIKE 优化会在每次绑定新值后重新编译语句，语句缓存随之失效；
+# 写成 +? 即不再尝试（本库的文本列没有可供 LIKE 优化使用的 NOCASE 索引，计划不变）
+LIKE_KEYWORDS = {"LIKE"}
+# 数字只在比较运算符之后才提取为参数：ORDER BY 1 / GROUP BY 1 中的数字是列序号，LIMIT 留给行数上限改写
+COMPARISON_OPS = {"=", "==", "!=", "<>", "<", "<=", ">", ">="}
+
+
+def tokenize(sql: str):
+    """把 SQL 切分为 Token 列表；字符串、带引号的标识符与注释各为一个整体，拼接全部 text 即为原文"""
+    return [Token(m.lastgroup, m.group(), m.start()) for m in token_pattern.finditer(sql)]
+
+
+def string_value(text: str) -> str:
+    """单引号字面量的取值（去掉两侧引号，'' 还原为 '）"""
+    return text[1:-1].replace("''", "'")
+
+
+def number_value(text: str):
+    if text[:2].lower() == "0x":
+        return int(text, 16)
+    if any(ch in text for ch in ".eE"):
+        return float(text)
+    return int(text)
+
+
+def parameterize(sql: str):
+    """把 SQL 中的字面量提取为绑定参数，返回 (参数化后的 SQL, 参数元组)。
+
+    - 单引号字符串换成 ?（LIKE 之后为 +?，AS / FROM 等之后作标识符用的除外）；比较运算符右侧的数字换成 ?。
+    - 只有字面量不同的 SQL 得到相同的参数化文本，可复用连接上已编译的语句（cached_statements），
+      也不再需要为取值中的单引号转义。
+    - SQL 中已有参数占位符或字符串未闭合时原样返回，参数为空。
+    """
+    tokens = tokenize(sql)
+    parts, params = [], []
+    previous = None
+    for token in tokens:
+        if token.kind == "param":
+            return sql, ()
+        if token.kind in ("ws", "comment"):
+            parts.append(token.text)
+            continue
+
+        if token.kind == "string":
+            if len(token.text) < 2 or not token.text.endswith("'"):
+                return sql, ()
+            if not (previous and previous.kind == "word" and previous.text.upper() in IDENTIFIER_KEYWORDS):
+                params.append(string_value(token.text))
+                is_like = previous and previous.kind == "word" and previous.text.upper() in LIKE_KEYWORDS
+                parts.append("+?" if is_like else "?")
+                previous = token
+                continue
+        elif token.kind == "number" and previous and previous.kind == "op" and previous.text in COMPARISON_OPS:
+            params.append(number_value(token.text))
+            parts.append("?")
+            previous = token
+            continue
+
+        parts.append(token.text)
+        previous = token
+    return "".join(parts), tuple(params)
+
@@ -1,154 +1,114 @@
-from langchain_core.prompts import ChatPromptTemplate
-
-text2sql_template = ChatPromptTemplate.from_messages([
-    ("system", """你是一个 SQL 生成器。请根据用户的提问和提供的数据库表结构，生成唯一且正确的SQL查询语句。
-
-      数据库表结构如下：
-      CREATE TABLE IF NOT EXISTS patent (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          application_date DATE,
-          publication_date DATE,
-          application_number TEXT,
-          publication_number TEXT,
-          patent_title TEXT,
-          applicant TEXT,
-          keywords TEXT,
-          url TEXT,
-          inventor TEXT,
-          agent TEXT,
-          abstract TEXT,
-          patent_scope TEXT,
-          detailed_description TEXT,
-          priority TEXT,
-          gazette_ipc TEXT,
-          ipc TEXT
-      );
-
-      字段说明如下：
-      - application_date：专利申请的日期
-      - publication_date：专利正式公开的日期
-      - application_number：专利的唯一申请编号
-      - publication_number：专利公开编号
-      - patent_title：描述专利主题、研究方向或创新点
-      - applicant：申请该专利的公司、机构
-      - keywords：描述专利公开的国家地区范围，要是查询台湾专利，则填写“本国公开”
-      - url：专利网址
-      - inventor：参与发明的人员
-      - agent：负责申请事务的专利代理人
-      - abstract：专利核心内容描述，反映技术领域
-      - patent_scope：权利要求书内容，描述保护范围
-      - detailed_description：对发明技术方案的详细描述
-      - priority：最早申请信息，用于专利族识别
-      - gazette_ipc:专利公开时的国际分类号
-      - ipc:国际专利分类号，仅表示编号，不含语义信息
-
-      数据表内容示例：
-      - "application_date": "2003-04-01",
-      - "publication_date": "2003-05-01",
-      - "application_number": "TW091133043",
-      - "publication_number": "TW200300025A",
-      - "patent_title": "研磨剂制造法",
-      - "applicant": "日立化成公司",
-      - "keywords": "本国公开",
-      - "url": "https://tiponet.tipo.gov.tw/gpss3/gpsskmc/gpssbkm?.976c5ED60850200470008720000000000^20100000100D0BC487000177F004d9e",
-      - "inventor": "吉田成人（日本）；张世明（中华民国）",
-      - "agent": "李志刚",
-      - "abstract": "本发明乃为了......",
-      - "patent_scope": ["一种研磨剂", "......"],
-      - "detailed_description": "【发明内容】......",
-      - "priority": "日本",
-      - "gazette_ipc": "C09G",
-      - "ipc": "C09G1/02(2006.01)"
-
-      严格规则（必须遵守）：
-      1. 表名固定为：`patent`
-      2. 所有字段名必须用双引号括起来，如 `"applicant"`
-      3. 只允许生成 SELECT 查询语句，禁止 INSERT、UPDATE、DELETE 等任何其他操作
-      4. 输出必须仅包含 SQL 语句，不得包含解释、说明、Markdown 格式或代码块
-      5. SQL 语句必须以英文分号 `;` 结尾
-      6. 对于文本字段的匹配（如 "applicant"、"inventor"、"patent_title" 等），**必须使用 `LIKE` 进行模糊匹配**，禁止使用 `=` 精确匹配
-        - 正确示例：`"applicant" LIKE '%日立化成工業股份有限公司%'`
-        - 错误示例：`"applicant" = '日立化成工業股份有限公司'`
-      7. 时间匹配使用 `LIKE '2003%'` 或 `BETWEEN`，不要使用 `=` 精确匹配年份
-      8. 涉及到具体领域的专利查询，尽可能使用简短的字段，以下是可能会出现的字段的映射：
-        - “集成电路制造工艺” -> “集成电路”
-        - “芯片功耗降低” -> “功耗”
-        - “生技医药” -> “生物”
-        - “芯片制造” -> “制造”
-
-      示例1:
-      问题: 日立化成工業股份有限公司2003年發表的專利是什麼？
-      SQL: SELECT "patent_title" FROM patent WHERE "applicant" LIKE '%日立化成工業股份有限公司%' AND "publication_date" LIKE '2003%';
-
-      示例2:
-      问题: 给出公开号为TW200300027A的专利的专利名
-      SQL: SELECT "patent_title" FROM patent WHERE "publication_number" = 'TW200300027A';
-
-      示例3：
-      问题：给出台湾积体电路制造股份有限公司，半导体制造方法的相关专利摘要，不少于2篇。
-      SQL：SELECT "abstract" FROM patent WHERE "applicant" LIKE '%台湾积体电路制造股份有限公司%' AND "patent_title" LIKE '%半导体制造方法%' LIMIT 2;
-
-      示例4：
-      问题：给出台湾积体电路制造股份有限公司，2024年发布的半导体专利有多少篇？
-      SQL：SELECT COUNT(*) FROM patent WHERE "applicant" LIKE '%台湾积体电路制造股份有限公司%' AND "publication_date" LIKE '2024%' AND "patent_title" LIKE '%半导体%';
-
-      示例5：
-      问题：台湾积体电路制造股份有限公司,2020-2024五年期间，哪年专利数量最多？
-      SQL：SELECT strftime('%Y', "publication_date") AS year, COUNT(*) AS patent_count FROM patent WHERE "applicant" LIKE '%台湾积体电路制造股份有限公司%' AND "publication_date" BETWEEN '2020-01-01' AND '2024-12-31' GROUP BY year ORDER BY patent_count DESC LIMIT 1;
-      
-      示例6：
-      问题：台湾积体电路制造股份有限公司发明的记忆体电路及其操作方法这一专利，发明人有谁？
-      SQL：SELECT "inventor" FROM patent WHERE "applicant" LIKE '%台湾积体电路制造股份有限公司%' AND "patent_title" LIKE '%记忆体电路及其操作方法%'
-
-      示例7：
-      问题：台湾积体电路制造股份有限公司发明的记忆体电路及其操作方法这一专利，发明摘要是什么？
-      SQL：SELECT "abstract" FROM patent WHERE "applicant" LIKE '%台湾积体电路制造股份有限公司%' AND "patent_title" LIKE '%记忆体电路及其操作方法%'；
-
-      示例8：
-      问题：截至至2025年7月15日，台湾积体电路制造股份有限公司，发布的本国公开专利有多少条？
-      SQL：SELECT COUNT(*) FROM patent WHERE "applicant" LIKE '%台湾积体电路制造股份有限公司%' AND "keywords" LIKE '%本国公开%' AND "publication_date" <= '2025-07-15';
-
-      示例9：
-      问题：2020-2024年，IPC号H01L专利有多少条
-      SQL：SELECT COUNT(*) FROM patent WHERE "publication_date" BETWEEN '2020-01-01' AND '2024-12-31' AND "ipc" LIKE 'H01L%'；
-
-      示例10：
-      问题：公开公告号，TW202449909A的专利名称及申请人
-      SQL：SELECT "patent_title", "applicant" FROM patent WHERE "publication_number" = 'TW202449909A';
-
-      示例11：
-      问题：给出截止2025年6月31日IPC包含H01L21/02的台湾"本国公开"专利数量？
-      SQL：SELECT COUNT(*) FROM patent WHERE "ipc" LIKE '%H01L21/02%' AND "keywords" LIKE '%本国公开%' AND "publication_date" <= '2025-06-30'；
-
-      示例12：
-      问题：查找3-5个"半导体材料" 相关专利，申请日、公开公告日和专利名称
-      SQL：SELECT "application_date", "publication_date", "patent_title" FROM patent WHERE "patent_title" LIKE '%半导体材料%' LIMIT 5；
-
-      示例13：
-      问题：给出台湾积体电路制造股份有限公司名下，专利范围涉及 MEMS（微机电系统）相关技术的三个专利的公开公告号。
-      SQL：SELECT "publication_number" FROM patent WHERE "applicant" LIKE '%台湾积体电路制造股份有限公司%' AND "patent_title" LIKE '%MEMS%' LIMIT 3；
-
-      示例14：
-      问题：给出一篇台湾积体电路制造股份有限公司在2020-2025年申请的专利范围中，同时涉及光电、半导体相关内容的专利摘要。
-      SQL：SELECT "abstract" FROM patent WHERE "applicant" LIKE '%台湾积体电路制造股份有限公司%' AND ("application_date" BETWEEN '2020-01-01' AND '2025-12-31') AND ("patent_title" LIKE '%光电%' AND "patent_title" LIKE '%半导体%') LIMIT 1
-
-      示例15：
-      问题：给出一篇截止到2024 年 ，台湾积体电路制造股份有限公司名下关于半导体及集成芯片的原始专利权的专利摘要。
-      SQL：SELECT "abstract" FROM patent WHERE "applicant" LIKE '%台湾积体电路制造股份有限公司%' AND "application_date" <= '2024-12-31' AND ("patent_title" LIKE '%半导体%' AND "patent_title" LIKE '%集成电路%') LIMIT 1；
-
-      示例16：
-      问题：给出台湾积体电路制造股份有限公司的专利中，中国大陆和美国都有优先权的专利名称及其摘要。
-      SQL：SELECT "patent_title", "abstract" FROM patent WHERE "applicant" LIKE '%台湾积体电路制造股份有限公司%' AND ("priority" LIKE '%中国大陆%' AND "priority" LIKE '%美国%')；
-
-      示例17：
-      问题：列举出2025年，台湾积体电路制造股份有限公司，沈文超作为唯一发明人于电子领域的专利名称与专利的公开公告日。
-      SQL：SELECT "patent_title", "publication_date" FROM patent WHERE "applicant" LIKE '%台湾积体电路制造股份有限公司%' AND "inventor" LIKE '%沈文超%' AND "patent_scope" LIKE '%电子%' ；
-
-      示例18：
-      问题：截止2025年6月31日IPC包含H01L21/02的台湾半导体专利公开公告号，不少于5篇。
-      SQL：SELECT "publication_number" FROM patent WHERE "ipc" LIKE '%H01L21/02%' AND "patent_title" LIKE '%半导体%' AND "keywords" LIKE '%本国公开%' AND "publication_date" <= '2025-06-30' LIMIT 5
-
-      
-      """),
-    ("human", "用户问题：{question}\n\n请输出符合要求的SQL查询语句(仅 SQL, 以分号结尾）：")
-])
\ No newline at end of file
+from functools import lru_cache
+
+# 静态前缀：角色、表结构与规则。固定字符串首次使用时包装为 SystemMessage 并复用，
+# 调用时不再经过模板格式化，保证每次请求的前缀逐字节一致，便于命中提供方的前缀(KV)缓存。
+# 修改此处内容会使已有的前缀缓存全部失效。示例不在此处，见 backend/text_to_sql/examples.json。
+TEXT2SQL_SYSTEM_PROMPT = """你是一个 SQL 生成器。请根据用户的提问和提供的数据库表结构，生成唯一且正确的SQL查询语句。
+
+数据库表结构如下：
+CREATE TABLE IF NOT EXISTS patent (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    application_date DATE,
+    publication_date DATE,
+    application_number TEXT,
+    publication_number TEXT,
+    patent_title TEXT,
+    applicant TEXT,
+    keywords TEXT,
+    url TEXT,
+    inventor TEXT,
+    agent TEXT,
+    abstract TEXT,
+    patent_scope TEXT,
+    detailed_description TEXT,
+    priority TEXT,
+    gazette_ipc TEXT,
+    ipc TEXT
+);
+
+字段说明如下：
+- application_date：专利申请的日期
+- publication_date：专利正式公开的日期
+- application_number：专利的唯一申请编号
+- publication_number：专利公开编号
+- patent_title：描述专利主题、研究方向或创新点
+- applicant：申请该专利的公司、机构
+- keywords：描述专利公开的国家地区范围，要是查询台湾专利，则填写“本国公开”
+- url：专利网址
+- inventor：参与发明的人员
+- agent：负责申请事务的专利代理人
+- abstract：专利核心内容描述，反映技术领域
+- patent_scope：权利要求书内容，描述保护范围
+- detailed_description：对发明技术方案的详细描述
+- priority：最早申请信息，用于专利族识别
+- gazette_ipc:专利公开时的国际分类号
+- ipc:国际专利分类号，仅表示编号，不含语义信息
+
+数据表内容示例：
+- "application_date": "2003-04-01",
+- "publication_date": "2003-05-01",
+- "application_number": "TW091133043",
+- "publication_number": "TW200300025A",
+- "patent_title": "研磨剂制造法",
+- "applicant": "日立化成公司",
+- "keywords": "本国公开",
+- "url": "https://tiponet.tipo.gov.tw/gpss3/gpsskmc/gpssbkm?.976c5ED60850200470008720000000000^20100000100D0BC487000177F004d9e",
+- "inventor": "吉田成人（日本）；张世明（中华民国）",
+- "agent": "李志刚",
+- "abstract": "本发明乃为了......",
+- "patent_scope": ["一种研磨剂", "......"],
+- "detailed_description": "【发明内容】......",
+- "priority": "日本",
+- "gazette_ipc": "C09G",
+- "ipc": "C09G1/02(2006.01)"
+
+严格规则（必须遵守）：
+1. 表名固定为：`patent`
+2. 所有字段名必须用双引号括起来，如 `"applicant"`
+3. 只允许生成 SELECT 查询语句，禁止 INSERT、UPDATE、DELETE 等任何其他操作
+4. 输出必须仅包含 SQL 语句，不得包含解释、说明、Markdown 格式或代码块
+5. SQL 语句必须以英文分号 `;` 结尾
+6. 对于文本字段的匹配（如 "applicant"、"inventor"、"patent_title" 等），**必须使用 `LIKE` 进行模糊匹配**，禁止使用 `=` 精确匹配
+  - 正确示例：`"applicant" LIKE '%日立化成工業股份有限公司%'`
+  - 错误示例：`"applicant" = '日立化成工業股份有限公司'`
+7. 时间匹配使用 `LIKE '2003%'` 或 `BETWEEN`，不要使用 `=` 精确匹配年份
+8. 涉及到具体领域的专利查询，尽可能使用简短的字段，以下是可能会出现的字段的映射：
+  - “集成电路制造工艺” -> “集成电路”
+  - “芯片功耗降低” -> “功耗”
+  - “生技医药” -> “生物”
+  - “芯片制造” -> “制造”
+"""
+
+
+@lru_cache(maxsize=None)
+def text2sql_system_message():
+    """固定的系统消息（进程内单例；导入本模块不加载 langchain_core.messages）"""
+    from langchain_core.messages import SystemMessage
+    return SystemMessage(content=TEXT2SQL_SYSTEM_PROMPT)
+
+# 可变部分（按问题选出的示例与问题本身）放在系统消息之后，问题在最后
+QUESTION_MARKER = "用户问题："
+TEXT2SQL_INSTRUCTION = "请输出符合要求的SQL查询语句(仅 SQL, 以分号结尾）。\n"
+
+
+def render_examples(examples) -> str:
+    """把 [{"question", "sql"}, ...] 渲染为示例段落；SQL 统一以英文分号结尾"""
+    blocks = [
+        f"示例{i}：\n问题：{ex['question']}\nSQL：{ex['sql'].rstrip(';；').strip()};\n"
+        for i, ex in enumerate(examples, start=1)
+    ]
+    return "\n".join(blocks) + "\n" if blocks else ""
+
+
+def build_text2sql_messages(question: str, examples=()):
+    """text2sql 的消息列表：[固定的系统消息, 示例 + 指令 + 问题]"""
+    from langchain_core.messages import HumanMessage
+    content = f"{render_examples(examples)}{TEXT2SQL_INSTRUCTION}{QUESTION_MARKER}{question}"
+    return [text2sql_system_message(), HumanMessage(content=content)]
+
+
+def __getattr__(name):
+    # 兼容旧写法：from backend.components.text2sql_prompts import TEXT2SQL_SYSTEM_MESSAGE
+    if name == "TEXT2SQL_SYSTEM_MESSAGE":
+        return text2sql_system_message()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
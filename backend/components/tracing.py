@@ -0,0 +1,246 @@
+import os
+import json
+import math
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# 每个 span 结束时追加一行 JSON 到该文件（为空时不写），用于离线分析单个请求的各阶段耗时
+TRACE_LOG_PATH = os.getenv("QA_TRACE_LOG", "")
+# 直方图的相对精度：桶宽为取值的 2%（HDR 风格的对数分桶，内存占用与样本数无关）
+HISTOGRAM_PRECISION = 0.02
+HISTOGRAM_MIN_VALUE = 1e-6
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+# span 属性到直方图的映射：属性名 -> (指标名, 额外标签)
+ATTRIBUTE_METRICS = {
+    "rows": ("qa_stage_rows", {}),
+    "bytes": ("qa_stage_bytes", {}),
+    "input_tokens": ("qa_stage_tokens", {"kind": "input"}),
+    "output_tokens": ("qa_stage_tokens", {"kind": "output"}),
+    "cached_tokens": ("qa_stage_tokens", {"kind": "cached"}),
+}
+METRIC_HELP = {
+    "qa_stage_seconds": "问答流水线各阶段耗时（秒）",
+    "qa_stage_rows": "各阶段处理的行数",
+    "qa_stage_bytes": "各阶段产出的字节数",
+    "qa_stage_tokens": "各阶段大模型调用的 token 数",
+    "qa_stage_errors_total": "各阶段出错次数",
+}
+
+
+class Histogram:
+    """对数分桶直方图：相对误差不超过 HISTOGRAM_PRECISION 的分位数估计，线程安全"""
+
+    def __init__(self, precision: float = HISTOGRAM_PRECISION, min_value: float = HISTOGRAM_MIN_VALUE):
+        self.precision = precision
+        self.min_value = min_value
+        self._log_base = math.log1p(precision)
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def _index(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        return int(math.ceil(math.log(value / self.min_value) / self._log_base))
+
+    def record(self, value: float):
+        value = float(value)
+        index = self._index(value)
+        with self._lock:
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+            self.count += 1
+            self.sum += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q: float) -> float:
+        """第 q 分位数（0 < q <= 1）的估计值，取所在桶的上界并限制在 [min, max] 内"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, math.ceil(q * self.count))
+            seen = 0
+            for index in sorted(self._buckets):
+                seen += self._buckets[index]
+                if seen >= rank:
+                    upper = self.min_value * (1 + self.precision) ** index
+                    return min(max(upper, self.min), self.max)
+            return self.max
+
+    def snapshot(self) -> dict:
+        result = {"count": self.count, "sum": self.sum, "min": self.min or 0.0, "max": self.max or 0.0}
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}"] = self.percentile(q)
+        return result
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """进程内指标：按 (指标名, 标签) 保存直方图与计数器，可导出为 Prometheus 文本或 JSON lines"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, metric: str, value: float, **labels):
+        key = (metric, _label_key(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        histogram.record(value)
+
+    def increment(self, metric: str, amount: float = 1, **labels):
+        key = (metric, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def histogram(self, metric: str, **labels):
+        return self._histograms.get((metric, _label_key(labels)))
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def stage_summary(self) -> dict:
+        """{阶段: {"count", "p50", "p95", "p99", ...}}，单位为秒"""
+        with self._lock:
+            items = [(dict(labels).get("stage"), h) for (metric, labels), h in self._histograms.items()
+                     if metric == "qa_stage_seconds"]
+        return {stage: h.snapshot() for stage, h in items}
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式：直方图导出为 summary（分位数 + _sum + _count），计数器导出为 counter"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        lines = []
+        declared = set()
+
+        def declare(metric, kind):
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# HELP {metric} {METRIC_HELP.get(metric, metric)}")
+                lines.append(f"# TYPE {metric} {kind}")
+
+        def render(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}" if pairs else ""
+
+        for (metric, labels), histogram in histograms:
+            declare(metric, "summary")
+            snapshot = histogram.snapshot()
+            for q in QUANTILES:
+                value = snapshot[f"p{int(q * 100)}"]
+                lines.append(f"{metric}{render(labels, [('quantile', q)])} {value:.6g}")
+            lines.append(f"{metric}_sum{render(labels)} {snapshot['sum']:.6g}")
+            lines.append(f"{metric}_count{render(labels)} {snapshot['count']}")
+        for (metric, labels), value in counters:
+            declare(metric, "counter")
+            lines.append(f"{metric}{render(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def to_jsonl(self) -> str:
+        """每个直方图 / 计数器一行 JSON"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        lines = []
+        for (metric, labels), histogram in histograms:
+            lines.append(json.dumps({"metric": metric, "labels": dict(labels), **histogram.snapshot()},
+                                    ensure_ascii=False))
+        for (metric, labels), value in counters:
+            lines.append(json.dumps({"metric": metric, "labels": dict(labels), "value": value}, ensure_ascii=False))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """按扩展名导出：.prom / .txt 为 Prometheus 文本，其余为 JSON lines"""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_jsonl()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+metrics = MetricsRegistry()
+
+_current_span = contextvars.ContextVar("qa_current_span", default=None)
+_trace_lock = threading.Lock()
+
+
+class Span:
+    """一个阶段的计时记录；attrs 中的数值属性（见 ATTRIBUTE_METRICS）在结束时计入直方图"""
+
+    def __init__(self, name: str, parent=None, **attrs):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attrs = dict(attrs)
+        self.start = time.time()
+        self._perf_start = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        return self
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._perf_start
+        record_stage(self.name, self.duration, **self.attrs)
+        if TRACE_LOG_PATH:
+            record = {"trace": self.trace_id, "span": self.span_id, "parent": self.parent_id, "name": self.name,
+                      "start": round(self.start, 6), "ms": round(self.duration * 1000, 3), **self.attrs}
+            with _trace_lock, open(TRACE_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+def record_stage(stage: str, seconds: float, **attrs):
+    """直接记录一个阶段的耗时与数值属性（用于无法包在 with 块中的场景，如流式生成）"""
+    metrics.observe("qa_stage_seconds", seconds, stage=stage)
+    for key, value in attrs.items():
+        if key in ATTRIBUTE_METRICS and isinstance(value, (int, float)) and not isinstance(value, bool):
+            metric, labels = ATTRIBUTE_METRICS[key]
+            metrics.observe(metric, value, stage=stage, **labels)
+    if attrs.get("error"):
+        metrics.increment("qa_stage_errors_total", stage=stage)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """阶段计时：with span("query") as s: ...; s.set(rows=n)。
+
+    嵌套的 span 共享同一 trace_id（通过 contextvars 传递，asyncio 任务与 copy_context 的线程同样适用）；
+    块内抛出异常时记录 error 属性后继续抛出。
+    """
+    current = Span(name, _current_span.get(), **attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+
+
+def current_span():
+    return _current_span.get()
+
+
+def annotate(**attrs):
+    """为当前 span 补充属性（不在任何 span 内时忽略）"""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attrs)
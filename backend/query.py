@@ -1,32 +1,571 @@
 import os
+import re
+import time
+import asyncio
 import sqlite3
+import threading
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.components.db_pool import get_pool
+from backend.components.context_budget import render_row, select_context_rows, summarize_rows
+from backend.components.sql_params import parameterize, tokenize
+from backend.components.log import get_logger, preview
+from backend.components.result_cache import estimate_size
+from backend.components.tracing import annotate, span
+from backend.components.query_guard import (
+    DEGRADED_ROW_CAP, QueryTimeout, classify_plan, is_expensive, log_query, query_budget,
+)
+from backend.sqlite.fts_index import fts_columns, rewrite_like_to_fts
+from backend.sqlite.entity_index import entity_index_exists, rewrite_entity_like
+from backend.sqlite.rollup import ROLLUP_TABLE, ROLLUP_COLUMNS, IPC_HEAD_CHARS, rollup_ready
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
+logger = get_logger("query")
 DB_PATH = os.path.join(current_dir, "sqlite", "patents.db")
 
+TABLE = "patent"
+IPC_TABLE = "patent_ipc"
+
+# 大文本列：首轮查询不取回，回答阶段只为写入上下文的行按 id 补取
+HEAVY_COLUMNS = ("abstract", "patent_scope", "detailed_description")
+# 问题中出现这些词时才补取对应的大文本列；abstract 作为专利信息的主要来源默认补取
+HEAVY_COLUMN_HINTS = {
+    "abstract": (),
+    "patent_scope": ("专利范围", "权利要求", "請求項", "请求项"),
+    "detailed_description": ("说明书", "詳細說明", "详细说明", "详细描述", "实施方式", "实施例"),
+}
+
+# 异步查询使用的只读线程数（每个线程在连接池中持有一个连接）
+READER_THREADS = int(os.getenv("SQLITE_READER_THREADS", "8"))
+
+# 执行前把 SQL 中的字面量提取为绑定参数（见 backend/components/sql_params.py），SQL_PARAMETERIZE=0 时关闭
+PARAMETERIZE = os.getenv("SQL_PARAMETERIZE", "1") != "0"
+
+# 非聚合查询最多取回的行数（<=0 表示不限制）、每批 fetchmany 的行数、日志预览的最大字符数
+ROW_CAP = int(os.getenv("QUERY_ROW_CAP", "200"))
+FETCH_BATCH_SIZE = 500
+LOG_PREVIEW_CHARS = 500
+
+aggregate_pattern = re.compile(
+    r"\b(?:count|sum|avg|min|max|total|group_concat)\s*\(|\bgroup\s+by\b", re.IGNORECASE
+)
+
+# 匹配 [别名.]"ipc"/"gazette_ipc" LIKE '[%]H01L21/02%'，值须至少包含到小类（如 H01L）
+ipc_like_pattern = re.compile(
+    r"""(?P<prefix>\b\w+\s*\.\s*)?"(?P<field>ipc|gazette_ipc)"\s+LIKE\s+'(?P<lead>%?)(?P<value>[A-H]\d{2}[A-Z][0-9/ ]*)%'(?!\s*ESCAPE)""",
+    re.IGNORECASE,
+)
+not_pattern = re.compile(r"\bNOT\b", re.IGNORECASE)
+
+# 计数查询路由到汇总表时允许出现的 SQL 函数（COUNT 只允许 COUNT(*)）
+ROLLUP_FUNCTIONS = {"count", "strftime", "substr", "like", "between", "date", "lower", "upper"}
+count_star_pattern = re.compile(r"\bCOUNT\s*\(\s*\*\s*\)(?P<alias>\s+AS\b)?", re.IGNORECASE)
+count_call_pattern = re.compile(r"\bCOUNT\s*\(", re.IGNORECASE)
+from_table_pattern = re.compile(r'\bFROM\s+"?patent"?(?![\w"])', re.IGNORECASE)
+select_pattern = re.compile(r"\bSELECT\b", re.IGNORECASE)
+ipc_mention_pattern = re.compile(r'(?<![\w"])"?ipc"?(?![\w"])', re.IGNORECASE)
+ipc_head_like_pattern = re.compile(
+    rf"""(?<![\w"])"?ipc"?\s+LIKE\s+'[A-Za-z0-9]{{1,{IPC_HEAD_CHARS}}}%'""", re.IGNORECASE
+)
+
+
+def ipc_table_exists(conn: sqlite3.Connection) -> bool:
+    """IPC 规范化附表（由 backend/sqlite/clean_ipc.py 生成）是否存在"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (IPC_TABLE,)
+    ).fetchone() is not None
+
+
+def rewrite_ipc_like(sql_query: str) -> str:
+    """将 IPC 字段上的 LIKE 改写为 patent_ipc 附表上的索引前缀区间查找。
+
+    - "ipc" LIKE '%H01L21/02%'：任一 IPC 编号以 H01L21/02 开头
+      （编号中字母只出现在部和小类位置，子串必然从编号开头匹配）。
+    - "ipc" LIKE 'H01L%'：字段开头即第一个编号（position = 0）以 H01L 开头。
+    - 前缀 P 改写为区间 code >= P AND code < P'（P' 为 P 末字符加一），可直接走 B-tree 索引。
+    - 附表中的编号经过清洗（去掉编号内部与前后的空白），区间查找得到的是原 LIKE 结果的超集；
+      原 LIKE 作为候选行上的过滤条件保留，值中的空白、字段开头的空格等与原 SQL 语义完全一致。
+    - SQL 中出现 NOT 时保持原样。
+    """
+    if not_pattern.search(sql_query):
+        return sql_query
+
+    def replace_match(m):
+        value = re.sub(r"\s+", "", m.group("value")).upper()
+        upper = value[:-1] + chr(ord(value[-1]) + 1)
+        conditions = [
+            f"field = '{m.group('field').lower()}'",
+            f"code >= '{value}'",
+            f"code < '{upper}'",
+        ]
+        if not m.group("lead"):
+            conditions.append("position = 0")
+        prefix = m.group("prefix") or ""
+        lookup = f"{prefix}\"id\" IN (SELECT patent_id FROM {IPC_TABLE} WHERE {' AND '.join(conditions)})"
+        return f"({lookup} AND {m.group(0)})"
+
+    return ipc_like_pattern.sub(replace_match, sql_query)
+
+
+def referenced_columns(conn: sqlite3.Connection, sql_query: str):
+    """借助 SQLite 的授权回调解析 SQL，返回 (读取的 (表, 列) 集合, 调用的函数名集合)。
+
+    只执行 EXPLAIN（编译但不运行查询）；视图内部的读取不计入，只统计 SQL 本身引用的列。
+    """
+    reads, functions = set(), set()
+
+    def authorizer(action, arg1, arg2, db_name, source):
+        if source is None:
+            if action == sqlite3.SQLITE_READ and arg2:
+                reads.add((arg1, arg2))
+            elif action == sqlite3.SQLITE_FUNCTION:
+                functions.add(arg2.lower())
+        return sqlite3.SQLITE_OK
+
+    sql = sql_query.strip().rstrip(";；").strip()
+    conn.set_authorizer(authorizer)
+    try:
+        conn.execute(f"EXPLAIN {sql}").fetchall()
+    finally:
+        conn.set_authorizer(None)
+    return reads, functions
+
+
+def route_to_rollup(sql_query: str, conn: sqlite3.Connection):
+    """查询路由：只涉及汇总维度的计数 / 分组计数查询改由 patent_rollup 回答。
+
+    满足以下条件时把 FROM patent 换成汇总表、COUNT(*) 换成 COALESCE(SUM(cnt), 0)，
+    WHERE / GROUP BY / ORDER BY 原样保留，结果与原 SQL 一致：
+    - 单个 SELECT、只读 patent 一张表，且读取的列都在 ROLLUP_COLUMNS 中；
+    - 聚合只有 COUNT(*)，其余函数属于 ROLLUP_FUNCTIONS；
+    - "ipc" 只以 LIKE '小类前缀%' 形式出现（汇总表只保存前 4 个字符）。
+    不满足时返回 None。汇总表须由 backend/sqlite/rollup.py 生成且与 patent 表同步，由调用方检查。
+    """
+    stars = list(count_star_pattern.finditer(sql_query))
+    if not stars or len(count_call_pattern.findall(sql_query)) != len(stars):
+        return None
+    if len(select_pattern.findall(sql_query)) != 1 or len(from_table_pattern.findall(sql_query)) != 1:
+        return None
+    if len(ipc_mention_pattern.findall(sql_query)) != len(ipc_head_like_pattern.findall(sql_query)):
+        return None
+
+    try:
+        reads, functions = referenced_columns(conn, sql_query)
+    except sqlite3.Error:
+        return None
+    if {table for table, _ in reads} - {"patent"}:
+        return None
+    if {column.lower() for _, column in reads} - set(ROLLUP_COLUMNS) or functions - ROLLUP_FUNCTIONS:
+        return None
+
+    from_match = from_table_pattern.search(sql_query)
+
+    def replace_count(m):
+        # 投影中未起别名的 COUNT(*) 保留原列名，使结果列名与原 SQL 一致
+        if m.start() < from_match.start() and not m.group("alias"):
+            return 'COALESCE(SUM(cnt), 0) AS "COUNT(*)"'
+        return "COALESCE(SUM(cnt), 0)" + (m.group("alias") or "")
+
+    routed = count_star_pattern.sub(replace_count, sql_query)
+    return from_table_pattern.sub(f"FROM {ROLLUP_TABLE}", routed)
+
+
+def rewrite_query(sql_query: str, conn: sqlite3.Connection, metadata=None) -> str:
+    """执行前的 SQL 改写阶段：在不改变结果行的前提下，把可走索引的谓词改写为索引查找。
+
+    - 汇总表可用且为可路由的计数查询时，直接改由汇总表回答（见 route_to_rollup），不再做其它改写；
+      申请人/发明人条件可走实体索引时不路由，保证计数与列表查询对名称的匹配口径一致。
+    - IPC 字段上的前缀 LIKE 改写为 patent_ipc 附表的区间查找（见 backend/sqlite/clean_ipc.py）。
+    - 申请人/发明人字段上的 LIKE 改写为实体索引查找（见 backend/sqlite/entity_index.py），
+      繁简、别名写法都能命中。
+    - LIKE '%值%' 且字段已建立全文索引时，改写为 FTS5 MATCH 子查询（见 backend/sqlite/fts_index.py）。
+    - 对应索引不存在时原样返回。
+    - metadata 为连接级缓存字典，传入时索引信息只在每个连接上探测一次。
+    """
+    metadata = {} if metadata is None else metadata
+    if "entity_index" not in metadata:
+        metadata["entity_index"] = entity_index_exists(conn)
+    entity_sql = rewrite_entity_like(sql_query) if metadata["entity_index"] else sql_query
+
+    if "rollup" not in metadata:
+        metadata["rollup"] = rollup_ready(conn)
+    if metadata["rollup"] and entity_sql == sql_query:
+        routed = route_to_rollup(sql_query, conn)
+        if routed is not None:
+            return routed
+    sql_query = entity_sql
+
+    if "ipc_table" not in metadata:
+        metadata["ipc_table"] = ipc_table_exists(conn)
+    if metadata["ipc_table"]:
+        sql_query = rewrite_ipc_like(sql_query)
+
+    if "fts_columns" not in metadata:
+        metadata["fts_columns"] = fts_columns(conn)
+    columns = metadata["fts_columns"]
+    if columns:
+        sql_query = rewrite_like_to_fts(sql_query, columns)
+    return sql_query
+
+
+def bind_literals(sql_query: str):
+    """执行前的参数化阶段：返回 (SQL, 参数)。
+
+    改写阶段依赖字面量，须在 rewrite_query 之后调用；之后的投影裁剪、行数上限只包裹或追加 SQL，
+    参数顺序不变。关闭参数化时返回原 SQL 与空参数。
+    """
+    if not PARAMETERIZE:
+        return sql_query, ()
+    return parameterize(sql_query.strip().rstrip(";；").strip())
+
+
+def result_columns(conn: sqlite3.Connection, sql_query: str, params=()) -> list:
+    """由 SQLite 自身解析 SQL 得到结果列名（星号已展开），不取回任何行"""
+    sql = sql_query.strip().rstrip(";；").strip()
+    cur = conn.execute(f"SELECT * FROM ({sql}) LIMIT 0", params)
+    try:
+        return [d[0] for d in cur.description or []]
+    finally:
+        cur.close()
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def prune_projection(sql_query: str, conn: sqlite3.Connection, params=()):
+    """投影裁剪：结果中的大文本列（HEAVY_COLUMNS）改为 NULL 占位，推迟到回答阶段按 id 补取。
+
+    结果列由 SQLite 解析得到（含 * 与 table.* 的展开），外层只选出其余列；
+    子查询被展平后 SQLite 不会再读取未被引用的大文本列。列位置保持不变，
+    上下文构建沿用 “末三项为 id、URL、专利名” 的约定。
+    返回 (改写后的 SQL, 被推迟的列名)；结果中没有 id 列或列名重复时保持原样。
+    params 为参数化 SQL 的绑定参数，外层包裹不改变参数顺序。
+    """
+    try:
+        columns = result_columns(conn, sql_query, params)
+    except sqlite3.Error:
+        # 无法解析时保持原样，由正式执行报告错误
+        return sql_query, []
+    deferred = [c for c in columns if c.lower() in HEAVY_COLUMNS]
+    if not deferred or "id" not in columns or len(set(columns)) != len(columns):
+        return sql_query, []
+
+    projection = ", ".join(
+        f"NULL AS {quote_identifier(c)}" if c in deferred else quote_identifier(c)
+        for c in columns
+    )
+    sql = sql_query.strip().rstrip(";；").strip()
+    return f"SELECT {projection} FROM ({sql})", deferred
+
+
+def columns_for_question(question: str, deferred) -> list:
+    """回答阶段需要补取的大文本列：abstract 默认补取，其余列只在问题提及时补取"""
+    return [
+        c for c in deferred
+        if not HEAVY_COLUMN_HINTS.get(c.lower(), ()) or any(h in (question or "") for h in HEAVY_COLUMN_HINTS[c.lower()])
+    ]
+
+
+def fetch_by_id(ids, columns) -> dict:
+    """按 id 批量取回指定列，返回 {id: (列值, ...)}"""
+    if not ids or not columns:
+        return {}
+    pool = get_pool(DB_PATH)
+    conn = pool.connection()
+    projection = ", ".join(quote_identifier(c) for c in columns)
+    placeholders = ", ".join("?" for _ in ids)
+    cur = conn.execute(f'SELECT "id", {projection} FROM {TABLE} WHERE "id" IN ({placeholders})', list(ids))
+    try:
+        return {row[0]: row[1:] for row in cur.fetchall()}
+    finally:
+        cur.close()
+
+
+class QueryRows(list):
+    """查询结果行列表，附带列名（cursor.description）与截断信息。
 
+    - columns：列名，供上下文构建按字段处理
+    - total_count：满足条件的总行数（未截断时等于 len）
+    - truncated：是否因行数上限只保留了前 ROW_CAP 行
+    - deferred：投影裁剪时以 NULL 占位、尚未取回的大文本列
+    - degraded：是否因超出时间预算或查询降级只取回了部分行（或未能完成计数探测），此时 total_count 只是下限
+    """
+
+    def __init__(self, rows=(), columns=None, total_count=None, truncated=False, deferred=None, degraded=False):
+        super().__init__(rows)
+        self.columns = list(columns or [])
+        self.total_count = len(self) if total_count is None else total_count
+        self.truncated = truncated
+        self.deferred = list(deferred or [])
+        self.degraded = degraded
+
+    def copy_with(self, rows, deferred=None):
+        """以新的行替换内容，其余属性保持不变"""
+        return QueryRows(rows, self.columns, self.total_count, self.truncated,
+                         self.deferred if deferred is None else deferred, self.degraded)
+
+
+def significant_tokens(sql_query: str):
+    """按 sql_params 切分 SQL，去掉空白、注释与末尾的分号（字符串中的内容不受影响）"""
+    tokens = [t for t in tokenize(sql_query) if t.kind not in ("ws", "comment")]
+    while tokens and tokens[-1].text in (";", "；"):
+        tokens.pop()
+    return tokens
+
+
+def strip_sql_tail(sql_query: str) -> str:
+    """去掉 SQL 末尾的空白、注释与分号，便于在其后追加子句或包进子查询"""
+    tokens = tokenize(sql_query)
+    end = len(tokens)
+    while end and (tokens[end - 1].kind in ("ws", "comment") or tokens[end - 1].text in (";", "；")):
+        end -= 1
+    return "".join(t.text for t in tokens[:end])
+
+
+def trailing_limit(tokens):
+    """识别最外层末尾的 LIMIT 子句，返回 (LIMIT 的位置, 行数, 偏移量)。
+    支持 LIMIT n、LIMIT n OFFSET m 与 LIMIT m, n；最外层有 LIMIT 但不是这几种字面量形式
+    （绑定参数、表达式等）时行数为 None；没有最外层 LIMIT 时返回 None。"""
+    depth, position = 0, None
+    for i, token in enumerate(tokens):
+        if token.text == "(":
+            depth += 1
+        elif token.text == ")":
+            depth -= 1
+        elif depth == 0 and token.kind == "word" and token.text.upper() == "LIMIT":
+            position = i
+    if position is None:
+        return None
+    clause = [t.text.upper() if t.kind == "word" else t.text for t in tokens[position + 1:]]
+    kinds = [t.kind for t in tokens[position + 1:]]
+    if kinds == ["number"]:
+        return position, int(clause[0]), None
+    if kinds == ["number", "word", "number"] and clause[1] == "OFFSET":
+        return position, int(clause[0]), clause[2]
+    if kinds == ["number", "op", "number"] and clause[1] == ",":
+        return position, int(clause[2]), clause[0]
+    return position, None, None
+
+
+def apply_row_cap(sql_query: str, row_cap: int):
+    """为非聚合查询加上外层行数上限，多取 1 行用于判断是否截断。
+
+    返回 (改写后的 SQL, 是否加了上限)。聚合/分组查询结果很小，保持原样；
+    已有不超过上限的 LIMIT 也保持原样，更大的 LIMIT（含 LIMIT m, n 写法）收紧到 row_cap + 1；
+    LIMIT 不是字面量时包成 SELECT * FROM (...) LIMIT row_cap + 1。末尾的注释与分号先去掉。
+    """
+    if row_cap is None or row_cap <= 0 or aggregate_pattern.search(sql_query):
+        return sql_query, False
+
+    tokens = significant_tokens(sql_query)
+    sql = strip_sql_tail(sql_query).strip()
+    limit = trailing_limit(tokens)
+    if limit is None:
+        return f"{sql} LIMIT {row_cap + 1}", True
+    position, rows, offset = limit
+    if rows is None:
+        return f"SELECT * FROM ({sql}) LIMIT {row_cap + 1}", True
+    if rows <= row_cap:
+        return sql_query, False
+    start = tokens[position].start - (len(sql_query) - len(sql_query.lstrip()))
+    return f"{sql[:start]}LIMIT {row_cap + 1}{f' OFFSET {offset}' if offset else ''}", True
+
+
+def count_rows(conn: sqlite3.Connection, sql_query: str, params=()) -> int:
+    """计数探测：统计 SQL 的总结果行数，不把行内容取回 Python"""
+    sql = strip_sql_tail(sql_query).strip()
+    return conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+
+
+def log_rows(rows: QueryRows):
+    """输出大小受限的查询日志：行数、是否截断，DEBUG 级别时附带前几行的截断预览"""
+    suffix = ""
+    if rows.truncated:
+        suffix = f"（{'至少' if rows.degraded else '共'} {rows.total_count} 行，已截断）"
+    logger.info("查询结果：%d 行%s", len(rows), suffix)
+    logger.debug("查询结果预览：%s", preview(rows[:3], LOG_PREVIEW_CHARS))
+
+
+def iter_query(sql_query: str, batch_size: int = FETCH_BATCH_SIZE):
+    """流式查询：按 fetchmany 批次逐行产出，内存占用与结果总行数无关"""
+    pool = get_pool(DB_PATH)
+    conn = pool.connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(*bind_literals(rewrite_query(sql_query, conn, pool.metadata())))
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if not batch:
+                break
+            yield from batch
+    except sqlite3.Error as e:
+        raise sqlite3.Error(f"SQL执行错误: {str(e)}")
+    finally:
+        cur.close()
+
+
+def run_query(sql_query: str, row_cap: int = None, stream: bool = False, prune: bool = True,
+              cancel: threading.Event = None):
+    """执行查询并返回 QueryRows。
+
+    - 非聚合查询自动加外层 LIMIT（默认 ROW_CAP），超出时再做一次 COUNT(*) 探测得到 total_count
+      （降级查询不做探测，total_count 只是下限，degraded=True）。
+    - prune=True 时大文本列以 NULL 占位（见 prune_projection），由 load_deferred_columns 按需补取。
+    - stream=True 时返回 iter_query 生成器，不加行数上限，也不裁剪投影。
+    - 改写后的字面量提取为绑定参数（见 bind_literals），只有字面量不同的查询复用已编译的语句。
+    - 执行前用 EXPLAIN QUERY PLAN 分类（见 backend/components/query_guard.py）：大文本列全表扫描、
+      多表扫描连接等代价高的非聚合查询降级：行数上限收紧为 DEGRADED_ROW_CAP，扫描可以更早结束。
+    - 执行受 SQL_QUERY_BUDGET 时间预算约束（cancel 被置位时同样中断）：非聚合查询返回已取回的部分行
+      （degraded=True），聚合查询或尚未取回任何行时抛出 QueryTimeout。
+    """
+    if stream:
+        return iter_query(sql_query)
+    with span("query") as query_span:
+        result = _run_query(sql_query, row_cap, prune, cancel)
+        query_span.set(rows=len(result), bytes=estimate_size(list(result)), degraded=result.degraded)
+        return result
+
+
+def _run_query(sql_query: str, row_cap: int, prune: bool, cancel: threading.Event):
+    row_cap = ROW_CAP if row_cap is None else row_cap
+
+    # 通过连接池获取当前线程的只读连接（数据库文件不存在时抛出 FileNotFoundError）
+    pool = get_pool(DB_PATH)
+    conn = pool.connection()
 
-def run_query(sql_query: str):
-    # 检查数据库文件是否存在
-    if not os.path.exists(DB_PATH):
-        raise FileNotFoundError(f"数据库文件不存在: {DB_PATH}")
-    
-    conn = None
+    cur = None
     try:
-        conn = sqlite3.connect(DB_PATH)
         cur = conn.cursor()
-        cur.execute(sql_query)
-        result = cur.fetchall()
-        print(f'查询结果：{result}')
+        executed_sql, params = bind_literals(rewrite_query(sql_query, conn, pool.metadata()))
+        deferred = []
+        if prune:
+            executed_sql, deferred = prune_projection(executed_sql, conn, params)
+
+        plan = classify_plan(conn, executed_sql, params)
+        annotate(plan=plan.kind)
+        aggregate = bool(aggregate_pattern.search(executed_sql))
+        degraded = (is_expensive(plan) and not aggregate and DEGRADED_ROW_CAP > 0
+                    and (row_cap <= 0 or DEGRADED_ROW_CAP < row_cap))
+        if degraded:
+            row_cap = DEGRADED_ROW_CAP
+        capped_sql, capped = apply_row_cap(executed_sql, row_cap)
+
+        start = time.perf_counter()
+        columns, rows, timed_out = None, [], False
+        with query_budget(conn, cancel=cancel) as budget:
+            try:
+                cur.execute(capped_sql, params)
+                columns = [d[0] for d in cur.description] if cur.description else []
+                while True:
+                    batch = cur.fetchmany(FETCH_BATCH_SIZE)
+                    if not batch:
+                        break
+                    rows.extend(batch)
+            except sqlite3.OperationalError:
+                if not budget["interrupted"]:
+                    raise
+                timed_out = True
+        elapsed = time.perf_counter() - start
+
+        if timed_out and (aggregate or columns is None or not rows):
+            log_query(capped_sql, plan, elapsed, 0, degraded, timed_out=True)
+            raise QueryTimeout(f"查询超出时间预算（计划 {plan.kind}，已执行 {elapsed:.1f} 秒）")
+
+        if timed_out:
+            # 只返回预算内取回的行，总数未知
+            result = QueryRows(rows[:row_cap] if row_cap > 0 else rows, columns, len(rows), True, deferred, True)
+        elif capped and len(rows) > row_cap and degraded:
+            # 降级查询的计数探测会把代价高的扫描完整重跑一遍，总数只报告下限
+            result = QueryRows(rows[:row_cap], columns, len(rows), True, deferred, True)
+        elif capped and len(rows) > row_cap:
+            total, partial = len(rows), False
+            with query_budget(conn, cancel=cancel) as budget:
+                try:
+                    total = count_rows(conn, executed_sql, params)
+                except sqlite3.OperationalError:
+                    if not budget["interrupted"]:
+                        raise
+                    partial = True
+            result = QueryRows(rows[:row_cap], columns, total, True, deferred, partial)
+        else:
+            result = QueryRows(rows, columns, deferred=deferred)
+        log_query(capped_sql, plan, elapsed, len(result), degraded, timed_out)
+        log_rows(result)
         return result
+    except QueryTimeout:
+        raise
     except sqlite3.Error as e:
         raise sqlite3.Error(f"SQL执行错误: {str(e)}")
     finally:
-        if conn:
-            conn.close()
+        if cur:
+            cur.close()
+
+
+_reader_executor = None
+_reader_lock = threading.Lock()
+
+
+def get_reader_executor() -> ThreadPoolExecutor:
+    """返回异步查询专用的读线程池（首次调用时创建）"""
+    global _reader_executor
+    if _reader_executor is None:
+        with _reader_lock:
+            if _reader_executor is None:
+                _reader_executor = ThreadPoolExecutor(
+                    max_workers=READER_THREADS, thread_name_prefix="sqlite-reader"
+                )
+    return _reader_executor
+
+
+def load_deferred_columns(results, question: str = ""):
+    """回答阶段的第二轮读取：只为将写入上下文的行按 id 补取被推迟的大文本列。
+
+    补取哪些列由 columns_for_question 决定；返回新的 QueryRows，原结果（可能位于缓存中）不变。
+    """
+    deferred = getattr(results, "deferred", None)
+    if not results or not deferred:
+        return results
+
+    columns = results.columns
+    wanted = columns_for_question(question, deferred)
+    if not wanted:
+        return results.copy_with(list(results), deferred=[])
+
+    kept, _ = select_context_rows(results, columns, question)
+    id_index = columns.index("id")
+    values = fetch_by_id([row[id_index] for row in kept], wanted)
+    positions = [columns.index(c) for c in wanted]
+
+    rows = []
+    for row in results:
+        found = values.get(row[id_index])
+        if found is not None:
+            row = list(row)
+            for pos, value in zip(positions, found):
+                row[pos] = value
+            row = tuple(row)
+        rows.append(row)
+    return results.copy_with(rows, deferred=[])
+
+
+async def arun_query(sql_query: str):
+    """run_query 的异步版本：在读线程池中执行，不阻塞事件循环；任务被取消时中断正在执行的查询"""
+    loop = asyncio.get_running_loop()
+    cancel = threading.Event()
+    # 在读线程中沿用当前上下文，查询 span 归入调用方的 trace
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, run_query, sql_query, cancel=cancel)
+    try:
+        return await loop.run_in_executor(get_reader_executor(), call)
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
 
 
-def format_results_exclude_url(results) -> str:
+def format_results_exclude_url(results, question: str = "", columns=None) -> str:
     """将数据库查询结果整理为适合模型理解的自然语言（不含URL）：专利id、专利信息。
 
     规则：
@@ -34,35 +573,33 @@ def format_results_exclude_url(results) -> str:
     - 输出忽略 URL 与 专利名，仅保留 专利id 与 其它信息字段。
     - 若长度>=3：id 使用倒数第3个；信息为“除去最后三项的所有字段”。
     - 若长度不足3，则尽量显示已有字段并以“未知/无”占位。
+    - 上下文有预算：长字段按列截断，超出预算时按与问题的相关度选取至多 CONTEXT_MAX_ROWS 行，
+      列出的行保持查询结果的顺序，其余行只给出按年份/申请人/IPC 的计数汇总（见 backend/components/context_budget.py）。
     """
     if not results:
         return "数据库中未找到相关专利信息。"
 
-    lines = []
-    for row in results:
-        row_values = list(row) if isinstance(row, (list, tuple)) else [row]
-
-        if len(row_values) >= 3:
-            patent_id = row_values[-3]
-            # 忽略倒数第二(URL)与倒数第一(专利名)
-            info_parts = row_values[:-3]
-        else:
-            patent_id = None
-            info_parts = row_values
+    columns = columns if columns is not None else getattr(results, "columns", None)
+    kept, overflow = select_context_rows(results, columns, question)
 
-        info_text = "；".join(
-            str(v).strip() for v in info_parts if v is not None and str(v).strip() != ""
-        )
-        info_text = info_text if info_text != "" else "无"
-
-        id_text = (str(patent_id).strip() if patent_id is not None else "未知") or "未知"
+    total = getattr(results, "total_count", len(results))
+    truncated = getattr(results, "truncated", False)
 
+    lines = []
+    if getattr(results, "degraded", False):
+        lines.append(f"查询代价较高，只取回了部分结果（至少 {total} 条记录），以下列出其中与问题最相关的 {len(kept)} 条：")
+    elif overflow or truncated:
+        lines.append(f"共检索到 {total} 条记录，以下列出其中与问题最相关的 {len(kept)} 条：")
+    for row in kept:
+        id_text, info_text = render_row(row, columns)
         line = f"专利id：{id_text}，专利信息：{info_text}"
         lines.append(line)
+    if overflow or truncated:
+        lines.append(summarize_rows(overflow, columns, total - len(kept)))
 
     return "\n".join(lines)
 
-def reference_for_answer(results):
+def reference_for_answer(results, question: str = "", columns=None):
 
     """将数据库查询结果整理为 JSON 形式：
 
@@ -74,10 +611,14 @@ def reference_for_answer(results):
     规则（与上游 ensure_select_id_url 保持一致）：
     - 每条记录的最后三个元素分别为：专利id、URL、专利名。
     - 若长度不足3，则尽量显示已有字段并以“未知/无”占位。
+    - 只引用写入上下文的行（与 format_results_exclude_url 相同的确定性选行）。
     """
     if not results:
         return {"source_title": [], "source_url": []}
 
+    columns = columns if columns is not None else getattr(results, "columns", None)
+    results, _ = select_context_rows(results, columns, question)
+
     source_title_list = []
     source_url_list = []
 
@@ -1,18 +1,31 @@
 import sqlite3
 import re
+import argparse
 from multiprocessing import Pool, cpu_count
 from tqdm import tqdm
 import os
 
+try:
+    from backend.sqlite.split_text import register_text_functions
+except ImportError:
+    # 直接以脚本方式运行（python backend/sqlite/clean_ipc.py）
+    from split_text import register_text_functions
+
 current_dir = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(current_dir, "patents.db")
 TABLE = "patent"     
+IPC_TABLE = "patent_ipc"
 BATCH_SIZE = 20000    
 
 
 # IPC 前缀：部(字母) + 大类(2数字) + 小类(字母)
 ipc_fix_pattern = re.compile(r"([A-Z]\d{2}[A-Z])\s+(\d)")
 
+# 完整 IPC：部 + 大类 + 小类 [+ 大组 [/ 小组]] [(版本)]，如 H01L21/02(2006.01)、C09G
+ipc_code_pattern = re.compile(
+    r"^([A-H])(\d{2})([A-Z])(?:(\d{1,4})(?:/(\d{1,6}))?)?\s*(?:\((\d{4}\.\d{2})\))?"
+)
+
 
 def fix_single_ipc(ipc: str) -> str:
     """修复单个 IPC 内部错误空格"""
@@ -31,6 +44,38 @@ def clean_ipc_field(field: str) -> str:
     return "; ".join(cleaned)
 
 
+def parse_ipc_code(ipc: str):
+    """解析单个 IPC，返回 (code, section, class, subclass, group, subgroup, version)。
+
+    code 为去掉版本号的规范化编号（如 H01L21/02），用于前缀范围查找；无法识别时返回 None。
+    """
+    m = ipc_code_pattern.match(fix_single_ipc(ipc.strip()).upper())
+    if not m:
+        return None
+    section, klass, subclass, group, subgroup, version = m.groups()
+    code = f"{section}{klass}{subclass}"
+    if group:
+        code += group
+        if subgroup:
+            code += f"/{subgroup}"
+    return code, section, klass, subclass, group, subgroup, version
+
+
+def explode_batch(rows):
+    """子进程拆分批次：每个 IPC 编号拆为 patent_ipc 的一行"""
+    result = []
+    for row_id, gazette, ipc in rows:
+        for field, value in (("gazette_ipc", gazette), ("ipc", ipc)):
+            if not value:
+                continue
+            parts = [p for p in re.split(r"[;；]", value) if p.strip()]
+            for position, part in enumerate(parts):
+                parsed = parse_ipc_code(part)
+                if parsed:
+                    result.append((row_id, field, position, *parsed))
+    return result
+
+
 def process_batch(rows):
     """子进程清洗批次"""
     result = []
@@ -43,8 +88,84 @@ def process_batch(rows):
     return result
 
 
-def main():
-    conn = sqlite3.connect(DB_PATH)
+def create_ipc_table(conn: sqlite3.Connection):
+    """创建 IPC 规范化附表及 B-tree 索引。
+
+    - field: 来源字段（ipc / gazette_ipc）；position: 在原字段中的序号（从 0 开始），
+      position=0 对应原字段开头，用于保持 "ipc" LIKE 'H01L%' 的前缀语义。
+    - idx_patent_ipc_code 覆盖 (field, code, patent_id)，前缀查找只需扫描索引区间。
+    """
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS {IPC_TABLE} (
+            patent_id INTEGER NOT NULL,
+            field TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            code TEXT NOT NULL,
+            section TEXT,
+            class TEXT,
+            subclass TEXT,
+            "group" TEXT,
+            subgroup TEXT,
+            version TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_{IPC_TABLE}_code ON {IPC_TABLE}(field, code, patent_id);
+        CREATE INDEX IF NOT EXISTS idx_{IPC_TABLE}_patent ON {IPC_TABLE}(patent_id);
+        CREATE INDEX IF NOT EXISTS idx_{IPC_TABLE}_class ON {IPC_TABLE}(section, class, subclass, "group", subgroup);
+    """)
+
+
+def build_ipc_table(conn: sqlite3.Connection, incremental: bool = False):
+    """由 patent 表生成 patent_ipc 附表。
+
+    incremental=True 时只处理 id 大于附表中最大 patent_id 的新专利，否则全量重建。
+    """
+    create_ipc_table(conn)
+    cursor = conn.cursor()
+
+    last_id = 0
+    if incremental:
+        last_id = cursor.execute(f"SELECT COALESCE(MAX(patent_id), 0) FROM {IPC_TABLE}").fetchone()[0]
+    else:
+        cursor.execute(f"DELETE FROM {IPC_TABLE}")
+
+    total = cursor.execute(f"SELECT COUNT(*) FROM {TABLE} WHERE id > ?", (last_id,)).fetchone()[0]
+    pool = Pool(cpu_count())
+    pbar = tqdm(total=total, desc="Building patent_ipc")
+
+    while True:
+        # 按 id 分页，避免 OFFSET 在大表上越翻越慢
+        cursor.execute(
+            f"SELECT id, gazette_ipc, ipc FROM {TABLE} WHERE id > ? ORDER BY id LIMIT {BATCH_SIZE}",
+            (last_id,)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+
+        chunk_size = len(rows) // cpu_count() + 1
+        chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+        results = pool.map(explode_batch, chunks)
+        inserts = [item for sub in results for item in sub]
+
+        conn.executemany(
+            f'INSERT INTO {IPC_TABLE} (patent_id, field, position, code, section, class, subclass, "group", subgroup, version) '
+            f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            inserts
+        )
+        conn.commit()
+
+        pbar.update(len(rows))
+        last_id = rows[-1][0]
+
+    pbar.close()
+    pool.close()
+    pool.join()
+    conn.execute(f"ANALYZE {IPC_TABLE}")
+    conn.commit()
+
+
+def clean_ipc(conn: sqlite3.Connection):
+    """清洗 patent 表中 gazette_ipc / ipc 字段内部的错误空格"""
     cursor = conn.cursor()
 
     cursor.execute(f"SELECT COUNT(*) FROM {TABLE}")
@@ -90,10 +211,28 @@ def main():
     pbar.close()
     pool.close()
     pool.join()
-    conn.close()
 
     print("\nAll IPC fields cleaned successfully!")
 
 
+def main():
+    parser = argparse.ArgumentParser(description="清洗 IPC 字段并生成 patent_ipc 规范化附表")
+    parser.add_argument("--db", default=DB_PATH, help="数据库路径")
+    parser.add_argument("--skip-clean", action="store_true", help="跳过 IPC 字段清洗")
+    parser.add_argument("--skip-table", action="store_true", help="跳过 patent_ipc 附表生成")
+    parser.add_argument("--incremental", action="store_true", help="附表只追加新专利，不全量重建")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    # patent 已纵向拆分时，经视图触发器写回需要 zstd 函数
+    register_text_functions(conn)
+    if not args.skip_clean:
+        clean_ipc(conn)
+    if not args.skip_table:
+        build_ipc_table(conn, incremental=args.incremental)
+        print("patent_ipc table built successfully!")
+    conn.close()
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,275 @@
+import os
+import re
+import json
+import sqlite3
+import argparse
+import unicodedata
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(current_dir, "patents.db")
+ALIASES_PATH = os.path.join(current_dir, "entity_aliases.json")
+TABLE = "patent"
+ENTITY_TABLE = "entity"
+ALIAS_TABLE = "entity_alias"
+BATCH_SIZE = 20000
+
+# 建立实体索引的字段，及各字段对应的专利-实体连接表
+ENTITY_FIELDS = {"applicant": "patent_applicant", "inventor": "patent_inventor"}
+
+# 公司名常见后缀：去掉后缀的名称作为别名（“台湾积体电路制造股份有限公司” -> “台湾积体电路制造”）
+COMPANY_SUFFIXES = ("股份有限公司", "有限责任公司", "corporation", "有限公司", "co.,ltd.", "公司", "corp.", "inc.", "ltd.")
+
+# 名称末尾的国别/地区注记，如 “沈文超（中华民国）”
+trailing_note_pattern = re.compile(r"\s*[（(][^（）()]*[）)]\s*$")
+cjk_run_pattern = re.compile(r"[\u4e00-\u9fff][\u4e00-\u9fff\s·]*")
+latin_run_pattern = re.compile(r"[A-Za-z][A-Za-z0-9 .,&'\-]*")
+
+_converter = None
+
+
+def _t2s(text: str) -> str:
+    global _converter
+    if _converter is None:
+        from opencc import OpenCC
+        _converter = OpenCC("t2s")
+    return _converter.convert(text)
+
+
+def fold_name(name: str) -> str:
+    """名称折叠：繁简统一、全半角统一、小写，去除空白与标点"""
+    text = unicodedata.normalize("NFKC", _t2s(name or "")).lower()
+    return "".join(
+        ch for ch in text
+        if not ch.isspace() and not unicodedata.category(ch).startswith(("P", "S"))
+    )
+
+
+def split_names(value: str):
+    """按 ；/; 拆分多值字段，返回去掉首尾空白的非空名称"""
+    return [p.strip() for p in re.split(r"[;；]", value or "") if p.strip()]
+
+
+def name_aliases(name: str) -> set:
+    """由单个名称生成折叠后的别名：全称、去掉国别注记与公司后缀的名称、中英文部分"""
+    base = trailing_note_pattern.sub("", name)
+    forms = {name, base}
+    for run in cjk_run_pattern.findall(base) + latin_run_pattern.findall(base):
+        forms.add(run)
+    aliases = set()
+    for form in forms:
+        folded = fold_name(form)
+        if not folded:
+            continue
+        aliases.add(folded)
+        # 后缀按长度降序排列，只去掉最长的一个
+        for suffix in COMPANY_SUFFIXES:
+            suffix = fold_name(suffix)
+            if folded.endswith(suffix):
+                if len(folded) - len(suffix) >= 2:
+                    aliases.add(folded[:-len(suffix)])
+                break
+    return aliases
+
+
+def create_entity_tables(conn: sqlite3.Connection):
+    """创建实体表、别名表与专利-实体连接表。
+
+    - entity(id, kind, canonical, display)：canonical 为折叠后的完整名称（含国别注记），同一 kind 内唯一；
+      同名但国别不同的发明人是不同的实体。
+    - entity_alias(alias, kind, entity_id)：折叠后的别名（含 canonical 本身与人工维护的别名）。
+    - patent_applicant / patent_inventor(patent_id, entity_id)：按 entity_id 建索引，便于由实体反查专利。
+    """
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS {ENTITY_TABLE} (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            canonical TEXT NOT NULL,
+            display TEXT,
+            UNIQUE (kind, canonical)
+        );
+        CREATE TABLE IF NOT EXISTS {ALIAS_TABLE} (
+            alias TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            UNIQUE (kind, alias, entity_id)
+        );
+    """)
+    for link_table in ENTITY_FIELDS.values():
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS {link_table} (
+                patent_id INTEGER NOT NULL,
+                entity_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_{link_table}_entity ON {link_table}(entity_id, patent_id);
+            CREATE INDEX IF NOT EXISTS idx_{link_table}_patent ON {link_table}(patent_id);
+        """)
+
+
+def load_curated_aliases(path: str = ALIASES_PATH) -> dict:
+    """读取人工维护的别名表：{kind: {标准名: [别名, ...]}}，文件不存在时返回空表"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_entity_index(conn: sqlite3.Connection, incremental: bool = False, aliases_path: str = ALIASES_PATH):
+    """由 patent 表的 applicant / inventor 字段生成实体索引。
+
+    incremental=True 时只处理 id 大于连接表中最大 patent_id 的新专利，已有实体沿用原 id；
+    否则清空后全量重建。
+    """
+    from tqdm import tqdm
+
+    create_entity_tables(conn)
+    cursor = conn.cursor()
+
+    last_id = 0
+    if incremental:
+        last_id = max(
+            cursor.execute(f"SELECT COALESCE(MAX(patent_id), 0) FROM {link_table}").fetchone()[0]
+            for link_table in ENTITY_FIELDS.values()
+        )
+    else:
+        for table in [ENTITY_TABLE, ALIAS_TABLE, *ENTITY_FIELDS.values()]:
+            cursor.execute(f"DELETE FROM {table}")
+
+    entities = {
+        (kind, canonical): entity_id
+        for entity_id, kind, canonical in cursor.execute(f"SELECT id, kind, canonical FROM {ENTITY_TABLE}")
+    }
+    # 原始写法 -> 实体 id；同一写法在大量专利中重复出现，只折叠一次（OpenCC 转换较慢）
+    seen = {}
+    new_aliases = set()
+
+    def entity_for(kind, name):
+        if (kind, name) in seen:
+            return seen[(kind, name)]
+        # 国别注记属于名称的一部分：“王伟（美国）” 与 “王伟（中国）” 是不同的实体，
+        # 否则 LIKE '%美国%' 会经由 “王伟美国” 这个别名命中所有同名者的专利
+        canonical = fold_name(name)
+        entity_id = entities.get((kind, canonical)) if canonical else None
+        if canonical and entity_id is None:
+            entity_id = cursor.execute(
+                f"INSERT INTO {ENTITY_TABLE} (kind, canonical, display) VALUES (?, ?, ?)",
+                (kind, canonical, name)
+            ).lastrowid
+            entities[(kind, canonical)] = entity_id
+        if entity_id is not None:
+            new_aliases.update((alias, kind, entity_id) for alias in name_aliases(name))
+        seen[(kind, name)] = entity_id
+        return entity_id
+
+    total = cursor.execute(f"SELECT COUNT(*) FROM {TABLE} WHERE id > ?", (last_id,)).fetchone()[0]
+    pbar = tqdm(total=total, desc="Building entity index")
+    fields = ", ".join(f'"{f}"' for f in ENTITY_FIELDS)
+    while True:
+        # 按 id 分页，避免 OFFSET 在大表上越翻越慢
+        rows = conn.execute(
+            f"SELECT id, {fields} FROM {TABLE} WHERE id > ? ORDER BY id LIMIT {BATCH_SIZE}", (last_id,)
+        ).fetchall()
+        if not rows:
+            break
+
+        links = {field: set() for field in ENTITY_FIELDS}
+        for row in rows:
+            for field, value in zip(ENTITY_FIELDS, row[1:]):
+                for name in split_names(value):
+                    entity_id = entity_for(field, name)
+                    if entity_id is not None:
+                        links[field].add((row[0], entity_id))
+
+        for field, link_table in ENTITY_FIELDS.items():
+            conn.executemany(f"INSERT INTO {link_table} (patent_id, entity_id) VALUES (?, ?)", sorted(links[field]))
+        conn.executemany(f"INSERT OR IGNORE INTO {ALIAS_TABLE} (alias, kind, entity_id) VALUES (?, ?, ?)", new_aliases)
+        new_aliases.clear()
+        conn.commit()
+
+        pbar.update(len(rows))
+        last_id = rows[-1][0]
+    pbar.close()
+
+    # 人工维护的别名（简称、英文名）挂到对应的标准名实体上：标准名不含国别注记，
+    # 挂到去掉注记后与标准名相同的所有实体（canonical 以标准名开头、且标准名是其别名）
+    curated = []
+    for kind, names in load_curated_aliases(aliases_path).items():
+        for name, extra in names.items():
+            folded = fold_name(name)
+            entity_ids = [row[0] for row in cursor.execute(
+                f"SELECT e.id FROM {ENTITY_TABLE} e JOIN {ALIAS_TABLE} a ON a.entity_id = e.id "
+                f"WHERE e.kind = ? AND a.kind = ? AND a.alias = ? AND substr(e.canonical, 1, ?) = ?",
+                (kind, kind, folded, len(folded), folded)
+            )]
+            for entity_id in entity_ids:
+                curated.extend((fold_name(a), kind, entity_id) for a in extra if fold_name(a))
+    conn.executemany(f"INSERT OR IGNORE INTO {ALIAS_TABLE} (alias, kind, entity_id) VALUES (?, ?, ?)", curated)
+
+    for table in [ENTITY_TABLE, ALIAS_TABLE, *ENTITY_FIELDS.values()]:
+        conn.execute(f"ANALYZE {table}")
+    conn.commit()
+
+
+def entity_index_exists(conn: sqlite3.Connection) -> bool:
+    """实体索引（别名表与两张连接表）是否存在"""
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    return {ALIAS_TABLE, *ENTITY_FIELDS.values()} <= names
+
+
+# 匹配 [别名.]"applicant"/"inventor" LIKE '%值%'（值内部不含通配符与分隔符）
+entity_like_pattern = re.compile(
+    r"""(?P<prefix>\b\w+\s*\.\s*)?"(?P<field>applicant|inventor)"\s+LIKE\s+'%(?P<value>(?:[^'%_;；]|'')*)%'(?!\s*ESCAPE)""",
+    re.IGNORECASE,
+)
+not_pattern = re.compile(r"\bNOT\b", re.IGNORECASE)
+
+# 折叠后至少 2 个字符才改写，过短的值会匹配大量实体
+MIN_ENTITY_CHARS = 2
+
+
+def rewrite_entity_like(sql: str) -> str:
+    """将申请人/发明人字段上的 LIKE '%名称%' 改写为实体索引查找。
+
+    改写形式："id" IN (SELECT patent_id FROM patent_applicant WHERE entity_id IN
+              (SELECT entity_id FROM entity_alias WHERE kind = 'applicant' AND alias LIKE '%折叠名%'))
+
+    语义：命中的专利是其某个名称（或该名称的别名）在折叠后包含折叠值的专利，即原 LIKE 在
+    繁简、全半角、大小写与标点上不敏感的版本，另加 entity_aliases.json 中人工维护的简称与英文名
+    （“台積電”“TSMC” 等写法也能命中）。原 LIKE 能匹配的专利都在结果中；多出的专利只来自上述折叠
+    与人工别名。国别注记是实体名称的一部分（见 build_entity_index），LIKE '%美国%' 只命中注记为
+    美国的发明人，不会扩展到同名的其他人。
+    SQL 中出现 NOT 时保持原样。
+    """
+    if not_pattern.search(sql):
+        return sql
+
+    def replace_match(m):
+        field = m.group("field").lower()
+        folded = fold_name(m.group("value").replace("''", "'"))
+        if len(folded) < MIN_ENTITY_CHARS:
+            return m.group(0)
+        folded = folded.replace("'", "''")
+        prefix = m.group("prefix") or ""
+        return (
+            f"{prefix}\"id\" IN (SELECT patent_id FROM {ENTITY_FIELDS[field]} WHERE entity_id IN "
+            f"(SELECT entity_id FROM {ALIAS_TABLE} WHERE kind = '{field}' AND alias LIKE '%{folded}%'))"
+        )
+
+    return entity_like_pattern.sub(replace_match, sql)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="由 applicant / inventor 字段生成实体索引（繁简折叠与别名）")
+    parser.add_argument("--db", default=DB_PATH, help="数据库路径")
+    parser.add_argument("--aliases", default=ALIASES_PATH, help="人工维护的别名表（JSON）")
+    parser.add_argument("--incremental", action="store_true", help="只追加新专利，不全量重建")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    build_entity_index(conn, incremental=args.incremental, aliases_path=args.aliases)
+    count = conn.execute(f"SELECT kind, COUNT(*) FROM {ENTITY_TABLE} GROUP BY kind").fetchall()
+    conn.close()
+    print("实体索引建立完成：" + "，".join(f"{kind} {n} 个" for kind, n in count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import os
+import re
+import sqlite3
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(current_dir, "patents.db")
+TABLE = "patent"
+FTS_TABLE = "patent_fts"
+
+# 默认建立全文索引的文本字段（extract_sql 会改写为 LIKE 的长文本/名称字段）
+# keywords、priority 取值种类很少，选择性差，走全表扫描反而更快，不纳入索引
+FTS_COLUMNS = [
+    "patent_title", "applicant", "inventor", "agent",
+    "abstract", "patent_scope", "detailed_description",
+]
+
+# trigram 分词器要求检索串至少 3 个字符，否则 MATCH 不会命中任何行
+MIN_MATCH_CHARS = 3
+
+# 匹配 [别名.]"字段" LIKE '%值%'（值内部不含通配符）
+like_pattern = re.compile(
+    r"""(?P<prefix>\b\w+\s*\.\s*)?"(?P<field>\w+)"\s+LIKE\s+'%(?P<value>(?:[^'%_]|'')*)%'(?!\s*ESCAPE)""",
+    re.IGNORECASE,
+)
+not_pattern = re.compile(r"\bNOT\b", re.IGNORECASE)
+# FROM / JOIN 中对 patent 的引用及其别名（别名不能是紧随其后的关键字）
+table_ref_pattern = re.compile(
+    r"""\b(?:FROM|JOIN)\s+"?patent"?(?![\w"])(?:\s+(?:AS\s+)?"?(?!(?:WHERE|JOIN|LEFT|RIGHT|FULL|INNER|OUTER|CROSS|NATURAL|ON|USING|GROUP|ORDER|LIMIT|HAVING|WINDOW|UNION|EXCEPT|INTERSECT)\b)(?P<alias>\w+)"?)?""",
+    re.IGNORECASE,
+)
+
+
+def build_fts_index(conn: sqlite3.Connection, columns=None, rebuild: bool = False):
+    """创建 FTS5(trigram) 外部内容表及同步触发器，并从 patent 表重建索引。
+
+    - 外部内容表不重复存储原文，rowid 与 patent.id 一致，便于回表连接。
+    - 触发器保证后续对 patent 的 INSERT/UPDATE/DELETE 自动同步到索引。
+    - rebuild=True 时先删除已有索引再重新创建（用于调整索引字段）。
+    - patent 已由 split_text.py 拆分为视图时，改由视图的 INSTEAD OF 触发器同步索引。
+    """
+    columns = list(columns or FTS_COLUMNS)
+    col_list = ", ".join(f'"{c}"' for c in columns)
+    new_list = ", ".join(f'new."{c}"' for c in columns)
+    old_list = ", ".join(f'old."{c}"' for c in columns)
+
+    if rebuild:
+        drop_fts_index(conn)
+
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            {col_list},
+            content='{TABLE}', content_rowid='id', tokenize='trigram'
+        )
+    """)
+    if table_is_view(conn):
+        _split_text().create_view_triggers(conn)
+        conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        conn.commit()
+        return
+
+    conn.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {col_list}) VALUES (new."id", {new_list});
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {col_list}) VALUES ('delete', old."id", {old_list});
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {col_list}) VALUES ('delete', old."id", {old_list});
+            INSERT INTO {FTS_TABLE}(rowid, {col_list}) VALUES (new."id", {new_list});
+        END;
+    """)
+    conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    conn.commit()
+
+
+def drop_fts_index(conn: sqlite3.Connection):
+    """删除全文索引及其触发器"""
+    conn.executescript(f"""
+        DROP TRIGGER IF EXISTS {FTS_TABLE}_ai;
+        DROP TRIGGER IF EXISTS {FTS_TABLE}_ad;
+        DROP TRIGGER IF EXISTS {FTS_TABLE}_au;
+        DROP TABLE IF EXISTS {FTS_TABLE};
+    """)
+    if table_is_view(conn):
+        _split_text().create_view_triggers(conn)
+    conn.commit()
+
+
+def table_is_view(conn: sqlite3.Connection) -> bool:
+    """patent 是否为视图（已由 backend/sqlite/split_text.py 纵向拆分）"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='view' AND name=?", (TABLE,)
+    ).fetchone() is not None
+
+
+def fts_columns(conn: sqlite3.Connection) -> set:
+    """返回已建立全文索引的字段集合；索引不存在时返回空集合"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (FTS_TABLE,)
+    ).fetchone()
+    if not exists:
+        return set()
+    return {row[1] for row in conn.execute(f'PRAGMA table_info("{FTS_TABLE}")')}
+
+
+def rewrite_like_to_fts(sql: str, columns) -> str:
+    """将 "字段" LIKE '%值%' 改写为基于全文索引的 id 子查询，结果行与原 SQL 一致。
+
+    改写形式：<表>."id" IN (SELECT rowid FROM patent_fts WHERE "字段" MATCH '"值"')，
+    <表> 为 LIKE 字段的限定前缀；字段未限定时取 SQL 中唯一一处 patent 引用的别名（无别名时为 patent），
+    避免连接查询中 id 指向其他表。
+
+    以下情形保持原样，交由 SQLite 按原语义执行：
+    - 字段未建立全文索引；
+    - 字段未限定且 SQL 中 patent 出现多次（自连接、子查询），无法确定字段所属的表；
+    - 值不足 3 个字符（trigram 无法命中）或包含 %、_ 通配符、ESCAPE 子句；
+    - SQL 中出现 NOT（NOT LIKE 与 NOT IN 对 NULL 的处理不同）。
+    """
+    if not columns or not_pattern.search(sql):
+        return sql
+    columns = {c.lower() for c in columns}
+    refs = table_ref_pattern.findall(sql)
+    owner = f'"{refs[0] or TABLE}".' if len(refs) == 1 else None
+
+    def replace_match(m):
+        field = m.group("field")
+        value = m.group("value")
+        if field.lower() not in columns:
+            return m.group(0)
+        if len(value.replace("''", "'")) < MIN_MATCH_CHARS:
+            return m.group(0)
+        prefix = m.group("prefix") or owner
+        if prefix is None:
+            return m.group(0)
+        phrase = '"' + value.replace('"', '""') + '"'
+        return f"{prefix}\"id\" IN (SELECT rowid FROM {FTS_TABLE} WHERE \"{field}\" MATCH '{phrase}')"
+
+    return like_pattern.sub(replace_match, sql)
+
+
+def _split_text():
+    """延迟导入 split_text（两模块互相引用）；兼容直接以脚本方式运行"""
+    try:
+        from backend.sqlite import split_text
+    except ImportError:
+        import split_text
+    return split_text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为 patent 表建立 FTS5(trigram) 全文索引")
+    parser.add_argument("--db", default=DB_PATH, help="数据库路径")
+    parser.add_argument("--columns", nargs="+", default=FTS_COLUMNS, help="需要建立索引的字段")
+    parser.add_argument("--rebuild", action="store_true", help="删除已有索引后重建")
+    parser.add_argument("--drop", action="store_true", help="仅删除索引")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    # 压缩布局下重建索引需要读取视图中的 zstd_text(...) 列
+    _split_text().register_text_functions(conn)
+    if args.drop:
+        drop_fts_index(conn)
+        print("全文索引已删除")
+    else:
+        print(f"正在建立全文索引，字段: {', '.join(args.columns)}")
+        build_fts_index(conn, args.columns, rebuild=args.rebuild)
+        print("全文索引建立完成！")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import argparse
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(current_dir, "patents.db")
+TABLE = "patent"
+ROLLUP_TABLE = "patent_rollup"
+STATE_TABLE = "patent_rollup_state"
+
+# 汇总表的维度列，列名与 patent 表一致，路由时计数查询的 WHERE / GROUP BY 可原样复用：
+# - applicant、keywords、publication_date 保存原值
+# - ipc 只保存前 4 个字符（部+大类+小类，如 H01L），只能回答 "ipc" LIKE 'H01L%' 这类前缀查询
+ROLLUP_COLUMNS = ["applicant", "keywords", "ipc", "publication_date"]
+IPC_HEAD_CHARS = 4
+
+
+def create_rollup_tables(conn: sqlite3.Connection):
+    """创建计数汇总表与刷新状态表。
+
+    维度取值完全相同的专利合并为一行，cnt 为专利数；维度含 NULL 的行不会被唯一索引合并，
+    可能出现多行，SUM(cnt) 结果不受影响。
+    """
+    dims = ", ".join(f'"{c}" TEXT' for c in ROLLUP_COLUMNS)
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} ({dims}, cnt INTEGER NOT NULL);
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_{ROLLUP_TABLE}_dims ON {ROLLUP_TABLE}({", ".join(f'"{c}"' for c in ROLLUP_COLUMNS)});
+        CREATE INDEX IF NOT EXISTS idx_{ROLLUP_TABLE}_date ON {ROLLUP_TABLE}(publication_date);
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (key TEXT PRIMARY KEY, value);
+    """)
+
+
+def read_state(conn: sqlite3.Connection) -> dict:
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (STATE_TABLE,)
+    ).fetchone()
+    if not exists:
+        return {}
+    return dict(conn.execute(f"SELECT key, value FROM {STATE_TABLE}").fetchall())
+
+
+def refresh_rollup(conn: sqlite3.Connection, rebuild: bool = False) -> int:
+    """刷新汇总表，返回本次计入的专利数。
+
+    默认增量：只汇总 id 大于上次刷新位置的新专利，与已有计数累加（UPSERT）。
+    修改或删除了已有专利（如重新执行 clean_ipc.py）后需 rebuild=True 全量重建。
+    """
+    create_rollup_tables(conn)
+    state = read_state(conn)
+    last_id = 0 if rebuild else int(state.get("last_id", 0))
+    if rebuild:
+        conn.execute(f"DELETE FROM {ROLLUP_TABLE}")
+
+    dims = ", ".join(f'"{c}"' for c in ROLLUP_COLUMNS)
+    select_dims = ", ".join(
+        f'substr("{c}", 1, {IPC_HEAD_CHARS})' if c == "ipc" else f'"{c}"' for c in ROLLUP_COLUMNS
+    )
+    # WHERE 子句不可省略：INSERT ... SELECT 后紧跟 ON CONFLICT 时需要它消除语法歧义
+    added = conn.execute(f"SELECT COUNT(*) FROM {TABLE} WHERE id > ?", (last_id,)).fetchone()[0]
+    conn.execute(f"""
+        INSERT INTO {ROLLUP_TABLE} ({dims}, cnt)
+        SELECT {select_dims}, COUNT(*) FROM {TABLE} WHERE id > ? GROUP BY {select_dims}
+        ON CONFLICT ({dims}) DO UPDATE SET cnt = cnt + excluded.cnt
+    """, (last_id,))
+
+    max_id, total = conn.execute(f"SELECT MAX(id), COUNT(*) FROM {TABLE}").fetchone()
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {STATE_TABLE} (key, value) VALUES (?, ?)",
+        [("last_id", max_id or 0), ("patent_count", total), ("refreshed_at", time.time())]
+    )
+    conn.commit()
+    conn.execute(f"ANALYZE {ROLLUP_TABLE}")
+    conn.commit()
+    return added
+
+
+def rollup_ready(conn: sqlite3.Connection) -> bool:
+    """汇总表存在且与 patent 表同步（最大 id 与总行数都与上次刷新时一致）"""
+    state = read_state(conn)
+    if "last_id" not in state:
+        return False
+    max_id, total = conn.execute(f"SELECT MAX(id), COUNT(*) FROM {TABLE}").fetchone()
+    return int(state["last_id"]) == (max_id or 0) and int(state["patent_count"]) == total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成/增量刷新计数汇总表 patent_rollup")
+    parser.add_argument("--db", default=DB_PATH, help="数据库路径")
+    parser.add_argument("--rebuild", action="store_true", help="全量重建（已有专利被修改或删除后使用）")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    added = refresh_rollup(conn, rebuild=args.rebuild)
+    rows = conn.execute(f"SELECT COUNT(*) FROM {ROLLUP_TABLE}").fetchone()[0]
+    conn.close()
+    print(f"汇总表刷新完成：本次计入 {added} 条专利，汇总表共 {rows} 行")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import os
+import sqlite3
+import argparse
+import threading
+
+try:
+    from backend.sqlite.fts_index import FTS_TABLE, fts_columns
+except ImportError:
+    # 直接以脚本方式运行（python backend/sqlite/split_text.py）
+    from fts_index import FTS_TABLE, fts_columns
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(current_dir, "patents.db")
+TABLE = "patent"
+META_TABLE = "patent_meta"
+TEXT_TABLE = "patent_text"
+
+# 拆分到 patent_text 的大文本字段
+TEXT_COLUMNS = ["abstract", "patent_scope", "detailed_description"]
+
+# zstd 压缩级别：3 为 zstandard 默认值，压缩率与速度较均衡
+ZSTD_LEVEL = 3
+
+_codec = threading.local()
+
+
+def _compressor():
+    # ZstdCompressor / ZstdDecompressor 不是线程安全的，每个线程各持有一个
+    if not hasattr(_codec, "compressor"):
+        import zstandard
+        _codec.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        _codec.decompressor = zstandard.ZstdDecompressor()
+    return _codec
+
+
+def zstd_pack(value):
+    """文本 -> zstd 压缩的 BLOB；NULL 与非文本原样返回"""
+    if not isinstance(value, str):
+        return value
+    return _compressor().compressor.compress(value.encode("utf-8"))
+
+
+def zstd_text(value):
+    """zstd 压缩的 BLOB -> 文本；未压缩的值原样返回，便于压缩与未压缩数据混存"""
+    if not isinstance(value, bytes):
+        return value
+    return _compressor().decompressor.decompress(value).decode("utf-8")
+
+
+def register_text_functions(conn: sqlite3.Connection):
+    """在连接上注册 zstd_pack / zstd_text 两个 SQL 函数。
+
+    压缩布局下 VIEW patent 与其写入触发器依赖这两个函数，读写 patents.db 的连接都需先注册。
+    zstandard 在函数首次被调用时才导入，未压缩布局不需要安装。
+    """
+    conn.create_function("zstd_pack", 1, zstd_pack, deterministic=True)
+    conn.create_function("zstd_text", 1, zstd_text, deterministic=True)
+
+
+def object_type(conn: sqlite3.Connection, name: str):
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def is_split(conn: sqlite3.Connection) -> bool:
+    """patent 是否已拆分为 patent_meta + patent_text 并以视图形式提供"""
+    return object_type(conn, TABLE) == "view" and object_type(conn, TEXT_TABLE) == "table"
+
+
+def is_compressed(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = ?", (TABLE,)).fetchone()
+    return bool(row) and "zstd_text(" in row[0]
+
+
+def column_list(columns, prefix: str = "") -> str:
+    """生成 "a", "b" 或 new."a", new."b" 形式的列清单"""
+    return ", ".join(f'{prefix}"{c}"' for c in columns)
+
+
+def view_columns(conn: sqlite3.Connection) -> list:
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{TABLE}")')]
+
+
+def create_view(conn: sqlite3.Connection, columns, compress: bool):
+    """创建兼容视图 patent：列名与列顺序与拆分前的 patent 表一致。
+
+    patent_text 以 LEFT JOIN 连接（主键一对一），只查询短字段时 SQLite 会省略该连接，
+    COUNT / GROUP BY 只扫描 patent_meta。
+    """
+    select_list = []
+    for c in columns:
+        if c in TEXT_COLUMNS:
+            expr = f'zstd_text(t."{c}")' if compress else f't."{c}"'
+        else:
+            expr = f'm."{c}"'
+        select_list.append(f'{expr} AS "{c}"')
+    conn.execute(f"""
+        CREATE VIEW {TABLE} AS
+        SELECT {", ".join(select_list)}
+        FROM {META_TABLE} m LEFT JOIN {TEXT_TABLE} t ON t.patent_id = m."id"
+    """)
+
+
+def create_view_triggers(conn: sqlite3.Connection):
+    """为视图 patent 创建 INSTEAD OF 写入触发器，把 INSERT/UPDATE/DELETE 分发到两张基表。
+
+    已建立全文索引时，触发器同时维护 patent_fts（取代拆分前建在 patent 表上的同步触发器）。
+    重复调用会先删除旧触发器，建立或删除全文索引后需重新调用。
+    """
+    columns = view_columns(conn)
+    meta_columns = [c for c in columns if c not in TEXT_COLUMNS]
+    text_columns = [c for c in columns if c in TEXT_COLUMNS]
+    pack = (lambda v: f"zstd_pack({v})") if is_compressed(conn) else (lambda v: v)
+
+    new_id = 'COALESCE(new."id", last_insert_rowid())'
+    text_changed = " OR ".join(f'new."{c}" IS NOT old."{c}"' for c in ["id"] + text_columns)
+
+    fts = sorted(fts_columns(conn), key=columns.index)
+    fts_insert = fts_update_delete = fts_update_insert = fts_delete = ""
+    if fts:
+        fts_changed = " OR ".join(f'new."{c}" IS NOT old."{c}"' for c in ["id"] + fts)
+        fts_insert = (f"INSERT INTO {FTS_TABLE}(rowid, {column_list(fts)}) "
+                      f"VALUES ({new_id}, {column_list(fts, 'new.')});")
+        fts_delete = (f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {column_list(fts)}) "
+                      f"VALUES ('delete', old.\"id\", {column_list(fts, 'old.')});")
+        # UPDATE 只在被索引字段变化时同步全文索引（如 clean_ipc.py 只改 ipc 字段）
+        fts_update_delete = (f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {column_list(fts)}) "
+                             f"SELECT 'delete', old.\"id\", {column_list(fts, 'old.')} WHERE {fts_changed};")
+        fts_update_insert = (f"INSERT INTO {FTS_TABLE}(rowid, {column_list(fts)}) "
+                             f"SELECT new.\"id\", {column_list(fts, 'new.')} WHERE {fts_changed};")
+
+    # 逐条 execute 而不用 executescript，后者会提交调用方（split_patent_table）尚未完成的事务
+    drop_view_triggers(conn)
+    conn.execute(f"""
+        CREATE TRIGGER {TABLE}_view_insert INSTEAD OF INSERT ON {TABLE} BEGIN
+            INSERT INTO {META_TABLE} ({column_list(meta_columns)})
+            VALUES ({column_list(meta_columns, 'new.')});
+            INSERT INTO {TEXT_TABLE} (patent_id, {column_list(text_columns)})
+            VALUES ({new_id}, {", ".join(pack(f'new."{c}"') for c in text_columns)});
+            {fts_insert}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER {TABLE}_view_update INSTEAD OF UPDATE ON {TABLE} BEGIN
+            {fts_update_delete}
+            UPDATE {META_TABLE} SET {", ".join(f'"{c}" = new."{c}"' for c in meta_columns)}
+            WHERE "id" = old."id";
+            UPDATE {TEXT_TABLE} SET patent_id = new."id", {", ".join(f'"{c}" = ' + pack(f'new."{c}"') for c in text_columns)}
+            WHERE patent_id = old."id" AND ({text_changed});
+            {fts_update_insert}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER {TABLE}_view_delete INSTEAD OF DELETE ON {TABLE} BEGIN
+            {fts_delete}
+            DELETE FROM {TEXT_TABLE} WHERE patent_id = old."id";
+            DELETE FROM {META_TABLE} WHERE "id" = old."id";
+        END
+    """)
+
+
+def drop_view_triggers(conn: sqlite3.Connection):
+    for action in ("insert", "update", "delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {TABLE}_view_{action}")
+
+
+def split_patent_table(conn: sqlite3.Connection, compress: bool = False):
+    """把 patent 表纵向拆分为 patent_meta（短字段）与 patent_text（大文本），并建立兼容视图 patent。
+
+    - patent_meta 保留 id 与全部短字段，原 patent 表上只涉及短字段的索引在其上重建。
+    - patent_text(patent_id, abstract, patent_scope, detailed_description)，compress=True 时以 zstd 压缩存储。
+    - 视图 patent 的列名与顺序不变，大模型生成的 SQL 无需修改；写入经 INSTEAD OF 触发器分发。
+    - 全文索引（外部内容表指向 patent）随视图继续可用，rowid 不变，无需重建。
+    整个迁移在一个事务中完成，失败时数据库保持原样。
+    """
+    if object_type(conn, TABLE) != "table":
+        raise ValueError(f"{TABLE} 不是数据表，可能已经拆分过")
+    register_text_functions(conn)
+
+    info = list(conn.execute(f'PRAGMA table_info("{TABLE}")'))
+    columns = [row[1] for row in info]
+    meta_defs = []
+    for _, name, col_type, notnull, default, pk in info:
+        if name in TEXT_COLUMNS:
+            continue
+        if pk:
+            meta_defs.append(f'"{name}" INTEGER PRIMARY KEY AUTOINCREMENT')
+            continue
+        definition = f'"{name}" {col_type}'.strip()
+        if notnull:
+            definition += " NOT NULL"
+        if default is not None:
+            definition += f" DEFAULT {default}"
+        meta_defs.append(definition)
+    meta_columns = [c for c in columns if c not in TEXT_COLUMNS]
+    text_columns = [c for c in columns if c in TEXT_COLUMNS]
+
+    # 只涉及短字段的索引迁移到 patent_meta
+    indexes = []
+    for name, unique in conn.execute(
+        "SELECT name, sql LIKE 'CREATE UNIQUE%' FROM sqlite_master "
+        "WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (TABLE,)
+    ).fetchall():
+        index_columns = [row[2] for row in conn.execute(f'PRAGMA index_info("{name}")')]
+        if index_columns and all(c in meta_columns for c in index_columns):
+            indexes.append((name, bool(unique), index_columns))
+
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN")
+        conn.execute(f"CREATE TABLE {META_TABLE} ({', '.join(meta_defs)})")
+        conn.execute(f"""
+            CREATE TABLE {TEXT_TABLE} (
+                patent_id INTEGER PRIMARY KEY,
+                {", ".join(f'"{c}" {"BLOB" if compress else "TEXT"}' for c in text_columns)}
+            )
+        """)
+        meta_list = column_list(meta_columns)
+        conn.execute(f"INSERT INTO {META_TABLE} ({meta_list}) SELECT {meta_list} FROM {TABLE} ORDER BY id")
+        values = ", ".join(f'zstd_pack("{c}")' if compress else f'"{c}"' for c in text_columns)
+        conn.execute(
+            f"INSERT INTO {TEXT_TABLE} (patent_id, {column_list(text_columns)}) "
+            f"SELECT id, {values} FROM {TABLE} ORDER BY id"
+        )
+
+        # 删除原表会一并删除其索引与全文索引同步触发器
+        conn.execute(f"DROP TABLE {TABLE}")
+        for name, unique, index_columns in indexes:
+            conn.execute(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX \"{name}\" ON {META_TABLE} "
+                f"({column_list(index_columns)})"
+            )
+        create_view(conn, columns, compress)
+        create_view_triggers(conn)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.isolation_level = isolation_level
+
+    conn.execute(f"ANALYZE {META_TABLE}")
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="将 patent 表的大文本字段纵向拆分到 patent_text，并以视图 patent 保持兼容（迁移前请备份数据库）"
+    )
+    parser.add_argument("--db", default=DB_PATH, help="数据库路径")
+    parser.add_argument("--zstd", action="store_true", help="大文本以 zstd 压缩存储（需安装 zstandard）")
+    parser.add_argument("--no-vacuum", action="store_true", help="迁移后不执行 VACUUM 回收空间")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    print(f"正在拆分 {TABLE} 表（{'zstd 压缩' if args.zstd else '不压缩'}）...")
+    split_patent_table(conn, compress=args.zstd)
+    if not args.no_vacuum:
+        print("正在执行 VACUUM ...")
+        conn.execute("VACUUM")
+    conn.close()
+    print("拆分完成！")
+
+
+if __name__ == "__main__":
+    main()
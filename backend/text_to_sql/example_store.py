@@ -0,0 +1,207 @@
+import os
+import re
+import json
+import math
+import sqlite3
+import argparse
+import threading
+from collections import Counter
+
+try:
+    from backend.text_to_sql.sql_cache import normalize_question, extract_literals, template_key
+except ImportError:  # 直接以脚本方式运行
+    from sql_cache import normalize_question, extract_literals, template_key
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# 示例库与检索配置，可通过环境变量覆盖
+EXAMPLES_PATH = os.getenv("TEXT2SQL_EXAMPLES_PATH", os.path.join(current_dir, "examples.json"))
+# 每个问题附带的示例数；<=0 时附带全部提示词示例（与改造前一致，示例段落固定不变）
+EXAMPLE_TOP_K = int(os.getenv("TEXT2SQL_EXAMPLES_K", "4"))
+DB_PATH = os.path.join(current_dir, "..", "sqlite", "patents.db")
+EXCEL_PATH = os.path.join(current_dir, "..", "data", "专利问题.xlsx")
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 问题表中的列：第E列问题、第J列 SQL、第L列 bertscore、第M列人工标注的回答准确性
+QUESTION_COLUMN = 5
+SQL_COLUMN = 10
+BERTSCORE_COLUMN = 12
+VERDICT_COLUMN = 13
+# 第M列中视为 “已验证正确” 的标注
+VERIFIED_MARKS = {"正确", "准确", "是", "对", "1", "√", "✓", "true", "yes"}
+
+placeholder_pattern = re.compile(r"<(date|pn|ipc|year|org)>")
+
+
+def question_terms(question: str):
+    """检索用的词项：字面量替换为类型占位符（同结构、不同公司/年份的问题彼此相近），
+    其余部分取单字与相邻二字"""
+    key = template_key(question, extract_literals(question))
+    terms = []
+    for i, part in enumerate(placeholder_pattern.split(key)):
+        if i % 2:
+            terms.append(f"<{part}>")
+            continue
+        chars = [ch for ch in part if not ch.isspace()]
+        terms.extend(chars)
+        terms.extend(a + b for a, b in zip(chars, chars[1:]))
+    return terms
+
+
+def load_examples(path: str = EXAMPLES_PATH):
+    """读取示例库：[{"question", "sql", "source", ...}, ...]，文件不存在时返回空列表"""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_examples(examples, path: str = EXAMPLES_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(examples, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+class ExampleIndex:
+    """示例问题上的本地 BM25 检索（无需网络与额外依赖）"""
+
+    def __init__(self, examples):
+        self.examples = list(examples)
+        self.docs = [Counter(question_terms(ex["question"])) for ex in self.examples]
+        self.lengths = [sum(doc.values()) for doc in self.docs]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        df = Counter(term for doc in self.docs for term in doc)
+        n = len(self.docs)
+        self.idf = {term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()}
+
+    def scores(self, question: str):
+        terms = set(question_terms(question))
+        result = []
+        for doc, length in zip(self.docs, self.lengths):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self.avg_length) if self.avg_length else BM25_K1
+            result.append(sum(
+                self.idf[t] * doc[t] * (BM25_K1 + 1) / (doc[t] + norm)
+                for t in terms if t in doc
+            ))
+        return result
+
+    def top_k(self, question: str, k: int):
+        """返回与问题最相似的 k 个示例（归一化后相同的问题只保留一个），按相似度从低到高排列，
+        最相似的示例紧挨着问题"""
+        scores = self.scores(question)
+        order = sorted(range(len(self.examples)), key=lambda i: (-scores[i], i))
+        chosen, seen = [], set()
+        for i in order:
+            key = normalize_question(self.examples[i]["question"])
+            if key in seen:
+                continue
+            seen.add(key)
+            chosen.append(self.examples[i])
+            if len(chosen) >= k:
+                break
+        return chosen[::-1]
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_example_index():
+    """返回进程内共享的示例索引（首次调用时读取示例库并建立索引）"""
+    global _default_index
+    if _default_index is None:
+        with _default_lock:
+            if _default_index is None:
+                _default_index = ExampleIndex(load_examples())
+    return _default_index
+
+
+def select_examples(question: str, k: int = None):
+    """为问题挑选示例：k（默认 EXAMPLE_TOP_K）<=0 时返回全部提示词示例，否则返回最相似的 k 个"""
+    k = EXAMPLE_TOP_K if k is None else k
+    index = get_example_index()
+    if k <= 0:
+        return [ex for ex in index.examples if ex.get("source") == "prompt"]
+    return index.top_k(question, k)
+
+
+def is_verified(row, min_bertscore: float = None) -> bool:
+    """问题表中的一行是否可作为示例：第M列标注为正确，或 bertscore 不低于 min_bertscore"""
+    verdict = row[VERDICT_COLUMN - 1]
+    if verdict is not None and str(verdict).strip().lower() in VERIFIED_MARKS:
+        return True
+    if min_bertscore is not None:
+        try:
+            return float(row[BERTSCORE_COLUMN - 1]) >= min_bertscore
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def grow_from_excel(excel_path: str = EXCEL_PATH, examples_path: str = EXAMPLES_PATH,
+                    db_path: str = DB_PATH, min_bertscore: float = None) -> int:
+    """把问题表中已验证的 (第E列问题, 第J列 SQL) 追加到示例库，返回新增条数。
+
+    SQL 须为 SELECT 且能在数据库上执行并返回结果（数据库不存在时跳过执行检查）；
+    归一化后与已有示例相同的问题不重复添加。
+    """
+    from openpyxl import load_workbook
+
+    examples = load_examples(examples_path)
+    known = {normalize_question(ex["question"]) for ex in examples}
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) if os.path.exists(db_path) else None
+
+    wb = load_workbook(excel_path, read_only=True)
+    added = 0
+    for row_idx, row in enumerate(wb.active.iter_rows(min_row=2, values_only=True), start=2):
+        question, sql = row[QUESTION_COLUMN - 1], row[SQL_COLUMN - 1]
+        if not question or not sql or not is_verified(row, min_bertscore):
+            continue
+        question, sql = str(question).strip(), str(sql).strip().rstrip(";；").strip()
+        key = normalize_question(question)
+        if key in known or not sql.upper().startswith("SELECT"):
+            continue
+        if conn is not None:
+            try:
+                if conn.execute(f"SELECT 1 FROM ({sql}) LIMIT 1").fetchone() is None:
+                    continue
+            except sqlite3.Error:
+                continue
+        examples.append({"question": question, "sql": sql, "source": "sheet", "row": row_idx})
+        known.add(key)
+        added += 1
+    wb.close()
+    if conn is not None:
+        conn.close()
+
+    if added:
+        save_examples(examples, examples_path)
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="text2sql 示例库：由问题表扩充示例，或查看问题的检索结果")
+    parser.add_argument("--examples", default=EXAMPLES_PATH, help="示例库路径（JSON）")
+    parser.add_argument("--grow", nargs="?", const=EXCEL_PATH, default=None, help="由问题表扩充示例库")
+    parser.add_argument("--db", default=DB_PATH, help="用于校验 SQL 可执行的数据库")
+    parser.add_argument("--min-bertscore", type=float, default=None,
+                        help="第M列未标注时，bertscore 不低于该值的行也视为已验证")
+    parser.add_argument("--query", default=None, help="打印该问题检索到的示例")
+    parser.add_argument("-k", type=int, default=EXAMPLE_TOP_K, help="检索的示例数")
+    args = parser.parse_args()
+
+    if args.grow:
+        added = grow_from_excel(args.grow, args.examples, args.db, args.min_bertscore)
+        print(f"新增 {added} 条示例，示例库共 {len(load_examples(args.examples))} 条")
+    if args.query:
+        for ex in ExampleIndex(load_examples(args.examples)).top_k(args.query, args.k)[::-1]:
+            print(f"{ex['question']}\n    {ex['sql']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import os
+import re
+import json
+import calendar
+import unicodedata
+
+try:
+    from backend.text_to_sql.sql_cache import _t2s
+except ImportError:  # 直接以脚本方式运行
+    from sql_cache import _t2s
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+ALIASES_PATH = os.path.join(current_dir, "..", "sqlite", "entity_aliases.json")
+
+# 规则解析开关：TEXT2SQL_FAST_PATH=0 时所有问题都交给大模型
+FAST_PATH_ENABLED = os.getenv("TEXT2SQL_FAST_PATH", "1") != "0"
+# 去掉已识别的槽位与虚词后，允许残留的汉字/字母数；超过则视为置信度不足，交给大模型
+MAX_RESIDUAL_CHARS = 0
+# 否定、排除与比较的提示词：规则只能表达 “等于 / 包含”，问题中出现这些词时一律交给大模型，
+# 避免把 “不是本国公开”“2024年后”“除某公司外” 解析成意思相反的条件
+NEGATION_MARKERS = ("不", "非", "除", "外", "前", "后", "以上", "以下", "超过")
+
+TABLE = "patent"
+# 列表类问题总会带上的字段（与 ensure_select_id_url 一致）
+ALWAYS_SELECTED = ["id", "url", "patent_title"]
+
+CN_DIGITS = {"一": 1, "两": 2, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9, "十": 10}
+
+# 问题中要求返回的字段，长词在前
+FIELD_WORDS = [
+    ("公开公告号", "publication_number"), ("公开公告日", "publication_date"), ("专利名称", "patent_title"),
+    ("公开号", "publication_number"), ("公告号", "publication_number"), ("公开日", "publication_date"),
+    ("申请日", "application_date"), ("申请人", "applicant"), ("发明人", "inventor"), ("代理人", "agent"),
+    ("专利名", "patent_title"), ("名称", "patent_title"), ("摘要", "abstract"),
+]
+
+# 不影响语义的虚词与套话，长词在前；去掉槽位后只剩这些词时才认为解析可信
+FILLER_WORDS = sorted([
+    "请问", "请给出", "给出", "列出", "列举", "查找", "查询", "找出", "帮我", "一下",
+    "截至至", "截至", "截止到", "截止", "期间", "之间", "以来", "至今",
+    "公开公告", "发布", "发表", "公开", "公告", "申请",
+    "相关专利", "的专利", "专利", "相关", "有关", "涉及",
+    "多少", "数量", "总数", "一共", "总共", "共有", "共", "有", "是什么", "是多少", "是", "为谁", "谁",
+    "哪些", "什么", "分别", "其", "名下", "旗下", "所有", "及其", "以及", "和", "与", "及", "并",
+    "在", "中", "于", "的", "了", "为", "年",
+    "篇", "条", "件", "项", "个",
+], key=len, reverse=True)
+
+# 领域词到标题检索词的映射，与 text2sql 提示词规则 8 一致
+TOPIC_SHORTHANDS = {"集成电路制造工艺": "集成电路", "芯片功耗降低": "功耗", "生技医药": "生物", "芯片制造": "制造"}
+
+COUNT_WORDS = ("多少篇", "多少条", "多少件", "多少项", "多少个", "数量", "几篇", "几条", "几件", "总数")
+LIST_HINTS = ("是什么", "有哪些", "哪些")
+
+org_pattern = re.compile(
+    r"(?:申请人为|申请人是)?(?P<org>[一-鿿]{2,30}?(?:股份有限公司|有限公司|公司|大学|研究院))"
+)
+# 机构名前面常见的动词 / 介词，匹配到的机构名需要去掉
+ORG_PREFIXES = ("请给出", "给出", "列出", "列举", "查找", "查询", "请问", "一篇由", "一篇", "由", "在", "的")
+pn_pattern = re.compile(
+    r"(?:公开公告号|公开号|公告号|公开编号)?\s*(?:为|是)?\s*(?P<pn>(?<![A-Za-z0-9])TW\d{6,}[A-Z]\d?(?![A-Za-z0-9]))",
+    re.IGNORECASE,
+)
+ipc_pattern = re.compile(
+    r"IPC\s*(?:分类号|号)?\s*(?:包含|为|是|含|属于)?\s*(?P<code>[A-H]\d{2}[A-Z](?:\s*\d{1,4}\s*/\s*\d{1,6})?)(?![A-Za-z0-9])",
+    re.IGNORECASE,
+)
+domestic_pattern = re.compile(r"(?:在)?台湾(?:的)?\s*[“\"「]?本国公开[”\"」]?|[“\"「]?本国公开[”\"」]?|在台湾公开")
+year_range_pattern = re.compile(
+    r"(?P<y1>(?:19|20)\d{2})\s*年?\s*(?:-|~|至|到)\s*(?P<y2>(?:19|20)\d{2})\s*年"
+)
+since_pattern = re.compile(r"(?P<y>(?:19|20)\d{2})\s*年\s*(?:至今|以来)")
+until_date_pattern = re.compile(
+    r"(?:截至至|截至|截止到|截止|到)\s*(?P<y>(?:19|20)\d{2})\s*年\s*(?P<m>\d{1,2})\s*月\s*(?P<d>\d{1,2})\s*日"
+)
+until_year_pattern = re.compile(r"(?:截至至|截至|截止到|截止)\s*(?P<y>(?:19|20)\d{2})\s*年(?!\s*\d)")
+year_pattern = re.compile(r"(?P<y>(?<!\d)(?:19|20)\d{2})\s*年")
+quoted_pattern = re.compile(r"[“\"「『](?P<t>[^”\"」』]{1,30})[”\"」』]")
+topic_pattern = re.compile(r"(?:发布|公开|申请|公告|发表)的(?P<t>[一-鿿]{1,10}?)(?:相关)?专利")
+limit_pattern = re.compile(
+    r"(?:不少于|至少|不低于|最多)?\s*(?:(?P<lo>\d+)\s*(?:-|~|到|至)\s*)?(?P<n>\d+|[一两二三四五六七八九十])\s*(?:篇|条|个|项|件)"
+)
+# 日期槽位后紧跟 “申请” 时按申请日筛选，否则按公开日
+application_after = re.compile(r"^\s*(?:的)?申请")
+
+
+class ParsedQuery:
+    """规则解析的结果：参数化 SQL（? 占位）与参数，render() 得到可直接执行的 SQL 文本"""
+
+    def __init__(self, sql: str, params, intent: str):
+        self.sql = sql
+        self.params = list(params)
+        self.intent = intent
+
+    def render(self) -> str:
+        """把参数按 SQL 字符串字面量代入（单引号转义）；下游的改写（FTS / IPC / 实体 / 汇总表）基于字面量工作"""
+        parts = self.sql.split("?")
+        out = [parts[0]]
+        for value, part in zip(self.params, parts[1:]):
+            out.append("'" + str(value).replace("'", "''") + "'")
+            out.append(part)
+        return "".join(out)
+
+    def __repr__(self):
+        return f"ParsedQuery({self.intent!r}, {self.sql!r}, {self.params!r})"
+
+
+_aliases = None
+
+
+def applicant_aliases() -> dict:
+    """人工维护的申请人简称 -> 标准名（取自实体索引的别名表，仅含汉字的简称）"""
+    global _aliases
+    if _aliases is None:
+        _aliases = {}
+        if os.path.exists(ALIASES_PATH):
+            with open(ALIASES_PATH, encoding="utf-8") as f:
+                for name, extra in json.load(f).get("applicant", {}).items():
+                    for alias in extra:
+                        if re.fullmatch(r"[一-鿿]{2,}", alias):
+                            _aliases[alias] = name
+    return _aliases
+
+
+def cn_number(text: str) -> int:
+    return int(text) if text.isdigit() else CN_DIGITS[text]
+
+
+def month_end(year: int, month: int, day: int) -> str:
+    """日期越界（如 6 月 31 日）时取当月最后一天"""
+    month = min(max(month, 1), 12)
+    day = min(max(day, 1), calendar.monthrange(year, month)[1])
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+class _Scanner:
+    """逐个槽位在问题上匹配，已识别的片段用 \x00 覆盖，最后检查残留文字"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def take(self, pattern, count: int = 0):
+        matches = list(pattern.finditer(self.text))
+        if count:
+            matches = matches[:count]
+        for m in matches:
+            self.text = self.text[:m.start()] + "\x00" * (m.end() - m.start()) + self.text[m.end():]
+        return matches
+
+    def take_word(self, word: str) -> bool:
+        if word in self.text:
+            self.text = self.text.replace(word, "\x00" * len(word))
+            return True
+        return False
+
+    def residual(self) -> str:
+        text = self.text
+        for word in FILLER_WORDS:
+            text = text.replace(word, "")
+        return "".join(
+            ch for ch in text
+            if ch != "\x00" and not ch.isspace() and not unicodedata.category(ch).startswith(("P", "S"))
+        )
+
+
+def parse_question(question: str):
+    """解析常见句式，返回 ParsedQuery；置信度不足（有未识别的内容、含否定 / 排除 / 比较词、
+    意图冲突等）时返回 None"""
+    text = unicodedata.normalize("NFKC", _t2s(question.strip()))
+    if any(marker in text for marker in NEGATION_MARKERS):
+        return None
+    scanner = _Scanner(text)
+    conditions, params = [], []
+
+    def add(condition, value):
+        conditions.append(condition)
+        params.append(value)
+
+    # 公开号
+    pns = scanner.take(pn_pattern)
+    if len(pns) > 1:
+        return None
+    # 申请人（完整公司名或人工维护的简称）
+    orgs = scanner.take(org_pattern)
+    names = []
+    for m in orgs:
+        name = m.group("org")
+        changed = True
+        while changed:
+            changed = False
+            for prefix in ORG_PREFIXES:
+                if name.startswith(prefix) and len(name) - len(prefix) >= 4:
+                    name, changed = name[len(prefix):], True
+        names.append(name)
+    for alias, name in applicant_aliases().items():
+        if scanner.take_word(alias):
+            names.append(name)
+    if len(set(names)) > 1:
+        return None
+
+    # 日期（先长后短，避免单个年份吃掉区间的一部分）
+    date_filters = []
+    for pattern in (year_range_pattern, until_date_pattern, until_year_pattern, since_pattern, year_pattern):
+        for m in scanner.take(pattern):
+            date_filters.append((pattern, m, bool(application_after.match(text[m.end():]))))
+    if len(date_filters) > 1:
+        return None
+
+    ipcs = scanner.take(ipc_pattern)
+    if len(ipcs) > 1:
+        return None
+    domestic = bool(scanner.take(domestic_pattern))
+    topics = [m.group("t") for m in scanner.take(quoted_pattern)]
+    topics += [m.group("t") for m in scanner.take(topic_pattern)]
+
+    count = any(scanner.take_word(w) for w in COUNT_WORDS)
+    limits = scanner.take(limit_pattern)
+    if len(limits) > 1:
+        return None
+    # 返回字段按在问题中出现的先后排列
+    found = []
+    for word, field in FIELD_WORDS:
+        position = scanner.text.find(word)
+        if scanner.take_word(word):
+            found.append((position, field))
+    fields = []
+    for _, field in sorted(found):
+        if field not in fields:
+            fields.append(field)
+    list_hint = any(w in text for w in LIST_HINTS)
+
+    if len(scanner.residual()) > MAX_RESIDUAL_CHARS:
+        return None
+
+    # 意图：计数与列表字段同时出现（“有多少篇，列举其中两篇”）交给大模型
+    if count and (fields or limits):
+        return None
+    if not count and not fields:
+        if not list_hint:
+            return None
+        fields = ["patent_title"]
+
+    if names:
+        add('"applicant" LIKE ?', f"%{names[0]}%")
+    for pattern, m, by_application in date_filters:
+        column = '"application_date"' if by_application else '"publication_date"'
+        if pattern is year_range_pattern:
+            y1, y2 = int(m.group("y1")), int(m.group("y2"))
+            if y1 > y2:
+                return None
+            conditions.append(f"{column} BETWEEN ? AND ?")
+            params.extend([f"{y1}-01-01", f"{y2}-12-31"])
+        elif pattern is until_date_pattern:
+            add(f"{column} <= ?", month_end(int(m.group("y")), int(m.group("m")), int(m.group("d"))))
+        elif pattern is until_year_pattern:
+            add(f"{column} <= ?", f"{m.group('y')}-12-31")
+        elif pattern is since_pattern:
+            add(f"{column} >= ?", f"{m.group('y')}-01-01")
+        else:
+            add(f"{column} LIKE ?", f"{m.group('y')}%")
+    for m in ipcs:
+        code = re.sub(r"\s+", "", m.group("code")).upper()
+        # 只有小类（如 H01L）时按前缀匹配，带组号时按包含匹配
+        add('"ipc" LIKE ?', f"{code}%" if "/" not in code else f"%{code}%")
+    if domestic:
+        add('"keywords" LIKE ?', "%本国公开%")
+    for topic in topics:
+        add('"patent_title" LIKE ?', f"%{TOPIC_SHORTHANDS.get(topic, topic)}%")
+    for m in pns:
+        # 与大模型路径一致：postprocess_sql 把该字段上的等值比较改写为包含匹配
+        add('"publication_number" LIKE ?', f"%{m.group('pn').upper()}%")
+
+    if not conditions:
+        return None
+    where = " AND ".join(conditions)
+    if count:
+        return ParsedQuery(f"SELECT COUNT(*) FROM {TABLE} WHERE {where}", params, "count")
+
+    columns = ", ".join(f'"{c}"' for c in fields + [c for c in ALWAYS_SELECTED if c not in fields])
+    sql = f"SELECT {columns} FROM {TABLE} WHERE {where}"
+    if limits:
+        sql += f" LIMIT {cn_number(limits[0].group('n'))}"
+    return ParsedQuery(sql, params, "list")
+
+
+def fast_path_sql(question: str):
+    """规则解析得到的 SQL 文本；未启用或置信度不足时返回 None，由调用方交给大模型"""
+    if not FAST_PATH_ENABLED:
+        return None
+    parsed = parse_question(question)
+    return parsed.render() if parsed is not None else None
@@ -0,0 +1,293 @@
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# 缓存配置，可通过环境变量覆盖
+CACHE_PATH = os.getenv("TEXT2SQL_CACHE_PATH", os.path.join(current_dir, "..", "sqlite", "text2sql_cache.db"))
+CACHE_ENABLED = os.getenv("TEXT2SQL_CACHE", "1") != "0"
+CACHE_TTL = float(os.getenv("TEXT2SQL_CACHE_TTL", str(7 * 24 * 3600)))   # 秒，<=0 表示永不过期
+CACHE_MAX_ENTRIES = int(os.getenv("TEXT2SQL_CACHE_MAX_ENTRIES", "10000"))
+
+# 归一化时保留的标点：IPC 编号中的 /、日期与区间中的 -、小数点
+KEEP_PUNCT = set("/-.")
+DASHES = dict.fromkeys(map(ord, "‐‑‒–—―－~～"), "-")
+
+# 问题中的可替换字面量，按优先级排列：完整日期 > 公开号 > IPC > 年份 > 机构名
+literal_pattern = re.compile(
+    r"(?P<date>(?:19|20)\d{2}年\d{1,2}月\d{1,2}日)"
+    r"|(?P<pn>(?<![A-Za-z0-9])TW\d{6,}[A-Z]?\d?(?![A-Za-z0-9]))"
+    r"|(?P<ipc>(?<![A-Za-z0-9])[A-H]\d{2}[A-Z](?:\d{1,4}(?:/\d{1,6})?)?(?![A-Za-z0-9]))"
+    r"|(?P<year>(?<!\d)(?:19|20)\d{2}(?!\d))"
+    r"|(?P<org>[\u4e00-\u9fff]{2,40}?(?:股份有限公司|有限公司|公司|大学|研究院))",
+    re.IGNORECASE,
+)
+
+_converter = None
+
+
+def _t2s(text: str) -> str:
+    """繁体 -> 简体（OpenCC，首次调用时加载词典）"""
+    global _converter
+    if _converter is None:
+        from opencc import OpenCC
+        _converter = OpenCC("t2s")
+    return _converter.convert(text)
+
+
+def normalize_question(question: str) -> str:
+    """问题归一化：繁简折叠、全半角统一、大小写统一，去除空白与标点（保留 / - .）"""
+    text = unicodedata.normalize("NFKC", _t2s(question.strip())).translate(DASHES).lower()
+    return "".join(
+        ch for ch in text
+        if not ch.isspace() and (ch in KEEP_PUNCT or not unicodedata.category(ch).startswith("P"))
+    )
+
+
+def extract_literals(question: str):
+    """提取问题中的字面量，返回 [(类型, 原文, 在 SQL 中的形式), ...]，按出现顺序"""
+    literals = []
+    for m in literal_pattern.finditer(unicodedata.normalize("NFKC", question)):
+        kind = m.lastgroup
+        raw = m.group(0)
+        if kind == "date":
+            y, mo, d = re.findall(r"\d+", raw)
+            sql_form = f"{y}-{int(mo):02d}-{int(d):02d}"
+        elif kind in ("pn", "ipc"):
+            sql_form = raw.upper()
+        else:
+            sql_form = raw
+        literals.append((kind, raw, sql_form))
+    return literals
+
+
+def template_key(question: str, literals) -> str:
+    """将字面量替换为类型占位符后的归一化问题，用于识别 “同一问题、不同字面量”"""
+    text = unicodedata.normalize("NFKC", question)
+    for kind, raw, _ in literals:
+        text = text.replace(raw, f" <{kind}> ", 1)
+    return normalize_question(text)
+
+
+def build_skeleton(sql: str, literals):
+    """由 SQL 与问题字面量生成 SQL 骨架：字面量替换为 {{0}}、{{1}} 占位。
+
+    机构名允许只有后缀出现在 SQL 中（如 “给出台湾积体电路…公司” 中的 “给出”），
+    此时记录需要剥离的前缀。任一字面量在 SQL 中找不到、或字面量取值重复时返回 None。
+    """
+    if not literals:
+        return None
+    forms = [form for _, _, form in literals]
+    if len(set(forms)) != len(forms):
+        return None
+
+    prefixes = []
+    for kind, _, form in literals:
+        strip = ""
+        if form not in sql and kind == "org":
+            for i in range(1, len(form) - 1):
+                if form[i:] in sql:
+                    strip, form = form[:i], form[i:]
+                    break
+        if form not in sql:
+            return None
+        prefixes.append((strip, form))
+
+    skeleton = sql.replace("{", "{{").replace("}", "}}")
+    # 先替换较长的字面量，避免短字面量（如年份）破坏长字面量（如日期）
+    order = sorted(range(len(prefixes)), key=lambda i: -len(prefixes[i][1]))
+    for i in order:
+        skeleton = skeleton.replace(prefixes[i][1].replace("{", "{{").replace("}", "}}"), f"{{{i}}}")
+    return skeleton, [strip for strip, _ in prefixes]
+
+
+def fill_skeleton(skeleton: str, strips, literals):
+    """用新问题的字面量填充 SQL 骨架；机构名前缀与缓存时不一致则返回 None"""
+    if len(strips) != len(literals):
+        return None
+    values = []
+    for strip, (_, _, form) in zip(strips, literals):
+        if strip:
+            # 前缀按繁简折叠后比较，“給出” 与 “给出” 视为相同
+            if _t2s(form[:len(strip)]) != _t2s(strip):
+                return None
+            form = form[len(strip):]
+        values.append(form.replace("'", "''"))
+    return skeleton.format(*values)
+
+
+def prompt_version() -> str:
+    """生成 SQL 所用提示词的版本：系统提示词、指令、示例库内容、示例个数与模型名的摘要。
+    任一项变化后旧提示词生成的 SQL 不再命中缓存"""
+    from backend.components import text2sql_prompts
+    from backend.components.llm import LLM_MODEL
+    from backend.text_to_sql.example_store import EXAMPLES_PATH, EXAMPLE_TOP_K
+
+    digest = hashlib.sha1()
+    for part in (text2sql_prompts.TEXT2SQL_SYSTEM_PROMPT, text2sql_prompts.TEXT2SQL_INSTRUCTION,
+                 text2sql_prompts.QUESTION_MARKER, LLM_MODEL, str(EXAMPLE_TOP_K)):
+        digest.update(part.encode("utf-8") + b"\0")
+    if EXAMPLES_PATH and os.path.exists(EXAMPLES_PATH):
+        with open(EXAMPLES_PATH, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+class SQLCache:
+    """基于 SQLite 的问题 -> SQL 持久化缓存。
+
+    - 精确层：以归一化问题为键缓存最终 SQL。
+    - 模板层：以 “字面量替换为占位符后的问题” 为键缓存 SQL 骨架，命中时代入新字面量。
+    - 版本：键带有 version 前缀（默认缓存取 prompt_version()），提示词或示例库变化后
+      旧条目不再命中，由 LRU / TTL 自然淘汰。
+    - 淘汰：按 last_access 的 LRU（条目数超过 max_entries 时）与按 created_at 的 TTL。
+    - 统计：stats() 返回命中率、节省的 LLM 耗时与淘汰条数。
+    """
+
+    def __init__(self, path: str = CACHE_PATH, ttl: float = CACHE_TTL,
+                 max_entries: int = CACHE_MAX_ENTRIES, use_templates: bool = True, version: str = ""):
+        self.path = path
+        self.version = version
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.use_templates = use_templates
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sql_cache (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                question TEXT,
+                sql TEXT NOT NULL,
+                strips TEXT,
+                latency REAL,
+                created_at REAL,
+                last_access REAL,
+                hits INTEGER DEFAULT 0,
+                PRIMARY KEY (kind, key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_sql_cache_access ON sql_cache(last_access);
+        """)
+        self._conn.commit()
+        self.counters = {
+            "hits": 0, "template_hits": 0, "misses": 0,
+            "evictions": 0, "expirations": 0, "saved_seconds": 0.0,
+        }
+
+    def _key(self, key: str) -> str:
+        return f"{self.version}:{key}" if self.version else key
+
+    def _lookup(self, kind: str, key: str):
+        key = self._key(key)
+        row = self._conn.execute(
+            "SELECT sql, strips, latency, created_at FROM sql_cache WHERE kind = ? AND key = ?",
+            (kind, key)
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if self.ttl > 0 and now - row[3] > self.ttl:
+            self._conn.execute("DELETE FROM sql_cache WHERE kind = ? AND key = ?", (kind, key))
+            self._conn.commit()
+            self.counters["expirations"] += 1
+            return None
+        self._conn.execute(
+            "UPDATE sql_cache SET last_access = ?, hits = hits + 1 WHERE kind = ? AND key = ?",
+            (now, kind, key)
+        )
+        self._conn.commit()
+        return row
+
+    def get(self, question: str):
+        """命中返回 SQL，未命中返回 None"""
+        with self._lock:
+            row = self._lookup("exact", normalize_question(question))
+            if row is not None:
+                self.counters["hits"] += 1
+                self.counters["saved_seconds"] += row[2] or 0.0
+                return row[0]
+
+            if self.use_templates:
+                literals = extract_literals(question)
+                if literals:
+                    row = self._lookup("template", template_key(question, literals))
+                    if row is not None:
+                        sql = fill_skeleton(row[0], json.loads(row[1]), literals)
+                        if sql is not None:
+                            self.counters["template_hits"] += 1
+                            self.counters["saved_seconds"] += row[2] or 0.0
+                            return sql
+
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, question: str, sql: str, latency: float = 0.0):
+        """写入缓存；latency 为本次 LLM 生成耗时，用于统计命中后节省的时间"""
+        now = time.time()
+        entries = [("exact", normalize_question(question), sql, None)]
+        if self.use_templates:
+            literals = extract_literals(question)
+            built = build_skeleton(sql, literals)
+            if built is not None:
+                skeleton, strips = built
+                entries.append(("template", template_key(question, literals), skeleton, json.dumps(strips)))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sql_cache (kind, key, question, sql, strips, latency, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(kind, self._key(key), question, value, strips, latency, now, now)
+                 for kind, key, value, strips in entries]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """按 LRU 淘汰超出容量的条目"""
+        if self.max_entries <= 0:
+            return
+        count = self._conn.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM sql_cache WHERE rowid IN "
+                "(SELECT rowid FROM sql_cache ORDER BY last_access LIMIT ?)",
+                (overflow,)
+            )
+            self.counters["evictions"] += overflow
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM sql_cache")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """返回计数器快照及命中率"""
+        with self._lock:
+            stats = dict(self.counters)
+        lookups = stats["hits"] + stats["template_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["template_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_sql_cache():
+    """返回进程内共享的默认缓存；TEXT2SQL_CACHE=0 时返回 None"""
+    global _default_cache
+    if not CACHE_ENABLED:
+        return None
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = SQLCache(version=prompt_version())
+    return _default_cache
@@ -0,0 +1,175 @@
+import re
+
+from backend.components.sql_params import Token, tokenize
+
+# 需要统一为双引号标识符的字段；文本字段上的等值比较改写为 LIKE '%值%' 模糊匹配
+FUZZY_FIELDS = {
+    "application_date", "publication_date", "application_number", "publication_number", "patent_title",
+    "applicant", "keywords", "url", "inventor", "agent", "abstract", "patent_scope", "detailed_description",
+    "priority", "gazette_ipc", "ipc",
+}
+# 投影中总会带上的字段（上下文构建约定末三项为 id、URL、专利名）
+REQUIRED_COLUMNS = ("id", "url", "patent_title")
+# 投影只有一项且含这些聚合函数时，视为聚合查询，不追加字段
+AGGREGATE_FUNCTIONS = {"count", "sum", "avg", "min", "max", "total", "group_concat"}
+COMPOUND_KEYWORDS = {"UNION", "INTERSECT", "EXCEPT"}
+
+# 说明文字多为中文（Unicode 下属于 \w），这里只按 ASCII 单词边界查找 SELECT
+select_start_pattern = re.compile(r"(?<![A-Za-z0-9_])SELECT(?![A-Za-z0-9_])", re.IGNORECASE)
+code_fence_pattern = re.compile(r"```[A-Za-z]*")
+
+
+def unquote(text: str) -> str:
+    """去掉标识符两侧的引号（"x"、`x`、[x]）"""
+    if len(text) >= 2 and text[0] + text[-1] in ('""', "``", "[]"):
+        return text[1:-1]
+    return text
+
+
+def like_literal(token: Token) -> str:
+    """等值比较右侧的取值改写为 '%值%'（双引号取值转为单引号字符串）"""
+    if token.kind == "string":
+        return f"'%{token.text[1:-1]}%'"
+    value = token.text[1:-1].replace('""', '"')
+    return "'%" + value.replace("'", "''") + "%'"
+
+
+def strip_response(text: str) -> str:
+    """去掉大模型输出中 SQL 之外的部分：代码块标记、转义引号、首个 SELECT 之前的说明文字、
+    包裹整段 SQL 的引号"""
+    text = code_fence_pattern.sub(" ", text.replace('\\"', '"')).strip()
+    if text.endswith(";"):
+        text = text[:-1].strip()
+    if text.startswith('"') and text.endswith('"'):
+        text = text[1:-1]
+    m = select_start_pattern.search(text)
+    return text[m.start():] if m else text.strip()
+
+
+class _Projection:
+    """单次扫描中记录的最外层 SELECT 投影信息"""
+
+    def __init__(self):
+        self.end = None          # 投影最后一个词法单元在输出中的位置
+        self.star = False        # 含 * 或 table.*
+        self.names = set()       # 各投影项的输出列名（别名或列名，小写）
+        self.items = 0
+        self.aggregate = False   # 投影项中出现聚合函数调用
+
+
+def postprocess_sql(text: str, add_columns: bool = True) -> str:
+    """单次线性扫描完成大模型输出 SQL 的后处理：
+
+    - 提取首个 SELECT 起、到最外层第一个分号为止的 SQL（字符串中的分号不截断）；
+    - 字段名（含 `x`、"x"、带表别名前缀的写法）统一为双引号小写形式，字符串字面量内的文字不改动；
+    - "字段" = '值' / "值" 改写为 "字段" LIKE '%值%'（右侧为另一个字段时不改写）；
+    - add_columns=True 时为最外层 SELECT 补齐 "id"、"url"、"patent_title"：投影含 * 或 table.*、
+      只有一项聚合函数、或为 UNION 等复合查询时不追加，已有的（按列名或别名判断）不重复追加。
+    """
+    tokens = tokenize(strip_response(text))
+    out = []
+    depth = 0
+    projection = None       # 正在扫描的最外层投影
+    finished = None         # 已扫描完的最外层投影（遇到 FROM）
+    compound = False
+    item_last_name = None   # 当前投影项中最后出现的标识符
+    previous = None         # 上一个有效（非空白、注释）词法单元
+    n = len(tokens)
+    i = 0
+    while i < n:
+        token = tokens[i]
+        kind, text_ = token.kind, token.text
+
+        if kind in ("ws", "comment"):
+            out.append(text_)
+            i += 1
+            continue
+        if kind == "op" and text_ == ";" and depth == 0:
+            break
+
+        word = text_.upper() if kind == "word" else None
+        name = None
+        if kind in ("word", "ident") and unquote(text_).lower() in FUZZY_FIELDS:
+            name = unquote(text_).lower()
+            text_ = f'"{name}"'
+            # "字段" = '值'：向后跳过空白找 = 与取值
+            j = i + 1
+            while j < n and tokens[j].kind == "ws":
+                j += 1
+            if j < n and tokens[j].kind == "op" and tokens[j].text == "=":
+                k = j + 1
+                while k < n and tokens[k].kind == "ws":
+                    k += 1
+                if k < n and is_like_value(tokens[k]):
+                    out.append(f"{text_} LIKE {like_literal(tokens[k])}")
+                    previous = tokens[k]
+                    i = k + 1
+                    if projection is not None and depth == 0:
+                        projection.end = len(out) - 1
+                    continue
+        elif kind in ("word", "ident") and word not in ("SELECT", "DISTINCT", "ALL", "FROM", "AS"):
+            name = unquote(text_).lower()
+
+        if kind == "op" and text_ == "(":
+            if projection is not None and previous is not None and previous.kind == "word" \
+                    and previous.text.lower() in AGGREGATE_FUNCTIONS:
+                projection.aggregate = True
+            depth += 1
+        elif kind == "op" and text_ == ")":
+            depth = max(0, depth - 1)
+
+        if depth == 0 and word in COMPOUND_KEYWORDS:
+            compound = True
+        if depth == 0 and word == "SELECT" and projection is None and finished is None:
+            projection = _Projection()
+        elif depth == 0 and word == "FROM" and projection is not None:
+            if item_last_name:
+                projection.names.add(item_last_name)
+            projection.items += 1
+            finished, projection = projection, None
+        elif projection is not None and depth == 0 and not (kind == "op" and text_ == ")"):
+            if kind == "op" and text_ == ",":
+                if item_last_name:
+                    projection.names.add(item_last_name)
+                projection.items += 1
+                item_last_name = None
+            elif kind == "op" and text_ == "*" and (
+                previous is None or previous.text in (",", ".") or
+                (previous.kind == "word" and previous.text.upper() in ("SELECT", "DISTINCT", "ALL"))
+            ):
+                projection.star = True
+            elif name is not None:
+                item_last_name = name
+            elif kind in ("string", "number"):
+                item_last_name = None
+
+        out.append(text_)
+        if projection is not None and depth == 0 and word not in ("SELECT", "DISTINCT", "ALL"):
+            projection.end = len(out) - 1
+        previous = token
+        i += 1
+
+    if add_columns and finished is not None and not compound and finished.end is not None:
+        skip = finished.star or (finished.items == 1 and finished.aggregate)
+        missing = [c for c in REQUIRED_COLUMNS if c not in finished.names]
+        if not skip and missing:
+            out[finished.end] += ", " + ", ".join(f'"{c}"' for c in missing)
+    return "".join(out).strip()
+
+
+def is_like_value(token: Token) -> bool:
+    """等值比较右侧可改写为 LIKE 的取值：单引号字符串，或不是字段名的双引号串"""
+    if token.kind == "string":
+        return len(token.text) >= 2 and token.text.endswith("'")
+    return (token.kind == "ident" and token.text.startswith('"') and len(token.text) >= 2
+            and token.text.endswith('"') and unquote(token.text).lower() not in FUZZY_FIELDS)
+
+
+def extract_sql(text: str) -> str:
+    """从大模型输出中提取 SQL：统一字段引号、文本等值比较改写为 LIKE（不追加投影字段）"""
+    return postprocess_sql(text, add_columns=False)
+
+
+def ensure_select_id_url(sql: str) -> str:
+    """确保最外层 SELECT 的投影包含 "id"、"url" 与 "patent_title"（规则见 postprocess_sql）"""
+    return postprocess_sql(sql)
@@ -1,138 +1,142 @@
 import os
-import sqlite3
-import re
+import time
+import asyncio
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
-from backend.components.llm import llm
-from backend.components.text2sql_prompts import text2sql_template
+from backend.components.llm import get_llm
+from backend.components.log import get_logger, preview
+from backend.components.tracing import annotate, span
+from backend.components.text2sql_prompts import build_text2sql_messages
+from backend.text_to_sql.sql_cache import get_sql_cache
+from backend.text_to_sql.example_store import select_examples
+from backend.text_to_sql.intent_parser import fast_path_sql
+from backend.text_to_sql.sql_postprocess import extract_sql, ensure_select_id_url, postprocess_sql
 
 # 获取数据库路径
 DB_PATH = os.path.join(current_dir, "..", "sqlite", "patents.db")
 
+logger = get_logger("text2sql")
+
  
 
-import re
-
-def extract_sql(text: str) -> str:
-    text = text.strip()
-    if text.endswith(';'):
-        text = text[:-1].strip()
-    if text.startswith('"') and text.endswith('"'):
-        text = text[1:-1]
-
-    match = re.search(r"(SELECT.*?)(?:;|\Z)", text, re.IGNORECASE | re.DOTALL)
-    if match:
-        sql = match.group(1).strip()
-    else:
-        sql = text.strip()
-
-    fuzzy_fields = [
-        "application_date", "publication_date", "application_number", "publication_number", "patent_title", "applicant", "keywords", "url", "inventor",
-        "agent", "abstract", "patent_scope", "detailed_description", "priority", "gazette_ipc", "ipc"
-    ]
-
-    # 第一步：标准化字段名为双引号形式
-    for field in fuzzy_fields:
-        escaped_field = re.escape(field)
-        pattern = rf'''[`"]?{escaped_field}[`"]?'''
-        pattern = rf'(?<!\w){pattern}(?!\w)'
-
-        # 替换为双引号形式
-        sql = re.sub(pattern, f'"{field}"', sql, flags=re.IGNORECASE)
-
-    # 第二步：对标准化后的 SQL 执行模糊替换
-    for field in fuzzy_fields:
-        # 现在字段一定是双引号，所以可以直接匹配
-        pattern = rf'("{re.escape(field)}")\s*=\s*(\'[^\']*\'|"[^"]*")'
-        
-        def replace_match(m):
-            field_part = m.group(1)      # 一定是 "字段"
-            value_part = m.group(2)      # '值' 或 "值"
-            raw_value = value_part[1:-1]
-            if value_part.startswith("'"):
-                return f'{field_part} LIKE \'%{raw_value}%\''
-            else:
-                return f'{field_part} LIKE "%{raw_value}%"'
-        
-        sql = re.sub(pattern, replace_match, sql, flags=re.IGNORECASE)
+def lookup_cached_sql(question: str, use_cache: bool = True):
+    """查询问题 -> SQL 缓存，返回 (缓存对象, 命中的 SQL)；未启用缓存时缓存对象为 None"""
+    cache = get_sql_cache() if use_cache else None
+    if cache is not None:
+        cached_sql = cache.get(question)
+        if cached_sql:
+            logger.info("命中SQL缓存: %s", cached_sql)
+            return cache, cached_sql
+    return cache, None
 
-    sql = sql.replace('\\"', '"').strip()
-    return sql
 
-def ensure_select_id_url(sql: str) -> str:
-    """确保 SELECT 语句的投影列表中包含 "id"、"url" 与 "patent_title" 三个字段。
+def lookup_fast_path(question: str):
+    """规则解析常见问题形态，命中则直接返回 SQL，不调用大模型"""
+    sql_query = fast_path_sql(question)
+    if sql_query:
+        logger.info("规则解析命中: %s", sql_query)
+    return sql_query
 
-    - 若 SELECT 列表中包含 * 或 任意 table.*或COUNT(*)等聚合函数，则认为已包含所有列，不做修改。
-    - 若已显式包含 id、url 或 patent_title（大小写不敏感，支持是否加引号、是否带表前缀/别名），则不重复添加。
-    - 仅处理最外层简单 SELECT ... FROM ... 的场景，无法保证嵌套/复杂子查询的完备性。
-    """
-    try:
-        pattern = re.compile(r"^\s*select\s+(distinct\s+)?(.*?)\s+from\s", re.IGNORECASE | re.DOTALL)
-        match = pattern.search(sql)
-        if not match:
-            return sql
-
-        select_list = match.group(2).strip()
-
-        # 如果包含 * 或 table.*，视为已包含所有列
-        has_star = bool(re.search(r"(^|[,\s])\*([,\s]|$)", select_list)) or bool(re.search(r"\.[\s]*\*", select_list))
-        if has_star:
-            return sql
-        # 如果包含COUNT(*)等聚合函数，视为已包含所有列
-        if "," not in select_list and "(" in select_list and ")" in select_list:
-            return sql
-
-        # 判断是否已包含 id / URL / 专利名（忽略大小写，允许可选表前缀与引号）
-        id_present = bool(re.search(r"(?i)(?:\b\w+\s*\.\s*)?\"?id\"?(?!\w)", select_list))
-        url_present = bool(re.search(r"(?i)(?:\b\w+\s*\.\s*)?\"?url\"?(?!\w)", select_list))
-        # patent_title字段在上游标准化后通常为双引号包裹的英文名，这里既匹配标准化形式，也尽量兼容未标准化情形
-        patent_title_present = bool(re.search(r"(?:\b\w+\s*\.\s*)?\"?patent_title\"?(?!\w)", select_list, flags=re.IGNORECASE))
-
-        to_add = []
-        if not id_present:
-            to_add.append('"id"')
-        if not url_present:
-            to_add.append('"url"')
-        if not patent_title_present:
-            to_add.append('"patent_title"')
-
-        if not to_add:
-            return sql
-
-        # 安全地在 select 列表后面追加新列（保持原有大小写/格式）
-        new_select_list = f"{select_list}, {', '.join(to_add)}"
-        start, end = match.start(2), match.end(2)
-        new_sql = sql[:start] + new_select_list + sql[end:]
-        return new_sql
-    except Exception:
-        # 出现异常时，回退为原 SQL，避免阻断流程
-        return sql
-
-def text2sql(question: str) -> str:
+
+def log_usage(response) -> dict:
+    """记录本次调用的 token 用量，返回可写入 span 的属性；cached 为提供方前缀缓存命中的提示词 token 数"""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return {}
+    cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+    logger.info("token 用量: 输入 %s（cached %s），输出 %s",
+                usage.get("input_tokens"), cached, usage.get("output_tokens"))
+    return {"input_tokens": usage.get("input_tokens") or 0, "output_tokens": usage.get("output_tokens") or 0,
+            "cached_tokens": cached}
+
+
+def response_attrs(response) -> dict:
+    """大模型 SQL 调用 span 的属性：token 用量与输出字节数"""
+    return {"bytes": len(response.content.encode("utf-8")), **log_usage(response)}
+
+
+def finalize_sql(content: str) -> str:
+    """对大模型原始输出做后处理：一次扫描完成提取 SQL、统一字段引号、等值改 LIKE、
+    补齐 id/url/patent_title（见 sql_postprocess.py），并校验为 SELECT"""
+    logger.debug("大模型原始输出: %s", preview(content))
+
+    with span("sql_postprocess", bytes=len(content.encode("utf-8"))):
+        sql_query = postprocess_sql(content)
+    logger.info("后处理后的SQL: %s", sql_query)
+
+    # 验证 SQL 是否以 SELECT 开头
+    if not sql_query.upper().startswith('SELECT'):
+        raise ValueError(f"生成的SQL不是SELECT查询语句: {sql_query}")
+    return sql_query
+
+
+def text2sql(question: str, use_cache: bool = True) -> str:
     question = question.strip()
-    print("问题:", question)
+    logger.info("问题: %s", question)
+
+    # 常见问题形态由规则直接解析，不必调用大模型
+    fast_sql = lookup_fast_path(question)
+    if fast_sql:
+        annotate(sql_source="fast_path")
+        return fast_sql
+
+    # 再查问题 -> SQL 缓存（精确命中或模板代入），命中则跳过大模型调用
+    cache, cached_sql = lookup_cached_sql(question, use_cache)
+    if cached_sql:
+        annotate(sql_source="cache")
+        return cached_sql
+    annotate(sql_source="llm")
+
     try:
-        # 构建提示词
-        formatted_prompt = text2sql_template.format(question=question)
-        
+        start = time.perf_counter()
+        # 构建提示词：固定的系统消息 + 按问题检索的 top-k 示例 + 问题（系统消息逐字节稳定，可命中前缀缓存）
+        messages = build_text2sql_messages(question, select_examples(question))
+
         # 调用大模型生成SQL
-        response = llm.invoke(formatted_prompt)
-        print("大模型原始输出:", response.content)
+        with span("llm_sql") as s:
+            response = get_llm().invoke(messages)
+            s.set(**response_attrs(response))
+        sql_query = finalize_sql(response.content)
+
+        if cache is not None:
+            cache.put(question, sql_query, time.perf_counter() - start)
+        return sql_query
+        
+    except Exception as e:
+        raise Exception(f"生成SQL查询失败: {str(e)}")
 
-        # 提取 SQL
-        sql_query = extract_sql(response.content)
-        print("提取的SQL:", sql_query)
 
-        # 强制包含 id、url 与 patent_title 字段
-        sql_query = ensure_select_id_url(sql_query)
-        print("追加id/url/patent_title后的SQL:", sql_query)
+async def atext2sql(question: str, use_cache: bool = True) -> str:
+    """text2sql 的异步版本：通过 llm.ainvoke 调用大模型（限速由 llm 网关负责）。
+    缓存读写（命中时会更新并提交）与示例检索都是阻塞调用，放到线程中执行，不阻塞事件循环"""
+    question = question.strip()
+    logger.info("问题: %s", question)
 
-        # 验证 SQL 是否以 SELECT 开头
-        if not sql_query.upper().startswith('SELECT'):
-            raise ValueError(f"生成的SQL不是SELECT查询语句: {sql_query}")
-            
+    fast_sql = lookup_fast_path(question)
+    if fast_sql:
+        annotate(sql_source="fast_path")
+        return fast_sql
+
+    cache, cached_sql = await asyncio.to_thread(lookup_cached_sql, question, use_cache)
+    if cached_sql:
+        annotate(sql_source="cache")
+        return cached_sql
+    annotate(sql_source="llm")
+
+    try:
+        start = time.perf_counter()
+        examples = await asyncio.to_thread(select_examples, question)
+        messages = build_text2sql_messages(question, examples)
+
+        with span("llm_sql") as s:
+            response = await get_llm().ainvoke(messages)
+            s.set(**response_attrs(response))
+        sql_query = finalize_sql(response.content)
+
+        if cache is not None:
+            await asyncio.to_thread(cache.put, question, sql_query, time.perf_counter() - start)
         return sql_query
-        
+
     except Exception as e:
         raise Exception(f"生成SQL查询失败: {str(e)}")
@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tqdm import tqdm
+
+from generate import run_pipeline, arun_pipeline
+from backend.components.llm import llm_provider
+from backend.components.rate_limit import set_rate_limit
+from backend.components.tracing import metrics
+
+EXCEL_PATH = os.path.join("backend", "data", "专利问题.xlsx")
+
+# 问题在第E列，SQL 写入第J列，答案写入第K列
+QUESTION_COLUMN = 5
+SQL_COLUMN = 10
+ANSWER_COLUMN = 11
+
+# 只有调用大模型的阶段值得重试；查询阶段的错误由 SQL 本身决定，重试结果不变
+RETRY_STAGES = {"sql", "answer"}
+# 批量结束时把各阶段指标导出到该文件（.prom / .txt 为 Prometheus 文本，其余为 JSON lines）
+METRICS_PATH = os.getenv("QA_METRICS_PATH", "")
+
+
+def pipeline_cells(result: dict):
+    """将 run_pipeline 的结果转换为写入第J列(SQL)与第K列(答案)的值，出错时写入错误信息"""
+    sql_query = result["sql"]
+    answer_content = result["content"]
+    if result["error"]:
+        if result["failed_stage"] == "sql":
+            sql_query = f"错误: {result['error']}"
+        answer_content = f"错误: {result['error']}"
+    return sql_query, answer_content
+
+
+def read_questions(excel_path: str = EXCEL_PATH):
+    """读取第E列的非空问题，返回 [(行号, 问题), ...]（第1行为表头）"""
+    from openpyxl import load_workbook  # 导入较慢，只在读写问题表时加载
+    wb = load_workbook(excel_path, read_only=True)
+    ws = wb.active
+    questions = []
+    for row_idx, row in enumerate(ws.iter_rows(min_row=2, min_col=QUESTION_COLUMN,
+                                               max_col=QUESTION_COLUMN, values_only=True), start=2):
+        question = row[0]
+        if question and str(question).strip() != "":
+            questions.append((row_idx, str(question).strip()))
+    wb.close()
+    return questions
+
+
+def default_journal_path(excel_path: str) -> str:
+    return os.path.splitext(excel_path)[0] + ".journal.jsonl"
+
+
+class Journal:
+    """追加写入的 JSONL 检查点：每完成一个问题写一行，进程中断后可据此续跑。
+
+    同一行号可能有多条记录（失败后重试、续跑时重做），以最后一条为准。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> dict:
+        """返回 {行号: 最后一条记录}；文件末尾写了一半的行（进程被强制终止）会被忽略"""
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["row"]] = record
+        return records
+
+    def append(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+
+    def matching(self, questions) -> dict:
+        """只保留与当前问题表一致（同一行号、同一问题文本）的记录：{行号: 记录}。
+        问题表增删行或改写问题后，检查点中的旧记录不再对应原行"""
+        current = dict(questions)
+        return {row: record for row, record in self.load().items() if current.get(row) == record["question"]}
+
+    def pending(self, questions, resume: bool = True):
+        """过滤出需要处理的问题：resume=True 时跳过已成功且问题未改动的行"""
+        if not resume:
+            return list(questions)
+        done = {
+            row: record["question"]
+            for row, record in self.load().items()
+            if not record.get("error")
+        }
+        return [(row, q) for row, q in questions if done.get(row) != q]
+
+
+def make_record(row_idx: int, question: str, result: dict, attempts: int) -> dict:
+    sql_query, answer_content = pipeline_cells(result)
+    return {
+        "row": row_idx,
+        "question": question,
+        "sql": sql_query,
+        "answer": answer_content,
+        "error": result["error"],
+        "failed_stage": result["failed_stage"],
+        "attempts": attempts,
+        "timings": result["timings"],
+        "finished_at": time.time(),
+    }
+
+
+def backoff_delay(attempt: int, backoff: float) -> float:
+    """第 attempt 次重试前的等待秒数：指数退避加随机抖动，避免并发任务同时重试"""
+    return backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+def run_with_retries(row_idx: int, question: str, retries: int = 2, backoff: float = 2.0) -> dict:
+    """执行一次流水线；大模型阶段出错时按退避重试，返回检查点记录"""
+    attempt = 0
+    while True:
+        result = run_pipeline(question)
+        if not result["error"] or result["failed_stage"] not in RETRY_STAGES or attempt >= retries:
+            return make_record(row_idx, question, result, attempt + 1)
+        time.sleep(backoff_delay(attempt, backoff))
+        attempt += 1
+
+
+async def arun_with_retries(row_idx: int, question: str, retries: int = 2, backoff: float = 2.0) -> dict:
+    """run_with_retries 的异步版本"""
+    attempt = 0
+    while True:
+        result = await arun_pipeline(question)
+        if not result["error"] or result["failed_stage"] not in RETRY_STAGES or attempt >= retries:
+            return make_record(row_idx, question, result, attempt + 1)
+        await asyncio.sleep(backoff_delay(attempt, backoff))
+        attempt += 1
+
+
+def run_threaded(tasks, journal: Journal, workers: int = 8, retries: int = 2, backoff: float = 2.0):
+    """线程池模式：workers 个线程各自执行同步流水线，完成一个写一条检查点"""
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            tqdm(total=len(tasks), desc="处理 Excel", ncols=80) as pbar:
+        futures = [executor.submit(run_with_retries, row_idx, question, retries, backoff)
+                   for row_idx, question in tasks]
+        for future in as_completed(futures):
+            journal.append(future.result())
+            pbar.update(1)
+
+
+async def run_async(tasks, journal: Journal, concurrency: int = 128, retries: int = 2, backoff: float = 2.0):
+    """异步模式：单个事件循环中最多 concurrency 个问题同时在途"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(row_idx, question):
+        async with semaphore:
+            return await arun_with_retries(row_idx, question, retries, backoff)
+
+    with tqdm(total=len(tasks), desc="处理 Excel", ncols=80) as pbar:
+        for future in asyncio.as_completed([one(row_idx, question) for row_idx, question in tasks]):
+            journal.append(await future)
+            pbar.update(1)
+
+
+def export_excel(excel_path: str, journal: Journal, output_path: str = None) -> int:
+    """把检查点中各行的最新结果一次性写入第J、K列并保存，返回写入的行数。
+    只写入与问题表当前内容一致的记录（见 Journal.matching），过期记录跳过"""
+    records = journal.matching(read_questions(excel_path))
+    from openpyxl import load_workbook
+    wb = load_workbook(excel_path)
+    ws = wb.active
+    for row_idx, record in records.items():
+        ws.cell(row=row_idx, column=SQL_COLUMN, value=record["sql"])
+        ws.cell(row=row_idx, column=ANSWER_COLUMN, value=record["answer"])
+    wb.save(output_path or excel_path)
+    return len(records)
+
+
+def prepare_batch(excel_path: str, journal_path: str = None, resume: bool = True):
+    """读取问题并对照检查点，返回 (检查点, 待处理的 [(行号, 问题), ...])"""
+    journal = Journal(journal_path or default_journal_path(excel_path))
+    questions = read_questions(excel_path)
+    tasks = journal.pending(questions, resume)
+    print(f"有效问题 {len(questions)} 个，待处理 {len(tasks)} 个（检查点：{journal.path}）")
+    return journal, tasks
+
+
+def finish_batch(excel_path: str, journal: Journal, output_path: str = None):
+    failed = sum(1 for record in journal.matching(read_questions(excel_path)).values() if record.get("error"))
+    written = export_excel(excel_path, journal, output_path)
+    print(f"\n已写入 {written} 行（其中失败 {failed} 行），文件已保存到: {output_path or excel_path}")
+    print_stage_summary()
+    if METRICS_PATH:
+        metrics.write(METRICS_PATH)
+        print(f"阶段指标已导出到: {METRICS_PATH}")
+
+
+def print_stage_summary():
+    """输出本进程内各阶段耗时的分位数（见 backend/components/tracing.py）"""
+    summary = metrics.stage_summary()
+    if not summary:
+        return
+    print(f"\n{'阶段':<24}{'次数':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'最大(ms)':>10}")
+    for stage, s in sorted(summary.items(), key=lambda item: -item[1]["sum"]):
+        print(f"{stage:<24}{s['count']:>8}{s['p50'] * 1000:>10.1f}{s['p95'] * 1000:>10.1f}"
+              f"{s['p99'] * 1000:>10.1f}{s['max'] * 1000:>10.1f}")
+
+
+def run_batch(excel_path: str = EXCEL_PATH, journal_path: str = None, mode: str = "thread",
+              workers: int = 8, retries: int = 2, backoff: float = 2.0, rpm: float = 0,
+              resume: bool = True, output_path: str = None):
+    """批量生成第E列问题的 SQL 与答案。
+
+    - 每完成一个问题向检查点追加一条记录，中断后重新运行会跳过已成功的行（resume=False 时全部重做）。
+    - mode="thread" 使用 workers 个线程；mode="async" 在单个事件循环中并发 workers 个问题（见 arun_batch）。
+    - 工作簿只在全部完成后导出一次，不再每行重写整个 xlsx。
+    """
+    if mode == "async":
+        asyncio.run(arun_batch(excel_path, journal_path, workers, retries, backoff, rpm, resume, output_path))
+        return
+
+    if rpm:
+        set_rate_limit(llm_provider(), rpm)
+    journal, tasks = prepare_batch(excel_path, journal_path, resume)
+    if tasks:
+        run_threaded(tasks, journal, workers, retries, backoff)
+    finish_batch(excel_path, journal, output_path)
+
+
+async def arun_batch(excel_path: str = EXCEL_PATH, journal_path: str = None, concurrency: int = 128,
+                     retries: int = 2, backoff: float = 2.0, rpm: float = 0,
+                     resume: bool = True, output_path: str = None):
+    """run_batch 的异步版本：最多 concurrency 个问题同时在途，LLM 调用按 rpm 限速"""
+    if rpm:
+        set_rate_limit(llm_provider(), rpm)
+
+    journal, tasks = prepare_batch(excel_path, journal_path, resume)
+    if tasks:
+        await run_async(tasks, journal, concurrency, retries, backoff)
+    # 保存会阻塞事件循环，只在全部完成后导出一次
+    finish_batch(excel_path, journal, output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="可续跑的批量问答：生成专利问题的 SQL 与答案并导出到 Excel")
+    parser.add_argument("--excel", default=EXCEL_PATH, help="问题表路径")
+    parser.add_argument("--journal", default=None, help="检查点路径，默认与问题表同名的 .journal.jsonl")
+    parser.add_argument("--output", default=None, help="导出路径，默认覆盖问题表")
+    parser.add_argument("--mode", choices=["thread", "async"], default="thread", help="并发模型")
+    parser.add_argument("--workers", type=int, default=8, help="线程数（thread）或同时在途的问题数（async）")
+    parser.add_argument("--retries", type=int, default=2, help="大模型阶段出错时的重试次数")
+    parser.add_argument("--backoff", type=float, default=2.0, help="首次重试前的基础等待秒数")
+    parser.add_argument("--rpm", type=float, default=0, help="每分钟 LLM 请求上限，0 表示不限速")
+    parser.add_argument("--no-resume", action="store_true", help="忽略检查点，全部重新生成")
+    parser.add_argument("--export-only", action="store_true", help="只把检查点导出到 Excel")
+    args = parser.parse_args()
+
+    if args.export_only:
+        journal = Journal(args.journal or default_journal_path(args.excel))
+        written = export_excel(args.excel, journal, args.output)
+        print(f"已写入 {written} 行，文件已保存到: {args.output or args.excel}")
+        return
+
+    run_batch(args.excel, args.journal, args.mode, args.workers, args.retries, args.backoff,
+              args.rpm, resume=not args.no_resume, output_path=args.output)
+
+
+if __name__ == "__main__":
+    main()
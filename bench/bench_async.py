@@ -0,0 +1,80 @@
+"""比较线程池同步流水线与 asyncio 异步流水线的吞吐（使用本地假 LLM）。
+
+用法：
+    python bench/bench_async.py [--db backend/sqlite/patents.db] [--questions 200]
+        [--latency 0.2] [--threads 16] [--concurrency 16 64 256]
+
+问题取自提示词示例（循环补足到 --questions 条）。问题 -> SQL 缓存与结果缓存均关闭，
+每个问题都会完整经过两次假 LLM 调用和一次 SQLite 查询。
+"""
+import os
+import time
+import asyncio
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+# 必须在导入流水线模块之前关闭缓存
+os.environ.setdefault("TEXT2SQL_CACHE", "0")
+os.environ.setdefault("RESULT_CACHE", "0")
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+from prompt_examples import load_prompt_examples
+from fake_llm import FakeLLM, install_fake_llm
+import backend.query as query
+
+
+def run_threaded(questions, threads):
+    from generate import run_pipeline
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(run_pipeline, questions))
+
+
+async def run_async(questions, concurrency):
+    from generate import arun_pipeline
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(question):
+        async with semaphore:
+            return await arun_pipeline(question)
+
+    return await asyncio.gather(*(one(q) for q in questions))
+
+
+def report(name, results, elapsed):
+    errors = sum(1 for r in results if r["error"])
+    print(f"{name:<24}{len(results) / elapsed:>10.1f} 问/秒{elapsed:>10.2f} s{errors:>6} 错误")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=query.DB_PATH, help="数据库路径")
+    parser.add_argument("--questions", type=int, default=200, help="问题总数")
+    parser.add_argument("--latency", type=float, default=0.2, help="假 LLM 每次调用的延迟（秒）")
+    parser.add_argument("--threads", type=int, default=16, help="线程池版本的线程数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64, 256], help="异步版本的并发上限")
+    args = parser.parse_args()
+
+    query.DB_PATH = args.db
+    install_fake_llm(FakeLLM(latency=args.latency))
+
+    examples = [q for q, _ in load_prompt_examples()]
+    questions = [examples[i % len(examples)] for i in range(args.questions)]
+
+    print(f"{'模式':<24}{'吞吐':>14}{'总耗时':>12}{'':>8}")
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        start = time.perf_counter()
+        results = run_threaded(questions, args.threads)
+        threaded = (results, time.perf_counter() - start)
+    report(f"线程池 x{args.threads}", *threaded)
+
+    for concurrency in args.concurrency:
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            start = time.perf_counter()
+            results = asyncio.run(run_async(questions, concurrency))
+            elapsed = time.perf_counter() - start
+        report(f"asyncio 并发 {concurrency}", results, elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""对比 “附带全部示例” 与 “按问题检索 top-k 示例” 的 text2sql 提示词规模，并可在问题表上评估 SQL 准确率。
+
+用法：
+    python bench/bench_examples.py [--excel backend/data/专利问题.xlsx] [-k 3 4 6]
+    python bench/bench_examples.py --llm --db backend/sqlite/patents.db --limit 50 [-k 4]
+
+默认只做离线统计：每种设置下提示词的平均 / P95 token 数（estimate_tokens）与示例检索耗时。
+加 --llm 时对问题表前 --limit 个问题实际调用大模型（关闭问题 -> SQL 缓存），把生成的 SQL 与
+第J列的参考 SQL 在数据库上执行，结果集一致记为正确，输出各设置的准确率与平均调用耗时。
+示例库包含由问题表扩充的示例时，与被评估问题相同的示例会被排除，避免答案泄漏。
+"""
+import os
+import time
+import argparse
+import contextlib
+import sqlite3
+import statistics
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ.setdefault("TEXT2SQL_CACHE", "0")
+
+from prompt_examples import ROOT
+from batch_runner import EXCEL_PATH, QUESTION_COLUMN, SQL_COLUMN
+from backend.query import DB_PATH
+from backend.components.context_budget import estimate_tokens
+from backend.components.text2sql_prompts import build_text2sql_messages
+from backend.text_to_sql import example_store
+from backend.text_to_sql.sql_cache import normalize_question
+
+
+def load_sheet(excel_path, limit):
+    """读取 [(问题, 参考SQL), ...]（第E列、第J列）"""
+    from openpyxl import load_workbook
+    wb = load_workbook(excel_path, read_only=True)
+    rows = []
+    for row in wb.active.iter_rows(min_row=2, values_only=True):
+        question, sql = row[QUESTION_COLUMN - 1], row[SQL_COLUMN - 1]
+        if question and str(question).strip():
+            rows.append((str(question).strip(), str(sql or "").strip()))
+    wb.close()
+    return rows[:limit] if limit else rows
+
+
+def examples_for(index, question, k):
+    """与 select_examples 相同，但排除与被评估问题相同的示例"""
+    key = normalize_question(question)
+    if k <= 0:
+        return [ex for ex in index.examples if ex.get("source") == "prompt"]
+    chosen = index.top_k(question, k + 1)
+    chosen = [ex for ex in chosen if normalize_question(ex["question"]) != key]
+    return chosen[-k:]
+
+
+def prompt_tokens(messages) -> int:
+    return sum(estimate_tokens(m.content) for m in messages)
+
+
+def result_set(conn, sql):
+    try:
+        return sorted(map(repr, conn.execute(sql).fetchall()))
+    except sqlite3.Error:
+        return None
+
+
+def label(k):
+    return "全部示例" if k <= 0 else f"top-{k}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--excel", default=os.path.join(ROOT, EXCEL_PATH), help="问题表路径")
+    parser.add_argument("-k", type=int, nargs="+", default=[3, 4, 6], help="要对比的 top-k（全部示例总会参与对比）")
+    parser.add_argument("--limit", type=int, default=0, help="最多评估的问题数，0 表示全部")
+    parser.add_argument("--llm", action="store_true", help="实际调用大模型并评估执行准确率")
+    parser.add_argument("--db", default=DB_PATH, help="--llm 时执行 SQL 的数据库")
+    args = parser.parse_args()
+
+    rows = load_sheet(args.excel, args.limit)
+    index = example_store.get_example_index()
+    settings = [0] + [k for k in args.k if k > 0]
+    print(f"问题 {len(rows)} 个，示例库 {len(index.examples)} 条\n")
+
+    print(f"{'设置':<10}{'平均tokens':>12}{'P95':>8}{'相对全部':>10}{'检索(ms)':>10}")
+    baseline = None
+    for k in settings:
+        tokens, elapsed = [], 0.0
+        for question, _ in rows:
+            start = time.perf_counter()
+            examples = examples_for(index, question, k)
+            elapsed += time.perf_counter() - start
+            tokens.append(prompt_tokens(build_text2sql_messages(question, examples)))
+        mean = statistics.mean(tokens)
+        baseline = baseline or mean
+        p95 = sorted(tokens)[int(0.95 * (len(tokens) - 1))]
+        print(f"{label(k):<10}{mean:>12.0f}{p95:>8}{mean / baseline:>10.1%}{elapsed / len(rows) * 1000:>10.3f}")
+
+    if not args.llm:
+        return
+
+    from backend.text_to_sql import text2sql_llm
+
+    conn = sqlite3.connect(args.db)
+    print(f"\n{'设置':<10}{'准确率':>10}{'可执行':>10}{'平均耗时(s)':>14}")
+    for k in settings:
+        correct = executable = 0
+        latencies = []
+        # text2sql 通过 select_examples 取示例，这里替换为排除自身的版本
+        original = text2sql_llm.select_examples
+        text2sql_llm.select_examples = lambda q, k=k: examples_for(index, q, k)
+        try:
+            for question, reference in rows:
+                start = time.perf_counter()
+                try:
+                    with contextlib.redirect_stdout(open(os.devnull, "w")):
+                        sql = text2sql_llm.text2sql(question, use_cache=False)
+                except Exception:
+                    sql = ""
+                latencies.append(time.perf_counter() - start)
+                got = result_set(conn, sql) if sql else None
+                if got is not None:
+                    executable += 1
+                    if reference and got == result_set(conn, reference):
+                        correct += 1
+        finally:
+            text2sql_llm.select_examples = original
+        n = len(rows)
+        print(f"{label(k):<10}{correct / n:>10.1%}{executable / n:>10.1%}{statistics.mean(latencies):>14.2f}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""对比 LIKE '%...%' 全表扫描与 FTS5(trigram) 改写后的查询延迟。
+
+用法（需先执行 python backend/sqlite/fts_index.py 建立索引）：
+    python bench/bench_fts.py [--db backend/sqlite/patents.db] [--repeat 3]
+
+对提示词中的 18 条示例 SQL，分别执行原 SQL 与改写后 SQL，校验结果行一致并输出耗时。
+"""
+import argparse
+import sqlite3
+import time
+from collections import Counter
+
+from prompt_examples import load_prompt_examples
+from backend.query import DB_PATH
+from backend.sqlite.fts_index import fts_columns, rewrite_like_to_fts
+
+
+def timed_fetch(conn, sql, repeat):
+    """重复执行 repeat 次，返回 (最短耗时毫秒, 结果行)"""
+    best = None
+    rows = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = conn.execute(sql).fetchall()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DB_PATH, help="数据库路径")
+    parser.add_argument("--repeat", type=int, default=3, help="每条 SQL 重复次数，取最短耗时")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    columns = fts_columns(conn)
+    if not columns:
+        raise SystemExit("未找到全文索引，请先执行 python backend/sqlite/fts_index.py")
+
+    total_like, total_fts = 0.0, 0.0
+    print(f"{'示例':<6}{'LIKE(ms)':>12}{'FTS(ms)':>12}{'加速比':>10}{'行数':>8}  结果一致")
+    for idx, (_, sql) in enumerate(load_prompt_examples(), start=1):
+        rewritten = rewrite_like_to_fts(sql, columns)
+        like_ms, like_rows = timed_fetch(conn, sql, args.repeat)
+        fts_ms, fts_rows = timed_fetch(conn, rewritten, args.repeat)
+        # 未指定 ORDER BY 时行序可能不同，按多重集合比较；带 LIMIT 的查询只能比较行数
+        if "LIMIT" in sql.upper() and "ORDER BY" not in sql.upper():
+            same = "是(行数)" if len(like_rows) == len(fts_rows) else "否"
+        else:
+            same = "是" if Counter(like_rows) == Counter(fts_rows) else "否"
+        total_like += like_ms
+        total_fts += fts_ms
+        speedup = like_ms / fts_ms if fts_ms > 0 else float("inf")
+        print(f"{idx:<6}{like_ms:>12.2f}{fts_ms:>12.2f}{speedup:>10.1f}{len(like_rows):>8}  {same}")
+
+    print(f"\n合计: LIKE {total_like:.2f} ms, FTS {total_fts:.2f} ms")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
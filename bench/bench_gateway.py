@@ -0,0 +1,77 @@
+"""对比直接调用 ChatOpenAI 与经过 llm 网关调用，在提供方限流下的表现（使用本地假 OpenAI 服务）。
+
+用法：
+    python bench/bench_gateway.py [--requests 200] [--distinct 8] [--threads 16] [--latency 0.05] [--server-rpm 120]
+
+负载为 text2sql 提示词：从 --distinct 个提示词示例问题中随机抽取（固定种子），故存在重复请求，
+由多个线程并发发出。
+- 直连：ChatOpenAI(max_retries=2)，与改造前的 llm 一致，遇到 429 由客户端自行重试。
+- 网关：LLMGateway 按 --server-rpm 限速、合并重复请求、抖动退避重试。
+输出每种方式的总耗时、失败数、服务端收到的请求数与 429 次数，以及网关统计。
+"""
+import os
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+from langchain_openai import ChatOpenAI
+
+from prompt_examples import load_prompt_examples
+from fake_openai_server import start_fake_server
+from backend.components.llm_gateway import LLMGateway
+from backend.components.rate_limit import set_rate_limit
+from backend.components.text2sql_prompts import build_text2sql_messages
+from backend.text_to_sql.example_store import select_examples
+
+
+def run_workload(client, prompts, threads):
+    def one(prompt):
+        try:
+            client.invoke(prompt)
+            return None
+        except Exception as e:
+            return type(e).__name__
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        errors = [e for e in executor.map(one, prompts) if e]
+    return time.perf_counter() - start, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="请求总数")
+    parser.add_argument("--distinct", type=int, default=8, help="不同问题的个数")
+    parser.add_argument("--threads", type=int, default=16, help="并发线程数")
+    parser.add_argument("--latency", type=float, default=0.05, help="假服务每次请求的延迟（秒）")
+    parser.add_argument("--server-rpm", type=float, default=120, help="假服务的每分钟请求上限（网关按此限速）")
+    args = parser.parse_args()
+
+    questions = [q for q, _ in load_prompt_examples()][:args.distinct]
+    rng = random.Random(0)
+    picks = [rng.choice(questions) for _ in range(args.requests)]
+    prompts = [build_text2sql_messages(q, select_examples(q)) for q in picks]
+
+    print(f"{'方式':<8}{'耗时(s)':>10}{'失败':>6}{'服务端请求':>12}{'429':>6}")
+    for name in ["直连", "网关"]:
+        # 每种方式使用独立的服务实例，限流窗口互不影响
+        server, state, base_url = start_fake_server(latency=args.latency, rpm=args.server_rpm)
+        if name == "直连":
+            client = ChatOpenAI(model="fake", temperature=0, max_retries=2, api_key="fake", base_url=base_url)
+        else:
+            provider = f"bench-{base_url}"
+            set_rate_limit(provider, args.server_rpm)
+            client = LLMGateway(ChatOpenAI(model="fake", temperature=0, max_retries=0, api_key="fake",
+                                           base_url=base_url), provider=provider)
+        elapsed, errors = run_workload(client, prompts, args.threads)
+        server.shutdown()
+        print(f"{name:<8}{elapsed:>10.2f}{len(errors):>6}{state.counts['requests']:>12}{state.counts['rate_limited']:>6}")
+        if isinstance(client, LLMGateway):
+            print(f"\n网关统计: {client.metrics.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""评估规则解析快速路径（intent_parser）在问题表上的命中率、准确率与可节省的大模型耗时。
+
+用法：
+    python bench/bench_intent.py [--excel backend/data/专利问题.xlsx] [--db backend/sqlite/patents.db]
+    python bench/bench_intent.py --misses 20      # 另外打印部分未命中的问题
+
+- 命中率：parse_question 返回结果的问题占比，按意图（count / list）分别统计，并给出单次解析耗时。
+- 一致率：数据库存在时，把命中问题的规则 SQL 与第J列参考 SQL 分别执行，结果集一致记为一致；
+  不一致的问题逐条打印，便于调整规则。
+- 回归：REJECT_CASES 中含否定、排除、比较语义的问题必须不被规则解析（交给大模型），
+  任一被解析时打印规则 SQL 并以状态 1 退出。
+- 节省耗时：命中数 × 单次大模型生成 SQL 的平均耗时。平均耗时优先取批处理断点日志
+  （<问题表>.journal.jsonl）中各问题 timings["sql"] 的均值，没有日志时使用 --llm-latency。
+"""
+import os
+import json
+import time
+import sys
+import argparse
+import sqlite3
+import statistics
+from collections import Counter
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+from prompt_examples import ROOT
+from batch_runner import EXCEL_PATH, default_journal_path
+from bench_examples import load_sheet, result_set
+from backend.query import DB_PATH
+from backend.text_to_sql.intent_parser import parse_question
+
+
+# 规则无法表达的语义：解析结果会与问题意思相反，必须交给大模型
+REJECT_CASES = [
+    "台湾积体电路制造股份有限公司2024年不是本国公开的专利有多少篇",
+    "台湾积体电路制造股份有限公司2024年非本国公开的专利有多少篇",
+    "台湾积体电路制造股份有限公司2024年后公开的专利有多少篇",
+    "台湾积体电路制造股份有限公司2024年前公开的专利有多少篇",
+    "台湾积体电路制造股份有限公司2020年以后公开的专利有多少篇",
+    "台湾积体电路制造股份有限公司2020年之前公开的专利有多少篇",
+    "除台湾积体电路制造股份有限公司外，2024年公开的专利有多少篇",
+    "2024年公开的专利中，申请人不是联发科技股份有限公司的有多少篇",
+    "联发科技股份有限公司发明人超过三人的专利有哪些",
+    "联发科技股份有限公司2022年以上的专利数量",
+]
+
+
+def check_rejects():
+    """返回被规则错误解析的 [(问题, SQL), ...]"""
+    failures = []
+    for question in REJECT_CASES:
+        parsed = parse_question(question)
+        if parsed is not None:
+            failures.append((question, parsed.render()))
+    return failures
+
+
+def journal_sql_latency(journal_path):
+    """批处理日志中 SQL 生成阶段的平均耗时（秒），日志不存在或没有记录时返回 None"""
+    if not os.path.exists(journal_path):
+        return None
+    latencies = []
+    with open(journal_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            latency = (record.get("timings") or {}).get("sql")
+            if latency:
+                latencies.append(latency)
+    return statistics.mean(latencies) if latencies else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--excel", default=os.path.join(ROOT, EXCEL_PATH), help="问题表路径")
+    parser.add_argument("--db", default=DB_PATH, help="执行 SQL 的数据库")
+    parser.add_argument("--llm-latency", type=float, default=3.0, help="没有批处理日志时假定的大模型生成 SQL 耗时（秒）")
+    parser.add_argument("--misses", type=int, default=0, help="打印的未命中问题数")
+    args = parser.parse_args()
+
+    rejected = check_rejects()
+    for question, sql in rejected:
+        print(f"应交给大模型但被规则解析: {question}\n  规则: {sql}")
+    print(f"否定 / 排除 / 比较回归用例 {len(REJECT_CASES)} 个，失败 {len(rejected)} 个\n")
+
+    rows = load_sheet(args.excel, 0)
+    hits, misses = [], []
+    elapsed = 0.0
+    for question, reference in rows:
+        start = time.perf_counter()
+        parsed = parse_question(question)
+        elapsed += time.perf_counter() - start
+        (hits if parsed is not None else misses).append((question, reference, parsed))
+
+    intents = Counter(parsed.intent for _, _, parsed in hits)
+    print(f"问题 {len(rows)} 个，规则命中 {len(hits)} 个（{len(hits) / len(rows):.1%}），"
+          f"单次解析 {elapsed / len(rows) * 1000:.3f} ms")
+    for intent, n in sorted(intents.items()):
+        print(f"  {intent:<6}{n:>5}")
+
+    if os.path.exists(args.db):
+        conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+        agree = Counter()
+        compared = 0
+        for question, reference, parsed in hits:
+            if not reference:
+                continue
+            compared += 1
+            sql = parsed.render()
+            if result_set(conn, sql) == result_set(conn, reference):
+                agree[parsed.intent] += 1
+            else:
+                print(f"\n不一致: {question}\n  规则: {sql}\n  参考: {reference}")
+        conn.close()
+        total = sum(agree.values())
+        print(f"\n有参考 SQL 的命中问题 {compared} 个，结果集一致 {total} 个"
+              f"（{total / compared:.1%}）" if compared else "\n命中问题均无参考 SQL")
+        for intent, n in sorted(agree.items()):
+            print(f"  {intent:<6}{n:>5} / {intents[intent]}")
+    else:
+        print(f"\n数据库 {args.db} 不存在，跳过一致性检查")
+
+    journal_latency = journal_sql_latency(default_journal_path(args.excel))
+    latency = journal_latency or args.llm_latency
+    source = "批处理日志" if journal_latency else "--llm-latency"
+    print(f"\n大模型生成 SQL 平均 {latency:.2f} s（{source}），命中问题共可节省约 {len(hits) * latency:.1f} s")
+
+    for question, _, _ in misses[:args.misses]:
+        print(f"未命中: {question}")
+    if rejected:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""对比 IPC 字段 LIKE 扫描与 patent_ipc 附表前缀区间查找的查询延迟。
+
+用法（需先执行 python backend/sqlite/clean_ipc.py 生成附表）：
+    python bench/bench_ipc.py [--db backend/sqlite/patents.db] [--repeat 3]
+
+选取提示词示例中含 IPC 条件的 SQL（示例9/11/18），另附若干常见 IPC 前缀查询，
+分别执行原 SQL 与改写后 SQL，输出耗时及结果行数是否一致。
+"""
+import argparse
+import sqlite3
+from collections import Counter
+
+from prompt_examples import load_prompt_examples
+from bench_fts import timed_fetch
+from backend.query import DB_PATH, ipc_table_exists, rewrite_ipc_like
+
+EXTRA_QUERIES = [
+    """SELECT COUNT(*) FROM patent WHERE "ipc" LIKE 'H01L%'""",
+    """SELECT COUNT(*) FROM patent WHERE "ipc" LIKE '%H01L21%'""",
+    """SELECT COUNT(*) FROM patent WHERE "gazette_ipc" LIKE '%C09G%'""",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DB_PATH, help="数据库路径")
+    parser.add_argument("--repeat", type=int, default=3, help="每条 SQL 重复次数，取最短耗时")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    if not ipc_table_exists(conn):
+        raise SystemExit("未找到 patent_ipc 附表，请先执行 python backend/sqlite/clean_ipc.py")
+
+    queries = [sql for _, sql in load_prompt_examples() if '"ipc"' in sql] + EXTRA_QUERIES
+    print(f"{'LIKE(ms)':>10}{'附表(ms)':>12}{'加速比':>10}  结果一致  SQL")
+    for sql in queries:
+        rewritten = rewrite_ipc_like(sql)
+        like_ms, like_rows = timed_fetch(conn, sql, args.repeat)
+        ipc_ms, ipc_rows = timed_fetch(conn, rewritten, args.repeat)
+        if "LIMIT" in sql.upper() and "ORDER BY" not in sql.upper():
+            same = "是(行数)" if len(like_rows) == len(ipc_rows) else "否"
+        else:
+            same = "是" if Counter(like_rows) == Counter(ipc_rows) else "否"
+        speedup = like_ms / ipc_ms if ipc_ms > 0 else float("inf")
+        print(f"{like_ms:>10.2f}{ipc_ms:>12.2f}{speedup:>10.1f}  {same:<8}  {sql[:80]}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""评估把 SQL 字面量提取为绑定参数（bind_literals）对语句编译开销的影响。
+
+用法：
+    python bench/bench_params.py [--db backend/sqlite/patents.db] [--excel backend/data/专利问题.xlsx] [--repeat 5]
+
+负载为问题表第J列的 SQL，先经 rewrite_query 改写（与 run_query 一致），再按表中顺序各执行一遍：
+- 字面量：原样执行，每条字面量不同的 SQL 都要重新编译；
+- 参数化：执行 parameterize 后的 SQL 并绑定参数，同一形态的 SQL 复用连接上已编译的语句。
+每种方式每轮使用新连接（语句缓存为空），取 --repeat 轮中的最小值。
+
+输出：SQL 条数、不同文本数与不同形态数；只编译（外层 LIMIT 0）与完整执行的总耗时；
+以及参数化前后查询计划（EXPLAIN QUERY PLAN）或结果集不一致的条数。
+"""
+import os
+import time
+import argparse
+import sqlite3
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+from prompt_examples import ROOT
+from batch_runner import EXCEL_PATH
+from bench_examples import load_sheet
+from backend import query
+from backend.components.db_pool import ConnectionPool
+from backend.components.sql_params import parameterize
+
+
+def workload(db_path, excel_path):
+    """问题表第J列中可执行的 SQL，改写后返回 [(字面量 SQL, 参数化 SQL, 参数), ...]"""
+    pool = ConnectionPool(db_path)
+    conn = pool.connection()
+    items = []
+    for _, sql in load_sheet(excel_path, 0):
+        sql = sql.strip().rstrip(";；").strip()
+        if not sql.upper().startswith("SELECT"):
+            continue
+        try:
+            rewritten = query.rewrite_query(sql, conn, pool.metadata())
+            conn.execute(f"SELECT * FROM ({rewritten}) LIMIT 0").fetchall()
+        except sqlite3.Error:
+            continue
+        shape, params = parameterize(rewritten)
+        items.append((rewritten, shape, params))
+    pool.close_all()
+    return items
+
+
+def replay(db_path, statements, prepare_only, repeat):
+    """以新连接按顺序执行全部语句，返回 repeat 轮中最短的总耗时（秒）"""
+    best = None
+    for _ in range(repeat):
+        conn = ConnectionPool(db_path).connection()
+        start = time.perf_counter()
+        for sql, params in statements:
+            if prepare_only:
+                sql = f"SELECT * FROM ({sql}) LIMIT 0"
+            conn.execute(sql, params).fetchall()
+        elapsed = time.perf_counter() - start
+        conn.close()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def plan(conn, sql, params):
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=query.DB_PATH, help="数据库路径")
+    parser.add_argument("--excel", default=os.path.join(ROOT, EXCEL_PATH), help="问题表路径")
+    parser.add_argument("--repeat", type=int, default=5, help="每种方式重复的轮数")
+    args = parser.parse_args()
+
+    items = workload(args.db, args.excel)
+    literal = [(sql, ()) for sql, _, _ in items]
+    bound = [(shape, params) for _, shape, params in items]
+    print(f"SQL {len(items)} 条：不同文本 {len({sql for sql, _ in literal})} 种，"
+          f"参数化后不同形态 {len({shape for shape, _ in bound})} 种\n")
+
+    print(f"{'阶段':<10}{'字面量(ms)':>12}{'参数化(ms)':>12}{'单条节省(us)':>14}")
+    for name, prepare_only in (("只编译", True), ("完整执行", False)):
+        before = replay(args.db, literal, prepare_only, args.repeat)
+        after = replay(args.db, bound, prepare_only, args.repeat)
+        print(f"{name:<10}{before * 1000:>12.1f}{after * 1000:>12.1f}{(before - after) / len(items) * 1e6:>14.1f}")
+
+    conn = ConnectionPool(args.db).connection()
+    plan_diff = result_diff = 0
+    for sql, shape, params in items:
+        if plan(conn, sql, ()) != plan(conn, shape, params):
+            plan_diff += 1
+        if sorted(map(repr, conn.execute(sql))) != sorted(map(repr, conn.execute(shape, params))):
+            result_diff += 1
+    conn.close()
+    print(f"\n查询计划不一致 {plan_diff} 条，结果集不一致 {result_diff} 条")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""离线回放问题表，测量各流水线的分阶段延迟分位数与吞吐（假 LLM + 合成数据库）。
+
+用法：
+    python bench/synth_db.py --out /tmp/synth.db --rows 100000 --indexes fts ipc rollup entity
+    python bench/bench_pipeline.py --db /tmp/synth.db [--limit 200] [--latency 0.2 --jitter 0.3]
+        [--modes sequential threaded async stream] [--threads 16] [--concurrency 64] [--metrics-dir /tmp/m]
+
+- 问题取自问题表第E列；假 LLM 对问题返回第J列的参考 SQL（没有参考 SQL 的问题按提示词示例轮选），
+  回答为固定长度文本，延迟由 --latency / --jitter 控制（见 bench/fake_llm.py）。
+- 流水线：
+  sequential  逐个调用 run_pipeline；
+  threaded    --threads 个线程并发调用 run_pipeline（与 batch_runner 的线程模式相同）；
+  async       单个事件循环中最多 --concurrency 个 arun_pipeline 同时在途；
+  stream      --threads 个线程并发，上下文阶段后由 stream_answer_with_context 流式生成回答
+              （此时 pipeline 阶段不含回答，回答耗时见 llm_answer 与 llm_answer_first_chunk）。
+- 每种流水线运行前清空阶段指标，结束后输出吞吐与各阶段（见 backend/components/tracing.py）的
+  p50/p95/p99；指定 --metrics-dir 时另外导出 <流水线>.prom。
+- 问题 -> SQL 缓存与结果缓存默认关闭，每个问题都完整经过各阶段；可用环境变量 TEXT2SQL_CACHE=1、
+  RESULT_CACHE=1 打开。规则解析快速路径保持开启，可用 TEXT2SQL_FAST_PATH=0 关闭。
+"""
+import os
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# 必须在导入流水线模块之前设置
+os.environ.setdefault("TEXT2SQL_CACHE", "0")
+os.environ.setdefault("RESULT_CACHE", "0")
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+from prompt_examples import ROOT
+from fake_llm import FakeLLM, install_fake_llm
+from bench_examples import load_sheet
+from batch_runner import EXCEL_PATH, print_stage_summary
+from backend.components.tracing import metrics
+import backend.query as query
+
+MODES = ("sequential", "threaded", "async", "stream")
+
+
+def run_sequential(questions, args):
+    from generate import run_pipeline
+    return [run_pipeline(q) for q in questions]
+
+
+def run_threaded(questions, args):
+    from generate import run_pipeline
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        return list(executor.map(run_pipeline, questions))
+
+
+def run_async(questions, args):
+    from generate import arun_pipeline
+
+    async def main():
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one(question):
+            async with semaphore:
+                return await arun_pipeline(question)
+
+        return await asyncio.gather(*(one(q) for q in questions))
+
+    return asyncio.run(main())
+
+
+def run_stream(questions, args):
+    from generate import run_pipeline, stream_answer_with_context
+
+    def one(question):
+        result = run_pipeline(question, answer=False)
+        if result["sql"] and not result["error"]:
+            result["answer"] = "".join(stream_answer_with_context(question, result["sql"], result["context"]))
+        return result
+
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        return list(executor.map(one, questions))
+
+
+RUNNERS = {"sequential": run_sequential, "threaded": run_threaded, "async": run_async, "stream": run_stream}
+
+
+def workbook_sql(rows):
+    """第J列中可用作假 LLM 输出的参考 SQL：{问题: SQL}"""
+    return {q: sql for q, sql in rows if sql.lstrip().upper().startswith("SELECT")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="数据库路径（可由 bench/synth_db.py 生成）")
+    parser.add_argument("--excel", default=os.path.join(ROOT, EXCEL_PATH), help="回放的问题表")
+    parser.add_argument("--limit", type=int, default=0, help="只回放前 N 个问题（0 表示全部）")
+    parser.add_argument("--latency", type=float, default=0.2, help="假 LLM 每次调用的平均延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.3, help="假 LLM 延迟的相对浮动范围")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES, help="要测量的流水线")
+    parser.add_argument("--threads", type=int, default=16, help="threaded / stream 的线程数")
+    parser.add_argument("--concurrency", type=int, default=64, help="async 的并发上限")
+    parser.add_argument("--metrics-dir", default="", help="导出各流水线 Prometheus 指标的目录")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"数据库不存在：{args.db}（可先运行 bench/synth_db.py 生成）")
+    query.DB_PATH = args.db
+    rows = load_sheet(args.excel, args.limit)
+    questions = [q for q, _ in rows]
+    fake = FakeLLM(latency=args.latency, sql_by_question=workbook_sql(rows), jitter=args.jitter)
+    install_fake_llm(fake)
+    if args.metrics_dir:
+        os.makedirs(args.metrics_dir, exist_ok=True)
+
+    print(f"问题 {len(questions)} 个，数据库 {args.db}，假 LLM 延迟 {args.latency}s ±{args.jitter:.0%}")
+    summary = []
+    for mode in args.modes:
+        metrics.reset()
+        calls = fake.calls
+        start = time.perf_counter()
+        results = RUNNERS[mode](questions, args)
+        elapsed = time.perf_counter() - start
+        errors = sum(1 for r in results if r["error"])
+        pipeline = metrics.stage_summary().get("pipeline", {})
+        summary.append((mode, len(results) / elapsed, elapsed, errors, fake.calls - calls, pipeline))
+
+        print(f"\n== {mode}：{len(results) / elapsed:.1f} 问/秒，{elapsed:.2f} s，{errors} 错误")
+        print_stage_summary()
+        if args.metrics_dir:
+            metrics.write(os.path.join(args.metrics_dir, f"{mode}.prom"))
+
+    print(f"\n{'流水线':<14}{'问/秒':>8}{'耗时(s)':>10}{'错误':>6}{'LLM调用':>9}"
+          f"{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for mode, throughput, elapsed, errors, calls, pipeline in summary:
+        print(f"{mode:<14}{throughput:>8.1f}{elapsed:>10.2f}{errors:>6}{calls:>9}"
+              f"{pipeline.get('p50', 0) * 1000:>10.1f}{pipeline.get('p95', 0) * 1000:>10.1f}"
+              f"{pipeline.get('p99', 0) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
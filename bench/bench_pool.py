@@ -0,0 +1,69 @@
+"""比较 “每次查询新建连接” 与 “线程复用只读连接池” 的吞吐（QPS）。
+
+用法：
+    python bench/bench_pool.py [--db backend/sqlite/patents.db] [--queries 2000] [--threads 1 8 32]
+
+默认负载为按主键点查的轻量语句，以突出连接建立与 schema 解析本身的开销；
+加 --examples 则轮询执行提示词中的 18 条示例 SQL。
+"""
+import argparse
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from prompt_examples import load_prompt_examples
+from backend.components.db_pool import ConnectionPool
+from backend.query import DB_PATH
+
+
+def point_queries(conn, limit=200):
+    """从库中取若干 id，构造按主键点查的 SQL"""
+    ids = [r[0] for r in conn.execute('SELECT "id" FROM patent LIMIT ?', (limit,))]
+    return [f'SELECT "patent_title", "id", "url" FROM patent WHERE "id" = {i}' for i in ids]
+
+
+def run_fresh(db_path, sql):
+    """基线：与改造前的 run_query 一致，每次新建连接、执行后关闭"""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def run_pooled(pool, sql):
+    return pool.connection().execute(sql).fetchall()
+
+
+def measure(fn, workload, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(fn, workload))
+    elapsed = time.perf_counter() - start
+    return len(workload) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DB_PATH, help="数据库路径")
+    parser.add_argument("--queries", type=int, default=2000, help="每轮执行的查询总数")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32], help="线程数列表")
+    parser.add_argument("--examples", action="store_true", help="使用 18 条示例 SQL 作为负载")
+    args = parser.parse_args()
+
+    probe = sqlite3.connect(args.db)
+    statements = [sql for _, sql in load_prompt_examples()] if args.examples else point_queries(probe)
+    probe.close()
+    workload = [statements[i % len(statements)] for i in range(args.queries)]
+
+    pool = ConnectionPool(args.db)
+    print(f"{'线程数':<8}{'新建连接 QPS':>16}{'连接池 QPS':>16}{'提升':>8}")
+    for threads in args.threads:
+        fresh_qps = measure(lambda sql: run_fresh(args.db, sql), workload, threads)
+        pooled_qps = measure(lambda sql: run_pooled(pool, sql), workload, threads)
+        print(f"{threads:<8}{fresh_qps:>16.1f}{pooled_qps:>16.1f}{pooled_qps / fresh_qps:>8.2f}x")
+    pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
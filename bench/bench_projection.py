@@ -0,0 +1,84 @@
+"""对比投影裁剪前后每个问题从 SQLite 读入 Python 的字节数与耗时。
+
+用法：
+    python bench/bench_projection.py [--db backend/sqlite/patents.db] [--repeat 3]
+
+工作负载为提示词中的示例 SQL（经 ensure_select_id_url 补齐 id/url/patent_title），
+以及将每条非聚合示例的投影替换为 patent.* 的星号变体。
+- 裁剪前：run_query(prune=False)，大文本列随所有结果行一并取回。
+- 裁剪后：run_query(prune=True) 首轮只取短字段，再由 load_deferred_columns
+  为写入上下文的行按 id 补取所需的大文本列。
+字节数按结果中各取值的 UTF-8 长度累计。
+"""
+import argparse
+import contextlib
+import io
+import os
+import time
+
+# 只用到 SQL 后处理函数，不调用大模型
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+from prompt_examples import load_prompt_examples
+from backend import query
+from backend.text_to_sql.text2sql_llm import ensure_select_id_url
+
+
+def value_bytes(rows) -> int:
+    return sum(len(str(v).encode("utf-8")) for row in rows for v in row if v is not None)
+
+
+def star_variant(sql: str):
+    """把投影替换为 patent.*；聚合查询返回 None"""
+    if query.aggregate_pattern.search(sql):
+        return None
+    return "SELECT patent.*" + sql[sql.upper().index(" FROM "):]
+
+
+def timed(func, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=query.DB_PATH, help="数据库路径")
+    parser.add_argument("--repeat", type=int, default=3, help="每条 SQL 重复次数，取最短耗时")
+    args = parser.parse_args()
+    query.DB_PATH = args.db
+
+    workload = []
+    for idx, (question, sql) in enumerate(load_prompt_examples(), start=1):
+        workload.append((f"{idx}", question, ensure_select_id_url(sql)))
+        star = star_variant(sql)
+        if star:
+            workload.append((f"{idx}*", question, star))
+
+    total_before, total_after = 0, 0
+    print(f"{'示例':<6}{'裁剪前(KB)':>12}{'裁剪后(KB)':>12}{'裁剪前(ms)':>12}{'裁剪后(ms)':>12}{'行数':>6}  推迟列")
+    for label, question, sql in workload:
+        before_ms, before_rows = timed(lambda: query.run_query(sql, prune=False), args.repeat)
+        after_ms, after_rows = timed(
+            lambda: query.load_deferred_columns(query.run_query(sql), question), args.repeat
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            deferred = query.run_query(sql).deferred
+        before_kb = value_bytes(before_rows) / 1024
+        after_kb = value_bytes(after_rows) / 1024
+        total_before += before_kb
+        total_after += after_kb
+        print(f"{label:<6}{before_kb:>12.1f}{after_kb:>12.1f}{before_ms:>12.2f}{after_ms:>12.2f}"
+              f"{len(before_rows):>6}  {','.join(deferred) or '-'}")
+
+    ratio = total_before / total_after if total_after else float("inf")
+    print(f"\n合计: 裁剪前 {total_before:.1f} KB, 裁剪后 {total_after:.1f} KB（减少为 1/{ratio:.1f}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""统计 text2sql 提示词每个问题的 token 构成，并验证静态前缀能命中提供方的前缀缓存。
+
+用法：
+    python bench/bench_prompt_tokens.py [--excel backend/data/专利问题.xlsx] [--limit 20]
+
+1. 逐个问题构建 build_text2sql_messages（含检索出的示例），检查所有请求的序列化消息共享同一
+   静态前缀（系统消息，逐字节一致）。
+2. 输出每个问题的静态前缀 / 示例 / 问题部分 / 合计 token 数（可离线加载 tiktoken cl100k_base 时用它计数，
+   否则用 estimate_tokens 估算）。
+3. 经 llm 网关把这些请求依次发给本地假 OpenAI 服务（模拟前缀缓存），输出每次响应 usage 中的
+   cached_tokens 与整体命中率。
+"""
+import os
+import json
+import argparse
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+from langchain_openai import ChatOpenAI
+
+from prompt_examples import load_prompt_examples
+from fake_openai_server import start_fake_server
+from backend.components.context_budget import estimate_tokens
+from backend.components.llm_gateway import LLMGateway
+from backend.components.text2sql_prompts import (
+    TEXT2SQL_SYSTEM_MESSAGE, TEXT2SQL_INSTRUCTION, QUESTION_MARKER, build_text2sql_messages, render_examples,
+)
+from backend.text_to_sql.example_store import select_examples
+
+
+def token_counter():
+    """返回 (计数函数, 名称)；tiktoken 编码文件不可用（如离线）时退回 estimate_tokens"""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return (lambda text: len(encoding.encode(text))), "tiktoken cl100k_base"
+    except Exception:
+        return estimate_tokens, "estimate_tokens"
+
+
+def load_questions(excel_path, limit):
+    if excel_path:
+        from batch_runner import read_questions
+        questions = [q for _, q in read_questions(excel_path)]
+    else:
+        questions = [q for q, _ in load_prompt_examples()]
+    return questions[:limit] if limit else questions
+
+
+def serialized(messages) -> str:
+    """与发送给 OpenAI 兼容接口的 messages 字段一致的序列化形式"""
+    return json.dumps([{"role": m.type, "content": m.content} for m in messages], ensure_ascii=False)
+
+
+def common_prefix_len(texts) -> int:
+    first, last = min(texts), max(texts)
+    n = 0
+    while n < min(len(first), len(last)) and first[n] == last[n]:
+        n += 1
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--excel", default=None, help="问题表路径（第E列）；默认使用提示词示例问题")
+    parser.add_argument("--limit", type=int, default=0, help="最多统计的问题数，0 表示全部")
+    args = parser.parse_args()
+
+    count, counter_name = token_counter()
+    questions = load_questions(args.excel, args.limit)
+    static_tokens = count(TEXT2SQL_SYSTEM_MESSAGE.content)
+    requests = [(q, select_examples(q)) for q in questions]
+
+    payloads = [serialized(build_text2sql_messages(q, examples)) for q, examples in requests]
+    shared = common_prefix_len(payloads)
+    # 系统消息之后紧接着可变的用户消息
+    static_payload = len(serialized([TEXT2SQL_SYSTEM_MESSAGE])) - 1
+    print(f"计数方式: {counter_name}；问题数: {len(questions)}")
+    print(f"静态前缀: {static_tokens} tokens；序列化请求共享前缀 {shared} 字符"
+          f"（静态部分 {static_payload} 字符，{'逐字节一致' if shared >= static_payload else '不一致'}）\n")
+
+    server, state, base_url = start_fake_server(latency=0)
+    gateway = LLMGateway(ChatOpenAI(model="fake", temperature=0, max_retries=0, api_key="fake", base_url=base_url),
+                         provider=f"bench-{base_url}", dedupe=False)
+
+    print(f"{'#':>4}{'静态':>8}{'示例':>8}{'问题':>8}{'合计':>8}{'静态占比':>10}{'cached':>10}  问题")
+    for i, (question, examples) in enumerate(requests, start=1):
+        example_tokens = count(render_examples(examples) + TEXT2SQL_INSTRUCTION + QUESTION_MARKER)
+        question_tokens = count(question)
+        total = static_tokens + example_tokens + question_tokens
+        usage = gateway.invoke(build_text2sql_messages(question, examples)).usage_metadata or {}
+        cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+        print(f"{i:>4}{static_tokens:>8}{example_tokens:>8}{question_tokens:>8}{total:>8}"
+              f"{static_tokens / total:>10.1%}{cached:>10}  {question[:30]}")
+
+    stats = gateway.metrics.snapshot()
+    server.shutdown()
+    print(f"\n提示词 {stats['prompt_tokens']} tokens，其中命中前缀缓存 {stats['cached_tokens']} tokens"
+          f"（命中率 {stats['prefix_cache_hit_rate']:.1%}，首个请求为冷启动）")
+
+
+if __name__ == "__main__":
+    main()
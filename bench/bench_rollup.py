@@ -0,0 +1,64 @@
+"""对比计数 / 趋势查询在原表与汇总表 patent_rollup 上的延迟。
+
+用法（需先执行 python backend/sqlite/rollup.py 生成汇总表）：
+    python bench/bench_rollup.py [--db backend/sqlite/patents.db] [--repeat 3]
+
+工作负载为提示词中的全部示例 SQL 及若干计数 / 分组变体；能被 route_to_rollup 路由的
+SQL 分别在原表与汇总表上执行，校验结果一致并输出耗时，其余标记为 “未路由”。
+"""
+import argparse
+import sqlite3
+
+from prompt_examples import load_prompt_examples
+from bench_fts import timed_fetch
+from backend.query import DB_PATH, route_to_rollup
+from backend.sqlite.rollup import ROLLUP_TABLE, rollup_ready
+
+EXTRA_QUERIES = [
+    "SELECT COUNT(*) FROM patent WHERE \"applicant\" LIKE '%联发科技%' AND \"publication_date\" LIKE '2019%'",
+    "SELECT strftime('%Y', \"publication_date\") AS year, COUNT(*) FROM patent "
+    "WHERE \"ipc\" LIKE 'G06F%' GROUP BY year ORDER BY year",
+    "SELECT \"applicant\", COUNT(*) AS n FROM patent WHERE \"keywords\" LIKE '%本国公开%' "
+    "GROUP BY \"applicant\" ORDER BY n DESC LIMIT 5",
+    "SELECT COUNT(*) FROM patent WHERE \"applicant\" LIKE '%不存在的公司%'",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DB_PATH, help="数据库路径")
+    parser.add_argument("--repeat", type=int, default=3, help="每条 SQL 重复次数，取最短耗时")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    if not rollup_ready(conn):
+        raise SystemExit("汇总表不存在或已过期，请先执行 python backend/sqlite/rollup.py")
+    rollup_rows = conn.execute(f"SELECT COUNT(*) FROM {ROLLUP_TABLE}").fetchone()[0]
+    patent_rows = conn.execute("SELECT COUNT(*) FROM patent").fetchone()[0]
+    print(f"patent {patent_rows} 行，{ROLLUP_TABLE} {rollup_rows} 行\n")
+
+    workload = [(f"示例{i}", sql) for i, (_, sql) in enumerate(load_prompt_examples(), start=1)]
+    workload += [(f"变体{i}", sql) for i, sql in enumerate(EXTRA_QUERIES, start=1)]
+
+    total_base, total_rollup, routed_count = 0.0, 0.0, 0
+    print(f"{'查询':<8}{'原表(ms)':>12}{'汇总表(ms)':>12}{'加速比':>10}  结果一致")
+    for label, sql in workload:
+        routed = route_to_rollup(sql, conn)
+        if routed is None:
+            print(f"{label:<8}{'':>12}{'':>12}{'':>10}  未路由")
+            continue
+        base_ms, base_rows = timed_fetch(conn, sql, args.repeat)
+        rollup_ms, rollup_rows = timed_fetch(conn, routed, args.repeat)
+        routed_count += 1
+        total_base += base_ms
+        total_rollup += rollup_ms
+        same = "是" if sorted(base_rows) == sorted(rollup_rows) else "否"
+        speedup = base_ms / rollup_ms if rollup_ms > 0 else float("inf")
+        print(f"{label:<8}{base_ms:>12.2f}{rollup_ms:>12.2f}{speedup:>10.1f}  {same}")
+
+    print(f"\n路由 {routed_count}/{len(workload)} 条；合计: 原表 {total_base:.2f} ms, 汇总表 {total_rollup:.2f} ms")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
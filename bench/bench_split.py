@@ -0,0 +1,66 @@
+"""对比单表布局与纵向拆分布局（patent_meta + patent_text）上的计数/分组查询延迟。
+
+用法（先复制数据库并执行拆分）：
+    cp backend/sqlite/patents.db /tmp/patents_split.db
+    python backend/sqlite/split_text.py --db /tmp/patents_split.db [--zstd]
+    python bench/bench_split.py --db backend/sqlite/patents.db --split-db /tmp/patents_split.db [--repeat 3]
+
+工作负载为提示词中的 COUNT / GROUP BY 示例（示例4、5、8、9、11），另附两条
+只涉及短字段的全表计数。每条 SQL 在两个数据库上分别执行，校验结果一致并输出耗时。
+"""
+import argparse
+import os
+import sqlite3
+
+from prompt_examples import load_prompt_examples
+from bench_fts import timed_fetch
+from backend.query import DB_PATH
+from backend.sqlite.split_text import register_text_functions, is_split
+
+AGGREGATE_EXAMPLES = [4, 5, 8, 9, 11]
+EXTRA_QUERIES = [
+    ("全表计数", "SELECT COUNT(*) FROM patent"),
+    ("按年分组", "SELECT strftime('%Y', \"publication_date\") AS year, COUNT(*) FROM patent GROUP BY year"),
+]
+
+
+def open_db(path):
+    conn = sqlite3.connect(path)
+    register_text_functions(conn)
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DB_PATH, help="单表布局的数据库路径")
+    parser.add_argument("--split-db", required=True, help="已执行 split_text.py 的数据库路径")
+    parser.add_argument("--repeat", type=int, default=3, help="每条 SQL 重复次数，取最短耗时")
+    args = parser.parse_args()
+
+    single, split = open_db(args.db), open_db(args.split_db)
+    if not is_split(split):
+        raise SystemExit(f"{args.split_db} 尚未拆分，请先执行 python backend/sqlite/split_text.py --db {args.split_db}")
+
+    examples = load_prompt_examples()
+    workload = [(f"示例{i}", examples[i - 1][1]) for i in AGGREGATE_EXAMPLES] + EXTRA_QUERIES
+
+    total_single, total_split = 0.0, 0.0
+    print(f"{'查询':<8}{'单表(ms)':>12}{'拆分(ms)':>12}{'加速比':>10}  结果一致")
+    for label, sql in workload:
+        single_ms, single_rows = timed_fetch(single, sql, args.repeat)
+        split_ms, split_rows = timed_fetch(split, sql, args.repeat)
+        total_single += single_ms
+        total_split += split_ms
+        speedup = single_ms / split_ms if split_ms > 0 else float("inf")
+        same = "是" if sorted(single_rows) == sorted(split_rows) else "否"
+        print(f"{label:<8}{single_ms:>12.2f}{split_ms:>12.2f}{speedup:>10.1f}  {same}")
+
+    print(f"\n合计: 单表 {total_single:.2f} ms, 拆分 {total_split:.2f} ms")
+    print(f"文件大小: 单表 {os.path.getsize(args.db) / 2**20:.1f} MB, "
+          f"拆分 {os.path.getsize(args.split_db) / 2**20:.1f} MB")
+    single.close()
+    split.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""SQL 后处理（postprocess_sql）的回归语料检查与微基准。
+
+用法：
+    python bench/bench_sql_postprocess.py            # 检查语料并对比改造前实现的耗时
+    python bench/bench_sql_postprocess.py --update   # 由提示词示例重新生成语料（覆盖期望输出）
+    python bench/bench_sql_postprocess.py --number 2000
+
+语料（bench/sql_postprocess_cases.json）由提示词示例 SQL 派生出大模型常见的输出形态
+（代码块与分号、未加引号或反引号的字段、等值比较、缺少 id/url/patent_title 的投影），
+外加手写的边界用例（字符串中的字段名与分号、子查询、别名、DISTINCT、*、聚合、UNION 等）。
+
+检查项：
+- 回归：输出与语料中的期望输出一致；
+- 幂等：对输出再处理一次结果不变；
+- 字面量：输入中的字符串字面量（等值比较改写为 '%值%' 的除外）原样出现在输出中；
+- 可编译：输入能在 patent 表结构上编译时，输出也能编译（EXPLAIN）。
+同时列出与改造前实现（bench/legacy_sql_postprocess.py）输出不同的用例数。
+"""
+import os
+import re
+import json
+import time
+import random
+import argparse
+import sqlite3
+
+from prompt_examples import load_prompt_examples
+from legacy_sql_postprocess import extract_sql as legacy_extract_sql, ensure_select_id_url as legacy_ensure
+from backend.components.sql_params import tokenize
+from backend.text_to_sql.sql_postprocess import FUZZY_FIELDS, postprocess_sql
+
+CASES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql_postprocess_cases.json")
+
+# 手写的边界用例
+EDGE_CASES = [
+    "```sql\nSELECT applicant, `inventor` FROM patent WHERE applicant = '台积电' AND patent_title LIKE '%abstract%';\n```",
+    'SELECT COUNT(*) FROM patent WHERE "applicant" = "联发科"',
+    "SELECT p.applicant FROM patent p WHERE p.ipc = 'H01L'; SELECT 1",
+    "好的，SQL如下：SELECT DISTINCT agent FROM patent WHERE agent = 'O''Neil'",
+    "SELECT substr(publication_date, 1, 4) AS y, COUNT(*) FROM patent GROUP BY y",
+    "SELECT * FROM patent WHERE id IN (SELECT id FROM patent WHERE applicant = 'x')",
+    "SELECT p.* FROM patent p WHERE p.applicant LIKE '%x%'",
+    "SELECT patent_title FROM patent WHERE applicant = inventor",
+    "SELECT patent_title FROM patent WHERE abstract LIKE '%a;b%' AND applicant = 'SELECT'",
+    "SELECT patent_title, (SELECT COUNT(*) FROM patent) AS total FROM patent WHERE ipc LIKE 'H01L%'",
+    "SELECT patent_title AS url_name, id AS pid FROM patent WHERE applicant = 'x'",
+    "SELECT (COUNT(CASE WHEN agent = 'a' THEN 1 END) * 100.0 / COUNT(*)) AS pct FROM patent",
+    "SELECT applicant FROM patent WHERE ipc LIKE 'H01L%' UNION SELECT applicant FROM patent WHERE ipc LIKE 'G06F%'",
+    "SELECT MAX(publication_date) FROM patent WHERE applicant = '瑞昱'",
+    'SELECT \\"applicant\\" FROM patent WHERE \\"ipc\\" LIKE \'H01L%\'',
+    "select Applicant from patent where PUBLICATION_DATE like '2024%' -- 注释 applicant = 'x'",
+    '"SELECT url FROM patent WHERE publication_number = \'TW202443169A\'"',
+]
+
+schema_sql = "CREATE TABLE patent (id INTEGER PRIMARY KEY, {})".format(
+    ", ".join(f'"{c}" TEXT' for c in sorted(FUZZY_FIELDS))
+)
+like_value_pattern = re.compile(r"LIKE '%(?P<value>(?:[^']|'')*)%'")
+
+
+def unquote_fields(sql: str) -> str:
+    return re.sub(r'"(\w+)"', lambda m: m.group(1) if m.group(1) in FUZZY_FIELDS else m.group(0), sql)
+
+
+def like_to_equal(sql: str) -> str:
+    """把 "字段" LIKE '%值%' 改回等值比较（模拟大模型写出的 =）"""
+    return re.sub(r"""("\w+")\s+LIKE\s+'%((?:[^'%]|'')*)%'""", r"\1 = '\2'", sql)
+
+
+def drop_required(sql: str) -> str:
+    """去掉投影中的 "id"、"url"、"patent_title"（模拟大模型漏写）"""
+    head, sep, tail = sql.partition(" FROM ")
+    for column in ('"id"', '"url"', '"patent_title"'):
+        head = re.sub(rf",\s*{column}(?=,|$)", "", head)
+    return head + sep + tail
+
+
+def build_inputs():
+    """由提示词示例派生语料输入，顺序固定"""
+    rng = random.Random(0)
+    inputs = []
+    for _, sql in load_prompt_examples():
+        inputs.append(sql)
+        inputs.append(f"```sql\n{sql};\n```")
+        inputs.append(unquote_fields(sql))
+        inputs.append(re.sub(r'"(\w+)"', r"`\1`", sql))
+        inputs.append(like_to_equal(sql))
+        inputs.append(drop_required(sql))
+        inputs.append("以下是查询语句：" + rng.choice([str.lower, str.upper, str])(drop_required(unquote_fields(sql))))
+    inputs.extend(EDGE_CASES)
+    seen = set()
+    return [s for s in inputs if not (s in seen or seen.add(s))]
+
+
+def load_cases():
+    with open(CASES_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_cases(cases):
+    with open(CASES_PATH, "w", encoding="utf-8") as f:
+        json.dump(cases, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def compiles(conn, sql: str) -> bool:
+    try:
+        conn.execute(f"EXPLAIN {sql}")
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def string_literals(sql: str):
+    return [t.text for t in tokenize(sql) if t.kind == "string"]
+
+
+def check(cases):
+    """返回失败信息列表"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute(schema_sql)
+    failures = []
+    for case in cases:
+        source, expected = case["input"], case["expected"]
+        output = postprocess_sql(source)
+        if output != expected:
+            failures.append(("回归", source, output))
+        if postprocess_sql(output) != output:
+            failures.append(("幂等", source, output))
+        kept = set(string_literals(output))
+        for literal in string_literals(source):
+            wrapped = "'%" + literal[1:-1] + "%'"
+            if literal not in kept and wrapped not in kept and literal.upper() != "'SELECT'":
+                failures.append(("字面量", source, output))
+                break
+        legacy_input = legacy_extract_sql(source)
+        if compiles(conn, legacy_input) and not compiles(conn, output):
+            failures.append(("可编译", source, output))
+    conn.close()
+    return failures
+
+
+def per_call_us(fn, inputs, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        for text in inputs:
+            fn(text)
+    return (time.perf_counter() - start) / (number * len(inputs)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update", action="store_true", help="重新生成语料并写入期望输出")
+    parser.add_argument("--number", type=int, default=200, help="微基准中语料的重复轮数")
+    args = parser.parse_args()
+
+    if args.update:
+        save_cases([{"input": s, "expected": postprocess_sql(s)} for s in build_inputs()])
+    cases = load_cases()
+    inputs = [case["input"] for case in cases]
+
+    failures = check(cases)
+    for kind, source, output in failures:
+        print(f"[{kind}] {source!r}\n    -> {output!r}")
+    differs = sum(legacy_ensure(legacy_extract_sql(s)) != postprocess_sql(s) for s in inputs)
+    print(f"语料 {len(cases)} 条，检查失败 {len(failures)} 项；与改造前实现输出不同 {differs} 条\n")
+
+    legacy_us = per_call_us(lambda s: legacy_ensure(legacy_extract_sql(s)), inputs, args.number)
+    new_us = per_call_us(postprocess_sql, inputs, args.number)
+    print(f"{'实现':<28}{'单次(us)':>10}")
+    print(f"{'extract_sql + ensure (改造前)':<28}{legacy_us:>10.1f}")
+    print(f"{'postprocess_sql':<28}{new_us:>10.1f}")
+    print(f"加速 {legacy_us / new_us:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
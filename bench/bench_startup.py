@@ -0,0 +1,113 @@
+"""启动耗时回归检查：用 python -X importtime 测量各入口模块的导入耗时。
+
+用法：
+    python bench/bench_startup.py                         # 默认入口，每个测 5 次取中位数
+    python bench/bench_startup.py --modules generate --repeat 10 --top 15
+    python bench/bench_startup.py --max-ms 500            # 任一入口超过 500 ms 时以非零状态退出
+
+- 每次在新的解释器进程中导入（不复用 __pycache__ 之外的任何状态），解析 -X importtime 的输出，
+  报告入口模块的累计导入耗时（中位数）与耗时最高的若干个被导入模块。
+- 回归检查：入口模块导入后，LAZY_MODULES 中的重量级依赖（langchain_openai、openai 等，只应在
+  第一次调用大模型时加载，见 backend/components/llm.py）不得出现在 sys.modules 中；
+  指定 --max-ms 时同时检查耗时上限。任一检查失败时以状态 1 退出，可用于 CI。
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+from prompt_examples import ROOT
+
+DEFAULT_MODULES = ["generate", "batch_runner", "backend.query", "backend.text_to_sql.text2sql_llm"]
+# 入口模块导入时不应加载的模块（首次使用时才加载）
+LAZY_MODULES = ["langchain_openai", "openai", "httpx", "langchain_core.prompts", "langchain_core.language_models"]
+
+
+def parse_importtime(stderr: str, module: str) -> dict:
+    """解析 -X importtime 输出中 module 的导入子树（不含解释器启动时 site 等的导入）：
+    {模块: (自身 us, 累计 us)}"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if self_us.strip().isdigit():
+            depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+            entries.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    # 子模块先于父模块输出：入口模块那一行之前、缩进更深的连续行即其子树
+    timings = {}
+    for i, (depth, name, self_us, cumulative_us) in enumerate(entries):
+        if name == module and depth == 0:
+            timings[name] = (self_us, cumulative_us)
+            for child_depth, child, child_self, child_cumulative in reversed(entries[:i]):
+                if child_depth == 0:
+                    break
+                timings.setdefault(child, (child_self, child_cumulative))
+            break
+    return timings
+
+
+def import_once(module: str):
+    """在新进程中导入 module，返回 ({模块: (自身 us, 累计 us)}, 已加载的 LAZY_MODULES)"""
+    check = f"import sys, {module}; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", check], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败：\n{proc.stderr[-2000:]}")
+    timings = parse_importtime(proc.stderr, module)
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return timings, loaded
+
+
+def measure(module: str, repeat: int):
+    """返回 (入口累计耗时中位数 ms, 按累计耗时中位数排序的 [(模块, ms)], 已加载的 LAZY_MODULES)"""
+    runs = [import_once(module) for _ in range(repeat)]
+    samples = {}
+    for timings, _ in runs:
+        for name, (_, cumulative) in timings.items():
+            samples.setdefault(name, []).append(cumulative / 1000)
+    total = statistics.median(samples.get(module, [0.0]))
+    heaviest = sorted(((name, statistics.median(v)) for name, v in samples.items() if name != module),
+                      key=lambda item: -item[1])
+    return total, heaviest, runs[-1][1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES, help="要测量的入口模块")
+    parser.add_argument("--repeat", type=int, default=5, help="每个入口的测量次数")
+    parser.add_argument("--top", type=int, default=8, help="每个入口列出的最慢模块数")
+    parser.add_argument("--max-ms", type=float, default=0, help="入口导入耗时上限（毫秒，0 表示不检查）")
+    args = parser.parse_args()
+
+    # 预热一次，避免首次编译 .pyc 计入耗时
+    for module in args.modules:
+        import_once(module)
+
+    failures = []
+    print(f"{'入口':<40}{'导入(ms)':>10}  延迟加载检查")
+    reports = []
+    for module in args.modules:
+        total, heaviest, loaded = measure(module, args.repeat)
+        status = "通过" if not loaded else "提前加载了 " + ", ".join(loaded)
+        print(f"{module:<40}{total:>10.1f}  {status}")
+        reports.append((module, heaviest))
+        if loaded:
+            failures.append(f"{module} 导入时加载了 {', '.join(loaded)}")
+        if args.max_ms and total > args.max_ms:
+            failures.append(f"{module} 导入耗时 {total:.1f} ms，超过上限 {args.max_ms:.0f} ms")
+
+    for module, heaviest in reports:
+        print(f"\n{module} 中累计耗时最高的模块：")
+        for name, ms in heaviest[:args.top]:
+            print(f"  {ms:>8.1f} ms  {name}")
+
+    if failures:
+        print("\n检查失败：\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""确定性的本地假 LLM，用于在没有真实 qwen-plus 接口时测量流水线性能。
+
+- text2sql 提示词：按问题返回 SQL（问题在 sql_by_question 或提示词示例中则用对应 SQL，
+  否则按问题的 crc32 轮选提示词示例），保证同一问题每次得到相同 SQL。
+- 回答提示词：返回固定长度的回答文本。
+- 同步调用用 time.sleep、异步调用用 asyncio.sleep 模拟网络延迟；jitter > 0 时延迟在
+  latency × [1 - jitter, 1 + jitter] 内按提示词的 crc32 确定性地浮动。
+"""
+import time
+import zlib
+import asyncio
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from prompt_examples import load_prompt_examples
+from backend.components.text2sql_prompts import QUESTION_MARKER
+
+
+def _prompt_text(prompt) -> str:
+    if isinstance(prompt, str):
+        return prompt
+    if hasattr(prompt, "to_string"):
+        return prompt.to_string()
+    return str(prompt)
+
+
+class FakeLLM:
+    def __init__(self, latency: float = 0.2, answer_chars: int = 200, sql_by_question: dict = None,
+                 jitter: float = 0.0):
+        self.latency = latency
+        self.answer_chars = answer_chars
+        self.jitter = jitter
+        self.examples = load_prompt_examples()
+        self.sql_by_question = {q: sql for q, sql in self.examples}
+        self.sql_by_question.update(sql_by_question or {})
+        self.calls = 0
+
+    def delay(self, prompt) -> float:
+        if not self.jitter:
+            return self.latency
+        fraction = zlib.crc32(_prompt_text(prompt).encode("utf-8")) / 0xFFFFFFFF
+        return self.latency * (1 + self.jitter * (2 * fraction - 1))
+
+    def respond(self, prompt) -> AIMessage:
+        self.calls += 1
+        text = _prompt_text(prompt)
+        if QUESTION_MARKER in text:
+            question = text.rsplit(QUESTION_MARKER, 1)[1].split("\n", 1)[0].strip()
+            sql = self.sql_by_question.get(question)
+            if sql is None:
+                sql = self.examples[zlib.crc32(question.encode("utf-8")) % len(self.examples)][1]
+            return AIMessage(content=sql + ";")
+        return AIMessage(content=("根据检索结果，" * self.answer_chars)[:self.answer_chars])
+
+    def invoke_sync(self, prompt):
+        time.sleep(self.delay(prompt))
+        return self.respond(prompt)
+
+    async def invoke_async(self, prompt):
+        await asyncio.sleep(self.delay(prompt))
+        return self.respond(prompt)
+
+    def as_runnable(self):
+        """包装为 Runnable，可直接替换 backend.components.llm.llm（支持 invoke / ainvoke / 管道组合）"""
+        return RunnableLambda(self.invoke_sync, afunc=self.invoke_async)
+
+
+def install_fake_llm(fake: FakeLLM):
+    """把流水线使用的 llm 替换为假 LLM（流水线各处通过 get_llm() 取用）"""
+    from backend.components.llm import set_llm
+
+    runnable = fake.as_runnable()
+    set_llm(runnable)
+    return runnable
@@ -0,0 +1,184 @@
+"""本地假 OpenAI 兼容服务（/v1/chat/completions），用于在不访问真实接口的情况下测试 llm 网关。
+
+用法：
+    python bench/fake_openai_server.py [--port 8765] [--latency 0.2] [--rpm 600] [--fail-rate 0]
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python generate_answers.py
+
+- 回答内容由 FakeLLM 生成（text2sql 提示词返回示例 SQL，其余返回固定文本），响应带 usage。
+- 模拟提供方的前缀缓存：提示词按 PREFIX_BLOCK_CHARS 分块，与之前请求相同的最长前缀块计入
+  usage.prompt_tokens_details.cached_tokens。
+- --rpm：服务端按滑动 60 秒窗口限流，超出时返回 429 与 Retry-After，模拟提供方限流。
+- --fail-rate：按概率返回 500，模拟服务端偶发故障。
+- 支持 "stream": true（SSE 分块返回）。
+"""
+import json
+import time
+import hashlib
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fake_llm import FakeLLM
+from backend.components.context_budget import estimate_tokens
+
+STREAM_CHUNK_CHARS = 20
+PREFIX_BLOCK_CHARS = 256
+
+
+class FakeOpenAIState:
+    """服务端共享状态：响应生成器、限流窗口与请求计数"""
+
+    def __init__(self, latency: float = 0.2, rpm: float = 0, fail_rate: float = 0.0, answer_chars: int = 200):
+        self.fake = FakeLLM(latency=0, answer_chars=answer_chars)
+        self.latency = latency
+        self.rpm = rpm
+        self.fail_rate = fail_rate
+        self.lock = threading.Lock()
+        self.window = deque()
+        self.prefixes = set()
+        self.counts = {"requests": 0, "ok": 0, "rate_limited": 0, "failed": 0}
+
+    def admit(self) -> int:
+        """判定本次请求的状态码：200 / 429 / 500"""
+        with self.lock:
+            self.counts["requests"] += 1
+            now = time.monotonic()
+            while self.window and now - self.window[0] > 60:
+                self.window.popleft()
+            if self.rpm and len(self.window) >= self.rpm:
+                self.counts["rate_limited"] += 1
+                return 429
+            if self.fail_rate and random.random() < self.fail_rate:
+                self.counts["failed"] += 1
+                return 500
+            self.window.append(now)
+            self.counts["ok"] += 1
+            return 200
+
+    def cached_prefix_tokens(self, prompt: str) -> int:
+        """返回与之前请求相同的最长前缀（按块对齐）的 token 数，并记录本次提示词的各级前缀"""
+        digest = hashlib.sha256()
+        cached_chars = 0
+        blocks = []
+        for end in range(PREFIX_BLOCK_CHARS, len(prompt) + 1, PREFIX_BLOCK_CHARS):
+            digest.update(prompt[end - PREFIX_BLOCK_CHARS:end].encode("utf-8"))
+            blocks.append((end, digest.hexdigest()))
+        with self.lock:
+            for end, key in blocks:
+                if key not in self.prefixes:
+                    break
+                cached_chars = end
+            self.prefixes.update(key for _, key in blocks)
+        return estimate_tokens(prompt[:cached_chars])
+
+    def retry_after(self) -> float:
+        with self.lock:
+            return max(0.1, 60 - (time.monotonic() - self.window[0])) if self.window else 1.0
+
+
+def make_handler(state: FakeOpenAIState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, payload, headers=None):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_json(404, {"error": {"message": "not found"}})
+                return
+
+            status = state.admit()
+            if status == 429:
+                self.send_json(429, {"error": {"message": "rate limited", "type": "rate_limit_error"}},
+                               {"Retry-After": f"{state.retry_after():.1f}"})
+                return
+            if status == 500:
+                self.send_json(500, {"error": {"message": "injected failure", "type": "server_error"}})
+                return
+
+            time.sleep(state.latency)
+            prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+            content = state.fake.respond(prompt).content
+            model = request.get("model", "fake")
+            usage = {
+                "prompt_tokens": estimate_tokens(prompt),
+                "completion_tokens": estimate_tokens(content),
+                "prompt_tokens_details": {"cached_tokens": state.cached_prefix_tokens(prompt)},
+            }
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            if request.get("stream"):
+                self.send_stream(model, content, usage)
+                return
+            self.send_json(200, {
+                "id": f"chatcmpl-{random.getrandbits(48):x}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        def send_stream(self, model, content, usage):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            base = {"id": f"chatcmpl-{random.getrandbits(48):x}", "object": "chat.completion.chunk",
+                    "created": int(time.time()), "model": model}
+            for i in range(0, len(content), STREAM_CHUNK_CHARS):
+                delta = {"content": content[i:i + STREAM_CHUNK_CHARS]}
+                chunk = dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}])
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            done = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}], usage=usage)
+            self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+
+def start_fake_server(port: int = 0, **kwargs):
+    """在后台线程启动服务，返回 (server, state, base_url)；port=0 时自动选择空闲端口"""
+    state = FakeOpenAIState(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--latency", type=float, default=0.2, help="每次请求的延迟（秒）")
+    parser.add_argument("--rpm", type=float, default=0, help="服务端每分钟请求上限，0 表示不限流")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="返回 500 的概率")
+    args = parser.parse_args()
+
+    server, state, base_url = start_fake_server(args.port, latency=args.latency, rpm=args.rpm, fail_rate=args.fail_rate)
+    print(f"假 OpenAI 服务已启动: {base_url}（Ctrl+C 退出）")
+    try:
+        while True:
+            time.sleep(10)
+            print(state.counts)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""读取 text2sql 示例库中的提示词示例（问题 / SQL），供各基准脚本复用。"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from backend.text_to_sql.example_store import load_examples
+
+
+def clean_example_sql(sql: str) -> str:
+    """去掉示例 SQL 末尾的中英文分号与空白"""
+    return sql.strip().rstrip(";；").strip()
+
+
+def load_prompt_examples():
+    """返回 [(问题, SQL), ...]，顺序与示例库中的提示词示例一致"""
+    return [
+        (ex["question"], clean_example_sql(ex["sql"]))
+        for ex in load_examples() if ex.get("source") == "prompt"
+    ]
@@ -0,0 +1,300 @@
+"""生成合成的 patent 数据库，用于没有真实 patents.db 时的离线基准。
+
+用法：
+    python bench/synth_db.py --out /tmp/synth.db --rows 100000
+    python bench/synth_db.py --out /tmp/synth.db --rows 1000000 --text-chars 120 --indexes fts ipc rollup entity
+
+- 表结构与 text2sql 提示词中的 patent 表一致（backend/components/text2sql_prompts.py）。
+- 取值为繁简混合的中文技术词、台湾常见申请人、带国籍的发明人、代理人、IPC 编号等；
+  申请人、技术词按 Zipf 分布抽样，少数取值占大部分行，接近真实数据的倾斜程度。
+- 提示词示例与问题表第J列 SQL 中 LIKE 检索的申请人、发明人、代理人、专利名关键词、IPC、公开号
+  都会并入词表，回放问题时的查询能命中数据。
+- 同一 --seed 与 --rows 生成的数据完全相同。
+- --indexes 在建表后调用 backend/sqlite 下对应脚本建立全文索引、patent_ipc 附表、计数汇总表与实体索引。
+
+行数较大时文本字段是主要体积：1e7 行在 --text-chars 120 下约 10 GB，可按需调小。
+"""
+import os
+import time
+import random
+import sqlite3
+import argparse
+import datetime
+from collections import Counter, defaultdict
+from itertools import accumulate
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+from prompt_examples import ROOT, load_prompt_examples
+from batch_runner import EXCEL_PATH
+from backend.components.sql_params import tokenize, string_value
+
+BATCH_SIZE = 20000
+# 长文本截取用的语料长度（字符）
+CORPUS_CHARS = 1 << 20
+INDEX_STEPS = ("fts", "ipc", "rollup", "entity")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS patent (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    application_date DATE,
+    publication_date DATE,
+    application_number TEXT,
+    publication_number TEXT,
+    patent_title TEXT,
+    applicant TEXT,
+    keywords TEXT,
+    url TEXT,
+    inventor TEXT,
+    agent TEXT,
+    abstract TEXT,
+    patent_scope TEXT,
+    detailed_description TEXT,
+    priority TEXT,
+    gazette_ipc TEXT,
+    ipc TEXT
+)
+"""
+COLUMNS = (
+    "application_date", "publication_date", "application_number", "publication_number", "patent_title",
+    "applicant", "keywords", "url", "inventor", "agent", "abstract", "patent_scope", "detailed_description",
+    "priority", "gazette_ipc", "ipc",
+)
+
+APPLICANTS = [
+    "台湾积体电路制造股份有限公司", "联发科技股份有限公司", "日月光半导体制造股份有限公司", "瑞昱半导体股份有限公司",
+    "联咏科技股份有限公司", "联阳半导体股份有限公司", "瑞鼎科技股份有限公司", "达发科技股份有限公司",
+    "创意电子股份有限公司", "祥硕科技股份有限公司", "联华电子股份有限公司", "力晶积成电子制造股份有限公司",
+    "南亚科技股份有限公司", "华邦电子股份有限公司", "旺宏电子股份有限公司", "友达光电股份有限公司",
+    "群创光电股份有限公司", "鸿海精密工业股份有限公司", "广达电脑股份有限公司", "英业达股份有限公司",
+    "日立化成工业股份有限公司", "东京威力科创股份有限公司", "应用材料股份有限公司", "三星电子股份有限公司",
+    "英特尔股份有限公司", "高通公司", "财团法人工业技术研究院", "国立清华大学", "国立成功大学", "国立台湾大学",
+]
+TERMS = [
+    "半导体", "半导体封装", "半导体结构", "集成电路", "积体电路", "记忆体", "记忆体电路", "电晶体", "二极体",
+    "电容器", "电阻", "导线架", "基板", "晶圆", "光罩", "蚀刻", "研磨", "化学机械研磨", "沉积", "微影",
+    "无线通讯", "蓝牙", "天线", "射频", "基频", "调变", "影像处理", "视讯编解码", "显示面板", "显示设备",
+    "触控", "发光二极体", "驱动电路", "时脉", "锁相回路", "类比数位转换器", "差动放大器", "电源管理",
+    "功耗", "散热", "封装基板", "凸块", "重布线层", "电子装置", "测试", "图像校正", "神经网路", "处理器",
+]
+TITLE_SUFFIXES = ["", "及其制造方法", "及其操作方法", "装置", "结构", "系统", "方法", "电路", "模组"]
+SURNAMES = "陈林黄张李王吴刘蔡杨许郑谢洪郭邱曾廖赖徐周叶苏庄吕江何萧罗高潘简朱钟彭游詹胡施沈余卢梁赵颜柯翁魏孙戴"
+GIVEN_CHARS = "文志明俊宏建家信嘉伟佳仁冠宇柏安宜群珮仲良佑先彦廷怡君淑芬雅婷美玲国华正雄世昌"
+COUNTRIES = ["中华民国"] * 14 + ["美国", "美国", "日本", "中国大陆", "韩国", "德国"]
+PUBLICATION_SCOPES = ["本国公开"] * 17 + ["大陆公开", "外国公开", "金属机电工业"]
+PRIORITY_COUNTRIES = ["美国", "美国", "中国大陆", "中国大陆", "日本", "韩国", "世界知识产权组织"]
+IPC_CODES = [
+    "H01L21/02", "H01L21/027", "H01L21/60", "H01L21/67", "H01L21/70", "H01L21/8234", "H01L23/00", "H01L23/31",
+    "H01L23/498", "H01L25/065", "H01L27/02", "H01L29/78", "H10B10/00", "H10N97/00", "G06F3/01", "G06F3/041",
+    "G06F11/10", "G06F12/02", "G06N3/04", "G06T5/00", "G09G3/32", "G09G3/36", "G11C11/4074", "G11C16/04",
+    "G01R31/26", "H03K17/687", "H03L7/08", "H03M1/12", "H03F3/45", "H04B1/00", "H04B1/10", "H04B7/06",
+    "H04L5/00", "H04L27/26", "H04N19/51", "H04N21/47", "H04W52/02", "H04W72/04", "H05K1/02", "H05K7/20",
+    "H01B1/22", "H01Q1/22", "C09G1/02", "C23C16/44", "B24B37/04",
+]
+IPC_VERSIONS = ["2006.01", "2006.01", "2006.01", "2011.01", "2013.01", "2023.01"]
+SENTENCES = [
+    "本发明提供一种{a}，包含{b}与{c}。",
+    "所述{a}设置于{b}上，用以降低{c}的功耗。",
+    "藉由{a}的配置，可提升{b}的良率并减少{c}的面积。",
+    "在一实施例中，{a}电性连接至{b}，且{c}位于两者之间。",
+    "本揭露的{a}可应用于{b}，解决习知{c}散热不佳的问题。",
+]
+# 收集 SQL 中 LIKE 取值的字段
+HARVEST_FIELDS = {"applicant", "inventor", "agent", "patent_title", "abstract", "ipc", "gazette_ipc",
+                  "publication_number"}
+
+
+def harvest_literals(sqls):
+    """收集 SQL 中 "字段" LIKE '%值%' 的取值：{字段: [值, ...]}，按出现次数从多到少排列"""
+    values = defaultdict(Counter)
+    for sql in sqls:
+        tokens = [t for t in tokenize(sql) if t.kind not in ("ws", "comment")]
+        for i in range(2, len(tokens)):
+            field, op, literal = tokens[i - 2], tokens[i - 1], tokens[i]
+            if literal.kind != "string" or op.text.upper() != "LIKE":
+                continue
+            name = field.text.strip('"`').lower()
+            value = string_value(literal.text).strip("%")
+            if name in HARVEST_FIELDS and value and not any(c in value for c in "%_*[]"):
+                values[name][value] += 1
+    return {name: [value for value, _ in counter.most_common()] for name, counter in values.items()}
+
+
+def workbook_sqls(excel_path):
+    if not excel_path or not os.path.exists(excel_path):
+        return []
+    from bench_examples import load_sheet
+    return [sql for _, sql in load_sheet(excel_path, 0) if sql]
+
+
+def merged(base, extra):
+    """extra 中的新取值插在 base 前部，使回放问题检索的取值落在高频区间"""
+    seen = set()
+    return [v for v in list(extra) + list(base) if not (v in seen or seen.add(v))]
+
+
+def zipf_weights(n, s=1.1):
+    return list(accumulate(1 / (rank ** s) for rank in range(1, n + 1)))
+
+
+class PatentGenerator:
+    """按行号确定性地生成 patent 行（同一 seed 下第 i 行固定）"""
+
+    def __init__(self, seed=0, text_chars=300, harvested=None):
+        harvested = harvested or {}
+        self.seed = seed
+        self.text_chars = text_chars
+        self.applicants = merged(APPLICANTS, harvested.get("applicant", []))
+        self.terms = merged(TERMS, harvested.get("patent_title", []) + harvested.get("abstract", []))
+        self.agents = merged(self._names(random.Random(seed), 40), harvested.get("agent", []))
+        self.inventors = merged(self._names(random.Random(seed + 1), 800), harvested.get("inventor", []))
+        self.ipc_codes = merged(IPC_CODES, [self._ipc_code(v) for v in harvested.get("ipc", []) +
+                                            harvested.get("gazette_ipc", []) if self._ipc_code(v)])
+        self.publication_numbers = harvested.get("publication_number", [])
+        self._applicant_weights = zipf_weights(len(self.applicants))
+        self._term_weights = zipf_weights(len(self.terms), 0.9)
+        self._inventor_weights = zipf_weights(len(self.inventors), 0.7)
+        self._ipc_weights = zipf_weights(len(self.ipc_codes))
+        self._date_start = datetime.date(2000, 1, 1).toordinal()
+        self._date_span = datetime.date(2025, 6, 30).toordinal() - self._date_start
+        self._corpus = self._build_corpus(random.Random(seed + 2), max(CORPUS_CHARS, text_chars * 6))
+
+    @staticmethod
+    def _names(rng, n):
+        names = {}
+        while len(names) < n:
+            names[rng.choice(SURNAMES) + "".join(rng.choices(GIVEN_CHARS, k=rng.choice((1, 2, 2))))] = None
+        return list(names)
+
+    @staticmethod
+    def _ipc_code(value):
+        """问题 SQL 中的 IPC 取值（H01L21/02、G09G-003/32）规范为 小类+大组/小组，只有小类时返回 None"""
+        value = value.replace("-", "").upper()
+        if len(value) <= 4 or "/" not in value:
+            return None
+        head, group = value[:4], value[4:]
+        main, _, sub = group.partition("/")
+        return f"{head}{int(main) if main.isdigit() else main}/{sub}"
+
+    def _build_corpus(self, rng, chars):
+        """预先生成一段正文语料，各行的长文本从中截取，避免逐行造句"""
+        parts = []
+        size = 0
+        while size < chars:
+            a, b, c = rng.choices(self.terms, cum_weights=self._term_weights, k=3)
+            sentence = rng.choice(SENTENCES).format(a=a, b=b, c=c)
+            parts.append(sentence)
+            size += len(sentence)
+        return "".join(parts)
+
+    def _text(self, rng, title, chars):
+        """首句包含专利名，其余从语料中随机截取"""
+        head = rng.choice(SENTENCES).format(a=title, b=rng.choice(self.terms), c=rng.choice(self.terms))
+        if chars <= len(head):
+            return head[:chars]
+        rest = chars - len(head)
+        offset = rng.randrange(len(self._corpus) - rest)
+        return head + self._corpus[offset:offset + rest]
+
+    def row(self, i):
+        rng = random.Random(self.seed * 1_000_003 + i)
+        application = datetime.date.fromordinal(
+            self._date_start + int(self._date_span * rng.random() ** 0.6))
+        publication = min(application + datetime.timedelta(days=rng.randint(90, 540)), datetime.date(2025, 12, 31))
+        terms = rng.choices(self.terms, cum_weights=self._term_weights, k=rng.choice((1, 1, 2)))
+        title = "".join(dict.fromkeys(terms)) + rng.choice(TITLE_SUFFIXES)
+        applicant = rng.choices(self.applicants, cum_weights=self._applicant_weights)[0]
+        inventors = rng.choices(self.inventors, cum_weights=self._inventor_weights, k=rng.randint(1, 4))
+        inventor = "；".join(f"{name}（{rng.choice(COUNTRIES)}）" for name in dict.fromkeys(inventors))
+        codes = list(dict.fromkeys(rng.choices(self.ipc_codes, cum_weights=self._ipc_weights, k=rng.randint(1, 3))))
+        ipc = "; ".join(f"{code}({rng.choice(IPC_VERSIONS)})" for code in codes)
+        if i < len(self.publication_numbers):
+            publication_number = self.publication_numbers[i]
+        else:
+            publication_number = f"TW{publication.year}{i % 100000:05d}{rng.choice('AB')}"
+        priority = ""
+        if rng.random() < 0.4:
+            priority = f"{rng.choice(PRIORITY_COUNTRIES)} {rng.randint(10, 99)}/{rng.randint(100000, 999999)} " \
+                       f"{application - datetime.timedelta(days=rng.randint(30, 365))}"
+        chars = self.text_chars
+        return (
+            application.isoformat(),
+            publication.isoformat(),
+            f"TW{application.year - 1911:03d}{i:08d}",
+            publication_number,
+            title,
+            applicant,
+            rng.choice(PUBLICATION_SCOPES),
+            f"https://tiponet.tipo.gov.tw/gpss3/gpsskmc/gpssbkm?.{rng.getrandbits(128):032x}^{i:x}",
+            inventor,
+            rng.choice(self.agents),
+            self._text(rng, title, chars),
+            f"1. 一种{title}，包含：" + self._text(rng, title, chars),
+            "【发明内容】" + self._text(rng, title, chars * 3),
+            priority,
+            codes[0][:4],
+            ipc,
+        )
+
+
+def build_indexes(conn, steps):
+    """调用 backend/sqlite 下的建索引函数"""
+    for step in steps:
+        start = time.perf_counter()
+        if step == "fts":
+            from backend.sqlite.fts_index import build_fts_index
+            build_fts_index(conn)
+        elif step == "ipc":
+            from backend.sqlite.clean_ipc import build_ipc_table
+            build_ipc_table(conn)
+        elif step == "rollup":
+            from backend.sqlite.rollup import refresh_rollup
+            refresh_rollup(conn, rebuild=True)
+        elif step == "entity":
+            from backend.sqlite.entity_index import build_entity_index
+            build_entity_index(conn)
+        conn.commit()
+        print(f"{step:<8}{time.perf_counter() - start:>8.1f} s")
+
+
+def generate_db(path, rows, seed=0, text_chars=300, harvested=None, indexes=()):
+    """生成 rows 行的合成数据库（已存在的文件会被覆盖）"""
+    if os.path.exists(path):
+        os.remove(path)
+    generator = PatentGenerator(seed, text_chars, harvested)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute(SCHEMA)
+    insert = f"INSERT INTO patent ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+    start = time.perf_counter()
+    for offset in range(0, rows, BATCH_SIZE):
+        conn.executemany(insert, (generator.row(i) for i in range(offset, min(rows, offset + BATCH_SIZE))))
+        conn.commit()
+    conn.execute("ANALYZE")
+    conn.commit()
+    print(f"patent  {time.perf_counter() - start:>8.1f} s（{rows} 行）")
+    build_indexes(conn, indexes)
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="输出数据库路径（已存在则覆盖）")
+    parser.add_argument("--rows", type=int, default=100000, help="行数（1e4 ~ 1e7）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--text-chars", type=int, default=300, help="摘要、权利要求的字符数（详细说明为 3 倍）")
+    parser.add_argument("--excel", default=os.path.join(ROOT, EXCEL_PATH), help="从该问题表第J列 SQL 收集检索取值")
+    parser.add_argument("--indexes", nargs="*", default=[], choices=INDEX_STEPS, help="生成后建立的索引")
+    args = parser.parse_args()
+
+    sqls = [sql for _, sql in load_prompt_examples()] + workbook_sqls(args.excel)
+    harvested = harvest_literals(sqls)
+    print("收集的检索取值：" + "，".join(f"{k} {len(v)}" for k, v in sorted(harvested.items())))
+    generate_db(args.out, args.rows, args.seed, args.text_chars, harvested, args.indexes)
+    print(f"已生成 {args.out}（{os.path.getsize(args.out) / 2 ** 20:.1f} MB）")
+
+
+if __name__ == "__main__":
+    main()
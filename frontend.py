@@ -1,5 +1,5 @@
 import streamlit as st
-from generate import generate_answer
+from generate import run_pipeline, stream_answer_with_context
 
 import sys
 from pathlib import Path
@@ -104,9 +104,27 @@ if "is_loading" not in st.session_state:
 if "clear_input" not in st.session_state:
     st.session_state.clear_input = False
 
-def add_message(role, content):
-    """添加消息到聊天记录"""
-    st.session_state.messages.append({"role": role, "content": content})
+def add_message(role, content, **extra):
+    """添加消息到聊天记录（助手消息可附带 sql、row_count、source_title、source_url）"""
+    st.session_state.messages.append({"role": role, "content": content, **extra})
+
+def render_sql(sql, row_count):
+    """显示生成的SQL与检索到的记录数"""
+    if sql:
+        with st.expander(f"生成的SQL（检索到 {row_count} 条记录）"):
+            st.code(sql, language="sql")
+
+def render_references(source_title, source_url):
+    """显示参考专利：source_title/source_url 形如 “专利id：<id>：<专利名/URL>”"""
+    if not source_title:
+        return
+    with st.expander(f"参考专利（{len(source_title)} 条）"):
+        for title, url in zip(source_title, source_url):
+            link = url.split("：", 2)[-1]
+            if link.startswith("http"):
+                st.markdown(f"- [{title}]({link})")
+            else:
+                st.markdown(f"- {title}")
 
 def display_messages():
     """显示聊天消息"""
@@ -115,6 +133,34 @@ def display_messages():
             st.markdown(f'<div class="user-message">{message["content"]}</div>', unsafe_allow_html=True)
         else:
             st.markdown(f'<div class="assistant-message">{message["content"]}</div>', unsafe_allow_html=True)
+            render_sql(message.get("sql"), message.get("row_count", 0))
+            render_references(message.get("source_title"), message.get("source_url"))
+
+def stream_reply(question):
+    """流式生成回答：先显示生成的SQL与记录数，再逐段输出回答，最后显示参考专利。
+
+    返回写入聊天记录的助手消息字段。
+    """
+    with st.spinner("正在生成SQL并检索专利信息..."):
+        result = run_pipeline(question, raise_errors=True, answer=False)
+
+    if not result["sql"]:
+        st.markdown(f'<div class="assistant-message">{result["content"]}</div>', unsafe_allow_html=True)
+        return {"content": result["content"]}
+
+    row_count = getattr(result["rows"], "total_count", len(result["rows"]))
+    render_sql(result["sql"], row_count)
+    answer = st.write_stream(
+        stream_answer_with_context(question, result["sql"], result["context"])
+    )
+    render_references(result["source_title"], result["source_url"])
+    return {
+        "content": answer,
+        "sql": result["sql"],
+        "row_count": row_count,
+        "source_title": result["source_title"],
+        "source_url": result["source_url"],
+    }
 
 def main():
     # 主标题
@@ -147,9 +193,10 @@ def main():
         else:
             display_messages()
         
-        # 显示加载状态
+        # 显示加载状态（生成回答时原位替换为流式输出）
+        pending = st.empty()
         if st.session_state.is_loading:
-            st.markdown("""
+            pending.markdown("""
             <div class="assistant-message">
                 <span class="loading-dots">正在思考中</span>
             </div>
@@ -197,12 +244,12 @@ def main():
             # 获取最后一个用户消息
             last_user_message = st.session_state.messages[-1]["content"]
             
-            # 生成AI回复
-            with st.spinner("正在检索专利信息..."):
-                ai_response = generate_answer(last_user_message)
+            # 在加载占位处流式生成AI回复
+            with pending.container():
+                reply = stream_reply(last_user_message)
             
             # 添加AI回复
-            add_message("assistant", ai_response)
+            add_message("assistant", reply.pop("content"), **reply)
             st.session_state.is_loading = False
             
             # 重新运行以显示AI回复
@@ -1,61 +1,341 @@
 import json
-from backend.components.llm import llm
-from backend.components.prompts import chat_prompt_template
-from backend.text_to_sql.text2sql_llm import text2sql
-from backend.query import run_query, format_results_exclude_url, reference_for_answer
+import time
+from backend.components.llm import get_llm, load_env
 
+# .env 中也可能配置缓存、限速等开关，须在导入读取这些开关的模块之前加载
+load_env()
 
-def generate_answer(question: str, history=None) -> dict:
-    # 生成 SQL
-    sql_query = text2sql(question)
-    
-    # 检查是否是查全表的语句，如果是则置空
+from backend.components.prompts import get_answer_prompt
+from backend.text_to_sql.text2sql_llm import text2sql, atext2sql, log_usage
+from backend.query import DB_PATH, run_query, arun_query, format_results_exclude_url, reference_for_answer, load_deferred_columns
+from backend.components.db_pool import get_pool
+from backend.components.result_cache import ResultCache, RESULT_CACHE_ENABLED
+from backend.text_to_sql.sql_cache import normalize_question
+from backend.components.log import get_logger, preview
+from backend.components.tracing import record_stage, span
+
+NO_SQL_MESSAGE = "抱歉，我无法根据问题生成有效的SQL查询。"
+
+logger = get_logger("pipeline")
+
+# 查询结果 / 回答缓存；patents.db 被改写时自动失效，并让连接池重新打开连接
+result_cache = ResultCache(DB_PATH, on_change=lambda: get_pool(DB_PATH).invalidate())
+
+
+def reject_full_table(sql_query: str) -> str:
+    """检查是否是查全表的语句，如果是则置空"""
     if sql_query and sql_query.strip().upper().startswith('SELECT *'):
         sql_query = ""
-    
-    if not sql_query:
-        return {
-            "content": "抱歉，我无法根据问题生成有效的SQL查询。",
-            "text": "",
-            "source_title": "",
-            "source_url": "",
-            "source_file": ""
-        }
+    return sql_query
+
+
+def generate_sql(question: str) -> str:
+    """阶段一：问题 -> SQL。查全表的 SELECT * 语句视为无效，返回空串"""
+    with span("sql"):
+        return reject_full_table(text2sql(question))
+
+
+async def agenerate_sql(question: str) -> str:
+    with span("sql"):
+        return reject_full_table(await atext2sql(question))
+
+
+def fetch_rows(sql_query: str, use_cache: bool = RESULT_CACHE_ENABLED):
+    """阶段二：SQL -> 查询结果行。相同 SQL 在数据库未变化时直接复用缓存结果"""
+    with span("fetch", cache_hit=False) as s:
+        if use_cache:
+            rows = result_cache.get_rows(sql_query)
+            if rows is not None:
+                s.set(cache_hit=True, rows=len(rows))
+                return rows
+        rows = run_query(sql_query)
+        s.set(rows=len(rows))
+        # 降级结果与查询代价、当时的负载有关，不写入缓存
+        if use_cache and not rows.degraded:
+            result_cache.put_rows(sql_query, rows)
+        return rows
+
+
+async def afetch_rows(sql_query: str, use_cache: bool = RESULT_CACHE_ENABLED):
+    """fetch_rows 的异步版本，查询在读线程池中执行"""
+    with span("fetch", cache_hit=False) as s:
+        if use_cache:
+            rows = result_cache.get_rows(sql_query)
+            if rows is not None:
+                s.set(cache_hit=True, rows=len(rows))
+                return rows
+        rows = await arun_query(sql_query)
+        s.set(rows=len(rows))
+        if use_cache and not rows.degraded:
+            result_cache.put_rows(sql_query, rows)
+        return rows
 
-    # 执行 SQL 查询
-    results = run_query(sql_query)
-    
-    # 构建上下文
-    context = format_results_exclude_url(results)
-    print("context:", context)
 
-    # 构建带上下文的 prompt 并调用 LLM
-    chain = chat_prompt_template | llm
-    response = chain.invoke({
+def build_context(results, question: str = "") -> str:
+    """阶段三：查询结果 -> 回答用上下文（按相关度选行并受 token 预算约束）"""
+    return format_results_exclude_url(results, question)
+
+
+def answer_chain():
+    """回答阶段的 prompt | llm；llm 在第一次回答时才创建（见 backend/components/llm.py）"""
+    return get_answer_prompt() | get_llm()
+
+
+def answer_with_context(question: str, sql_query: str, context: str, use_cache: bool = RESULT_CACHE_ENABLED) -> str:
+    """阶段四：构建带上下文的 prompt 并调用 LLM 生成回答。
+
+    (归一化问题, SQL, 上下文) 相同时复用缓存的回答，不再调用 LLM。
+    """
+    question_key = normalize_question(question)
+    with span("llm_answer", cache_hit=False) as s:
+        if use_cache:
+            cached = result_cache.get_answer(question_key, sql_query, context)
+            if cached is not None:
+                s.set(cache_hit=True)
+                return cached
+
+        chain = answer_chain()
+        response = chain.invoke({
+            "question": question,
+            "sql": sql_query,
+            "context": context
+        })
+        answer = response.content if hasattr(response, "content") else str(response)
+        s.set(**answer_attrs(response, answer))
+    if use_cache:
+        result_cache.put_answer(question_key, sql_query, context, answer)
+    return answer
+
+
+def stream_answer_with_context(question: str, sql_query: str, context: str, use_cache: bool = RESULT_CACHE_ENABLED):
+    """answer_with_context 的流式版本：通过 chain.stream 逐段产出回答文本。
+
+    缓存命中时一次性产出整段回答；流结束后把完整回答写入缓存。
+    """
+    question_key = normalize_question(question)
+    if use_cache:
+        cached = result_cache.get_answer(question_key, sql_query, context)
+        if cached is not None:
+            yield cached
+            return
+
+    chain = answer_chain()
+    parts = []
+    # 生成器跨 yield 挂起，不能包在 span 中，结束时直接记录阶段耗时（含调用方消费的时间）
+    start = time.perf_counter()
+    first_chunk = None
+    for chunk in chain.stream({
         "question": question,
         "sql": sql_query,
         "context": context
-    })
+    }):
+        text = chunk.content if hasattr(chunk, "content") else str(chunk)
+        if text:
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+                record_stage("llm_answer_first_chunk", first_chunk)
+            parts.append(text)
+            yield text
+    record_stage("llm_answer", time.perf_counter() - start, bytes=len("".join(parts).encode("utf-8")))
+    if use_cache:
+        result_cache.put_answer(question_key, sql_query, context, "".join(parts))
 
-    # 构建参考信息
-    refs = reference_for_answer(results)
-    
-    # 从引用中提取字段
-    source_title = refs.get("source_title", "") if isinstance(refs, dict) else ""
-    source_url = refs.get("source_url", "") if isinstance(refs, dict) else ""
 
-    # 返回 JSON 格式的结果
-    result_json =  {
-        "content": "patent:" + (response.content if hasattr(response, "content") else str(response)),
-        "text": context,
-        "source_title": source_title,
-        "source_url": source_url,
-        "source_file": ""
+async def aanswer_with_context(question: str, sql_query: str, context: str, use_cache: bool = RESULT_CACHE_ENABLED) -> str:
+    """answer_with_context 的异步版本：通过 chain.ainvoke 调用（限速由 llm 网关负责）"""
+    question_key = normalize_question(question)
+    with span("llm_answer", cache_hit=False) as s:
+        if use_cache:
+            cached = result_cache.get_answer(question_key, sql_query, context)
+            if cached is not None:
+                s.set(cache_hit=True)
+                return cached
+
+        chain = answer_chain()
+        response = await chain.ainvoke({
+            "question": question,
+            "sql": sql_query,
+            "context": context
+        })
+        answer = response.content if hasattr(response, "content") else str(response)
+        s.set(**answer_attrs(response, answer))
+    if use_cache:
+        result_cache.put_answer(question_key, sql_query, context, answer)
+    return answer
+
+
+def answer_attrs(response, answer: str) -> dict:
+    """回答阶段 span 的属性：回答字节数与 token 用量"""
+    return {"bytes": len(answer.encode("utf-8")), **log_usage(response)}
+
+
+def new_result(question: str) -> dict:
+    """流水线结构化结果的初始值（字段说明见 run_pipeline）"""
+    return {
+        "question": question,
+        "sql": "",
+        "rows": [],
+        "context": "",
+        "answer": "",
+        "content": "",
+        "source_title": [],
+        "source_url": [],
+        "timings": {},
+        "error": None,
+        "failed_stage": None,
     }
 
+
+def fill_context(result: dict):
+    """阶段三：由查询结果构建上下文与参考信息，写入 result。
+
+    首轮查询推迟的大文本列在此按需补取（只补取写入上下文的行）。
+    """
+    with span("context") as s:
+        result["rows"] = load_deferred_columns(result["rows"], result["question"])
+        result["context"] = build_context(result["rows"], result["question"])
+        refs = reference_for_answer(result["rows"], result["question"])
+        result["source_title"] = refs.get("source_title", [])
+        result["source_url"] = refs.get("source_url", [])
+        s.set(rows=len(result["rows"]), bytes=len(result["context"].encode("utf-8")))
+    logger.debug("上下文: %s", preview(result["context"]))
+
+
+def run_pipeline(question: str, history=None, raise_errors: bool = False, answer: bool = True) -> dict:
+    """依次执行 sql -> rows -> context -> answer 四个阶段，返回结构化结果。
+
+    返回字段：
+    - question / sql / rows / context / answer：各阶段产物（answer 为 LLM 原始回答）
+    - content：对外展示的回答文本（"patent:" 前缀，或无法生成 SQL 时的提示语）
+    - source_title / source_url：与 rows 对应的引用信息
+    - timings：各阶段耗时（秒），键为 sql/query/context/answer/total
+    - error / failed_stage：出错时的错误信息与出错阶段，已完成阶段的产物保留在结果中
+
+    raise_errors=True 时出错直接抛出原异常（generate_answer 沿用该行为）。
+    answer=False 时在上下文阶段后返回，由调用方自行（如流式）生成回答。
+    """
+    result = new_result(question)
+    timings = result["timings"]
+    pipeline_start = time.perf_counter()
+    stage = "sql"
+
+    with span("pipeline") as pipeline_span:
+        try:
+            # 生成 SQL
+            start = time.perf_counter()
+            result["sql"] = generate_sql(question)
+            timings["sql"] = time.perf_counter() - start
+
+            if not result["sql"]:
+                result["content"] = NO_SQL_MESSAGE
+                return result
+
+            # 执行 SQL 查询
+            stage = "query"
+            start = time.perf_counter()
+            result["rows"] = fetch_rows(result["sql"])
+            timings["query"] = time.perf_counter() - start
+
+            # 构建上下文与参考信息
+            stage = "context"
+            start = time.perf_counter()
+            fill_context(result)
+            timings["context"] = time.perf_counter() - start
+            if not answer:
+                return result
+
+            # 调用 LLM 生成回答
+            stage = "answer"
+            start = time.perf_counter()
+            result["answer"] = answer_with_context(question, result["sql"], result["context"])
+            result["content"] = "patent:" + result["answer"]
+            timings["answer"] = time.perf_counter() - start
+        except Exception as e:
+            if raise_errors:
+                raise
+            result["error"] = str(e)
+            result["failed_stage"] = stage
+            pipeline_span.set(error=type(e).__name__, failed_stage=stage)
+        finally:
+            timings["total"] = time.perf_counter() - pipeline_start
+
+        return result
+
+
+async def arun_pipeline(question: str, history=None, raise_errors: bool = False) -> dict:
+    """run_pipeline 的异步版本：两次 LLM 调用走 ainvoke，SQL 查询在读线程池中执行"""
+    result = new_result(question)
+    timings = result["timings"]
+    pipeline_start = time.perf_counter()
+    stage = "sql"
+
+    with span("pipeline") as pipeline_span:
+        try:
+            start = time.perf_counter()
+            result["sql"] = await agenerate_sql(question)
+            timings["sql"] = time.perf_counter() - start
+
+            if not result["sql"]:
+                result["content"] = NO_SQL_MESSAGE
+                return result
+
+            stage = "query"
+            start = time.perf_counter()
+            result["rows"] = await afetch_rows(result["sql"])
+            timings["query"] = time.perf_counter() - start
+
+            stage = "context"
+            start = time.perf_counter()
+            fill_context(result)
+            timings["context"] = time.perf_counter() - start
+
+            stage = "answer"
+            start = time.perf_counter()
+            result["answer"] = await aanswer_with_context(question, result["sql"], result["context"])
+            result["content"] = "patent:" + result["answer"]
+            timings["answer"] = time.perf_counter() - start
+        except Exception as e:
+            if raise_errors:
+                raise
+            result["error"] = str(e)
+            result["failed_stage"] = stage
+            pipeline_span.set(error=type(e).__name__, failed_stage=stage)
+        finally:
+            timings["total"] = time.perf_counter() - pipeline_start
+
+        return result
+
+
+def to_answer_json(result: dict) -> str:
+    """将 run_pipeline 的结构化结果转换为对外的 JSON 字符串"""
+    if not result["sql"]:
+        result_json = {
+            "content": result["content"],
+            "text": "",
+            "source_title": "",
+            "source_url": "",
+            "source_file": ""
+        }
+    else:
+        result_json = {
+            "content": result["content"],
+            "text": result["context"],
+            "source_title": result["source_title"],
+            "source_url": result["source_url"],
+            "source_file": ""
+        }
     return json.dumps(result_json, ensure_ascii=False, indent=2)
 
 
+def generate_answer(question: str, history=None) -> str:
+    # 返回 JSON 格式的结果
+    return to_answer_json(run_pipeline(question, history, raise_errors=True))
+
+
+async def agenerate_answer(question: str, history=None) -> str:
+    return to_answer_json(await arun_pipeline(question, history, raise_errors=True))
+
+
 
 if __name__ == "__main__":
     question = "给出截止2025年6月31日IPC包含H01L21/02的台湾“本国公开”专利数量？"
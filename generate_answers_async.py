@@ -0,0 +1,20 @@
+import asyncio
+import argparse
+
+from batch_runner import arun_batch
+
+
+async def process_excel_async(concurrency=128, rpm=0):
+    """单进程异步处理Excel：最多 concurrency 个问题同时在途，LLM 调用按 rpm 限速。
+
+    结果写入检查点，全部完成后一次性写回表格；中断后重新运行会跳过已完成的行（见 batch_runner.py）。
+    """
+    await arun_batch(concurrency=concurrency, rpm=rpm)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="异步批量生成专利问题的 SQL 与答案")
+    parser.add_argument("--concurrency", type=int, default=128, help="同时在途的问题数")
+    parser.add_argument("--rpm", type=float, default=0, help="每分钟 LLM 请求上限，0 表示不限速")
+    args = parser.parse_args()
+    asyncio.run(process_excel_async(args.concurrency, args.rpm))